@@ -1 +1 @@
-__all__ = ["errors", "list2d"]
+__all__ = ["distribute", "errors", "instrument", "job", "list2d", "service"]
@@ -0,0 +1,84 @@
+"""
+    Runs a conversion from a job spec file without GUI.
+
+    Usage:
+        python -m basic job.json [--workers N] [--backend xlsx|excel] [--chunk-rows N]
+                                 [--workbook-layout sheets|stacked] [--trace FILE] [--memory]
+                                 [--watch [--interval SECONDS]]
+
+    A JSON summary is printed to the standard output. The exit status is 0 if the job succeeds,
+    1 if it fails, and 2 if the job spec is invalid. In watch mode, the exit status is 1 if a serial fails, and 2
+    if the template cannot be read. Messages of watch mode are written to the standard error.
+"""
+
+import argparse
+import json
+import sys
+
+from basic.errors import JobSpecError
+from basic.job import load_job_spec, make_job_spec, run_job
+
+
+def main(argv=None) -> int:
+  parser = argparse.ArgumentParser(prog="python -m basic", description="Converts text files to Excel files.")
+  parser.add_argument("spec", help="a job spec file (.json or .toml)")
+  parser.add_argument("--workers", type=int, help="the number of processes. It overrides the job spec.")
+  parser.add_argument("--backend", choices=["xlsx", "excel"], help="a writer. It overrides the job spec.")
+  parser.add_argument("--chunk-rows", type=int,
+                      help="reads text files this many rows at a time, for files larger than memory.")
+  parser.add_argument("--workbook-layout", choices=["sheets", "stacked"],
+                      help="loads all serials to one Excel file. It overrides the job spec.")
+  parser.add_argument("--trace", help="a file to which the timing of each stage is appended as JSON lines.")
+  parser.add_argument("--memory", action="store_true",
+                      help="writes a report of the memory of each stage and serial next to the Excel files.")
+  parser.add_argument("--watch", action="store_true",
+                      help="watches the first data folder and converts each serial when its files are complete.")
+  parser.add_argument("--interval", type=float, default=10, help="seconds between polls in watch mode.")
+  args = parser.parse_args(argv)
+
+  overrides = {"workers": args.workers, "backend": args.backend, "chunk_rows": args.chunk_rows,
+               "workbook_layout": args.workbook_layout, "trace": args.trace, "memory_profile": args.memory or None}
+  try:
+    spec = load_job_spec(args.spec)
+    # the options are checked with the job spec, so they cannot make an invalid job.
+    spec = make_job_spec(dict(spec, **{key: value for key, value in overrides.items() if value is not None}))
+  except JobSpecError as e:
+    print(json.dumps({"status": "error", "error": str(e)}))
+    return 2
+
+  if args.watch:
+    from basic.file.files import ExcelFile
+    from basic.file.watch import FolderWatcher
+    from basic.file.xlsx import read_template_info
+    from basic.job import make_sheet_data, spec_transforms
+
+    try:
+      excel_file = ExcelFile(spec["template"])
+      sheet_data = make_sheet_data(read_template_info(excel_file.full_name).sheet_names, spec["missing_values"],
+                                   spec_transforms(spec))
+    except Exception as e:
+      print(json.dumps({"status": "error", "error": type(e).__name__ + ": " + str(e)}))
+      return 2
+    if spec["trace"] is not None:
+      from basic import instrument
+      instrument.enable(spec["trace"])
+    watcher = FolderWatcher(spec["data"][0], excel_file, sheet_data, spec["keyword"], spec["save_name"],
+                            recursive=spec["recursive"], backend=spec["backend"], save_path=spec["save_path"],
+                            includes=spec["include"], excludes=spec["exclude"],
+                            serial_pattern=spec["serial_pattern"], chunk_rows=spec["chunk_rows"])
+    try:
+      watcher.run(args.interval)
+    except KeyboardInterrupt:
+      pass
+    failed = watcher.failed
+    print(json.dumps({"status": "ok" if len(failed) == 0 else "failed", "files": list(watcher.done.values()),
+                      "failed": failed}))
+    return 0 if len(failed) == 0 else 1
+
+  summary = run_job(spec)
+  print(json.dumps(summary, indent=2))
+  return 0 if summary["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main())
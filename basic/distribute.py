@@ -0,0 +1,371 @@
+"""
+    This module divides the serials of a job among worker processes on several machines which share a directory,
+    such as a network drive, so that idle machines convert a lot together.
+
+    Usage:
+        python -m basic.distribute publish job.json DIRECTORY
+        python -m basic.distribute work DIRECTORY [--worker-id ID] [--lease SECONDS] [--poll SECONDS]
+        python -m basic.distribute status DIRECTORY [--wait] [--poll SECONDS]
+
+    "publish" writes the job spec and a work item of each serial to the directory:
+        job.json                the job spec
+        items/<serial>.json     the text files of each sheet and the save name of a serial
+        leases/<serial>.lease   a lease of a worker on an item. Its modification time is the heartbeat of the worker.
+        done/<serial>.json      the names of the Excel files of an item
+        failed/<serial>.json    the error of an item
+    Any number of "work" processes on any machine claim items by creating lease files atomically, convert them
+    with the "xlsx" writer and write the results. A worker renews its lease while it converts, and a lease which
+    has not been renewed for "lease" seconds is expired: another worker reclaims it by renaming it atomically.
+    An item is converted again if its worker stops, so a lease must be longer than the differences of the clocks
+    of the machines. Paths in the job spec must be valid on all the machines.
+    "status --wait" waits until all items are finished, and then merges "merge_range" of the new Excel files.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import List
+
+from basic.errors import JobSpecError
+from basic.file import scan_text_files, group_data_files, make_data_table, choose_data_files, text_to_excel, \
+  merge_specified_range
+from basic.file.files import TextFile, ExcelFile
+from basic.file.xlsx import read_template_info
+from basic.job import load_job_spec, make_job_spec, make_sheet_data, spec_transforms
+from basic.list2d import Table
+from basic.sheetdata.sheetdata import SheetData
+
+ITEMS = "items"
+LEASES = "leases"
+DONE = "done"
+FAILED = "failed"
+
+
+def write_json(full_name: str, data):
+  """
+  Writes JSON to a temporary file and renames it, so other machines never read a partly written file.
+  :param full_name: the full name of a file
+  :param data: data which can be written as JSON
+  """
+  temp_name = full_name + "." + socket.gethostname() + "-" + str(os.getpid()) + "-" \
+              + str(threading.get_ident()) + ".tmp"
+  with open(temp_name, "w") as f:
+    json.dump(data, f, indent=2)
+  os.replace(temp_name, full_name)
+
+
+def read_json(full_name: str):
+  with open(full_name) as f:
+    return json.load(f)
+
+
+def publish(spec: dict, directory: str) -> int:
+  """
+  Finds the text files of a job and writes a work item of each serial to a shared directory.
+  :param spec: a job spec from "load_job_spec"
+  :param directory: a shared directory. It is created if it does not exist.
+  :return: the number of work items.
+  :raise JobSpecError: if the directory already has work items, or the job makes one Excel file of all serials.
+  """
+  if spec["workbook_layout"] is not None:
+    raise JobSpecError("A job with 'workbook_layout' makes one Excel file, so it cannot be distributed.")
+  if os.path.isdir(os.path.join(directory, ITEMS)) and len(os.listdir(os.path.join(directory, ITEMS))) != 0:
+    raise JobSpecError(directory + " already has work items of another job.")
+  for sub_directory in (ITEMS, LEASES, DONE, FAILED):
+    os.makedirs(os.path.join(directory, sub_directory), exist_ok=True)
+
+  excel_file = ExcelFile(spec["template"])
+  sheet_data = make_sheet_data(read_template_info(excel_file.full_name).sheet_names, spec["missing_values"],
+                               spec_transforms(spec))
+  text_files: List[TextFile] = []
+  for files, errors in scan_text_files(spec["data"], spec["recursive"], spec["include"], spec["exclude"],
+                                       spec["serial_pattern"]):
+    text_files.extend(files)
+  data_table = choose_data_files(make_data_table(group_data_files(text_files), sheet_data, spec["keyword"]))
+
+  write_json(os.path.join(directory, "job.json"), spec)
+  for r, serial in enumerate(data_table.header_v):
+    files = {sd.sheet_name: data_table.get(r, c).full_name
+             for c, sd in enumerate(data_table.header_h) if data_table.get(r, c) is not None}
+    write_json(os.path.join(directory, ITEMS, serial + ".json"),
+               {"serial": serial, "save_name": spec["save_names"].get(serial, spec["save_name"]), "files": files})
+  return data_table.n_row
+
+
+class Lease(object):
+  """ This class is a lease of a worker on a work item. The lease file is created only if it does not exist,
+      so only one worker holds it. While the lease is held, a thread renews its modification time.
+
+      Attributes:
+          _full_name: the full name of the lease file
+          _worker_id: an identifier of the worker
+          _lease_seconds: seconds after which a lease that has not been renewed is expired
+          _lost: whether another worker has reclaimed the lease
+          _stopped: an event set when the lease is released
+          _thread: a thread which renews the lease
+  """
+
+  def __init__(self, full_name: str, worker_id: str, lease_seconds: float):
+    self._full_name = full_name
+    self._worker_id = worker_id
+    self._lease_seconds = lease_seconds
+    self._lost = False
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(target=self.__renew, daemon=True)
+
+  # Getters
+  @property
+  def lost(self) -> bool:
+    return self._lost
+
+  @staticmethod
+  def claim(full_name: str, worker_id: str, lease_seconds: float):
+    """
+    Claims a lease. An expired lease is reclaimed.
+    :param full_name: the full name of the lease file
+    :param worker_id: an identifier of the worker
+    :param lease_seconds: seconds after which a lease that has not been renewed is expired
+    :return: a "Lease" whose renewal has started, or None if another worker holds it.
+    """
+    for _ in range(2):
+      try:
+        fd = os.open(full_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+      except FileExistsError:
+        if not Lease.__reclaim(full_name, worker_id, lease_seconds):
+          return None
+        continue
+      with os.fdopen(fd, "w") as f:
+        json.dump({"worker": worker_id, "host": socket.gethostname(), "pid": os.getpid(), "claimed": time.time()}, f)
+      lease = Lease(full_name, worker_id, lease_seconds)
+      lease._thread.start()
+      return lease
+    return None
+
+  @staticmethod
+  def __reclaim(full_name: str, worker_id: str, lease_seconds: float) -> bool:
+    """
+    Removes an expired lease by renaming it to a name of this worker, so two workers never both reclaim it.
+    :return: whether the lease file may be created again.
+    """
+    try:
+      if time.time() - os.stat(full_name).st_mtime <= lease_seconds:
+        return False
+      expired_name = full_name + "." + worker_id + ".expired"
+      os.replace(full_name, expired_name)
+    except FileNotFoundError:
+      return True
+    # the lease was renewed or claimed again between "stat" and "replace", so it is put back.
+    if time.time() - os.stat(expired_name).st_mtime <= lease_seconds:
+      try:
+        os.link(expired_name, full_name)
+      except OSError:
+        pass
+      os.remove(expired_name)
+      return False
+    os.remove(expired_name)
+    return True
+
+  def holds(self) -> bool:
+    """
+    :return: whether the lease file is still of this worker.
+    """
+    try:
+      return read_json(self._full_name).get("worker") == self._worker_id
+    except (OSError, ValueError):
+      return False
+
+  def release(self):
+    """ Stops renewing the lease and removes the lease file if it is still of this worker. """
+    self._stopped.set()
+    self._thread.join()
+    if self.holds():
+      os.remove(self._full_name)
+
+  def __renew(self):
+    while not self._stopped.wait(self._lease_seconds / 3):
+      try:
+        if not self.holds():
+          raise FileNotFoundError(self._full_name)
+        os.utime(self._full_name)
+      except OSError:
+        self._lost = True
+        return
+
+
+class DistributedWorker(object):
+  """ This class claims work items in a shared directory and converts them until all items are finished.
+
+      Attributes:
+          _directory: a shared directory where items are published
+          _worker_id: an identifier of the worker, unique among all the machines
+          _lease_seconds: seconds after which a lease that has not been renewed is expired
+          _spec: the job spec of the directory
+          _excel_file: an Excel file for the template
+          _sheet_data: "SheetData"s of the template
+  """
+
+  def __init__(self, directory: str, worker_id: str = None, lease_seconds: float = 60):
+    self._directory = directory
+    self._worker_id = worker_id if worker_id is not None else socket.gethostname() + "-" + str(os.getpid())
+    self._lease_seconds = lease_seconds
+    self._spec = make_job_spec(read_json(os.path.join(directory, "job.json")))
+    self._excel_file = ExcelFile(self._spec["template"])
+    self._sheet_data = make_sheet_data(read_template_info(self._excel_file.full_name).sheet_names,
+                                       self._spec["missing_values"], spec_transforms(self._spec))
+
+  # Getters
+  @property
+  def worker_id(self) -> str:
+    return self._worker_id
+
+  def run(self, poll: float = 5) -> int:
+    """
+    Converts items until all items are finished. When the other items are leased, it waits for them to be
+    finished or expired.
+    :param poll: seconds between checks of leased items
+    :return: the number of items this worker converted.
+    """
+    n_items = 0
+    while True:
+      pending = unfinished_serials(self._directory)
+      if len(pending) == 0:
+        return n_items
+      claimed = False
+      for serial in pending:
+        lease = Lease.claim(os.path.join(self._directory, LEASES, serial + ".lease"), self._worker_id,
+                            self._lease_seconds)
+        if lease is None:
+          continue
+        claimed = True
+        try:
+          # another worker may have finished the item after it was listed.
+          if serial in unfinished_serials(self._directory):
+            n_items += self.convert(serial, lease)
+        finally:
+          lease.release()
+      if not claimed:
+        time.sleep(poll)
+
+  def convert(self, serial: str, lease: Lease) -> int:
+    """
+    Converts an item and writes its result, unless the lease is lost meanwhile.
+    :param serial: the serial of an item
+    :param lease: the lease of the item
+    :return: 1 if the result is written, and 0 if the lease is lost.
+    """
+    start = time.monotonic()
+    item = read_json(os.path.join(self._directory, ITEMS, serial + ".json"))
+    table: Table[TextFile, str, SheetData] = Table[TextFile, str, SheetData]()
+    table.append_header_vs([serial])
+    table.append_header_hs(self._sheet_data)
+    for c, sd in enumerate(self._sheet_data):
+      full_name = item["files"].get(sd.sheet_name)
+      table.insert(TextFile(full_name) if full_name is not None else None, 0, c)
+
+    result = {"serial": serial, "worker": self._worker_id}
+    try:
+      result["files"] = text_to_excel(table, self._excel_file, [item["save_name"]], backend="xlsx",
+                                      save_path=self._spec["save_path"], chunk_rows=self._spec["chunk_rows"])
+      finished = DONE
+    except Exception as e:
+      result["error"] = type(e).__name__ + ": " + str(e)
+      finished = FAILED
+    result["elapsed"] = round(time.monotonic() - start, 3)
+
+    if lease.lost or not lease.holds():
+      return 0
+    write_json(os.path.join(self._directory, finished, serial + ".json"), result)
+    return 1
+
+
+def unfinished_serials(directory: str) -> List[str]:
+  """
+  :param directory: a shared directory where items are published
+  :return: the serials of items which are neither done nor failed, in order.
+  """
+  finished = set(_serials(directory, DONE)) | set(_serials(directory, FAILED))
+  return [serial for serial in _serials(directory, ITEMS) if serial not in finished]
+
+
+def _serials(directory: str, sub_directory: str) -> List[str]:
+  return sorted(name[:-len(".json")] for name in os.listdir(os.path.join(directory, sub_directory))
+                if name.endswith(".json"))
+
+
+def status(directory: str) -> dict:
+  """
+  :param directory: a shared directory where items are published
+  :return: a dictionary of the number of items, done, failed and leased items, and the serials of each worker.
+  """
+  leased = [name[:-len(".lease")] for name in os.listdir(os.path.join(directory, LEASES)) if name.endswith(".lease")]
+  workers = {}
+  for serial in _serials(directory, DONE):
+    workers.setdefault(read_json(os.path.join(directory, DONE, serial + ".json"))["worker"], []).append(serial)
+  return {"items": len(_serials(directory, ITEMS)), "done": len(_serials(directory, DONE)),
+          "failed": len(_serials(directory, FAILED)), "leased": len(leased),
+          "unfinished": len(unfinished_serials(directory)), "workers": workers}
+
+
+def wait_and_merge(directory: str, poll: float = 5) -> dict:
+  """
+  Waits until all items are finished, and merges "merge_range" of the new Excel files in the order of serials.
+  :param directory: a shared directory where items are published
+  :param poll: seconds between checks
+  :return: "status" of the directory with "files", the names of the new Excel files, and "merged".
+  """
+  while len(unfinished_serials(directory)) != 0:
+    time.sleep(poll)
+  spec = read_json(os.path.join(directory, "job.json"))
+  result = status(directory)
+  result["files"] = [name for serial in _serials(directory, DONE)
+                     for name in read_json(os.path.join(directory, DONE, serial + ".json"))["files"]]
+  result["merged"] = None
+  if len(spec.get("merge_range", "")) != 0 and len(result["files"]) != 0:
+    path = os.path.dirname(result["files"][0])
+    result["merged"] = merge_specified_range(result["files"], spec["merge_range"], spec.get("merge_name", ""), path,
+                                             backend="xlsx")
+  return result
+
+
+def main(argv=None) -> int:
+  parser = argparse.ArgumentParser(prog="python -m basic.distribute",
+                                   description="Converts a job with workers on machines sharing a directory.")
+  commands = parser.add_subparsers(dest="command")
+  publish_parser = commands.add_parser("publish", help="writes the work items of a job spec to a directory.")
+  publish_parser.add_argument("spec", help="a job spec file (.json or .toml)")
+  publish_parser.add_argument("directory")
+  work_parser = commands.add_parser("work", help="converts items until all items are finished.")
+  work_parser.add_argument("directory")
+  work_parser.add_argument("--worker-id", help="a unique name of the worker. The default is <host>-<pid>.")
+  work_parser.add_argument("--lease", type=float, default=60, help="seconds after which a lease is expired.")
+  work_parser.add_argument("--poll", type=float, default=5, help="seconds between checks of leased items.")
+  status_parser = commands.add_parser("status", help="prints the progress of items.")
+  status_parser.add_argument("directory")
+  status_parser.add_argument("--wait", action="store_true", help="waits for all items and merges the range.")
+  status_parser.add_argument("--poll", type=float, default=5, help="seconds between checks.")
+  args = parser.parse_args(argv)
+
+  try:
+    if args.command == "publish":
+      result = {"items": publish(load_job_spec(args.spec), args.directory)}
+    elif args.command == "work":
+      worker = DistributedWorker(args.directory, args.worker_id, args.lease)
+      result = {"worker": worker.worker_id, "converted": worker.run(args.poll)}
+    elif args.command == "status":
+      result = wait_and_merge(args.directory, args.poll) if args.wait else status(args.directory)
+    else:
+      parser.print_help()
+      return 2
+  except JobSpecError as e:
+    print(json.dumps({"status": "error", "error": str(e)}))
+    return 2
+  print(json.dumps(result, indent=2))
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
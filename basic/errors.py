@@ -59,3 +59,47 @@ class NoSerialExistError(Exception):
 
   def __str__(self):
     return self._msg
+
+
+class JobSpecError(Exception):
+  """ This exception happens when a job spec for a conversion without GUI is invalid. """
+
+  def __init__(self, msg: str):
+    super(JobSpecError, self).__init__()
+    self._msg = msg
+
+  def __str__(self):
+    return self._msg
+
+
+class InvalidMissingValueError(Exception):
+  """ This exception happens when a missing-value rule cannot be compiled. """
+
+  def __init__(self, msg: str):
+    super(InvalidMissingValueError, self).__init__()
+    self._msg = msg
+
+  def __str__(self):
+    return self._msg
+
+
+class InvalidTransformError(Exception):
+  """ This exception happens when a transform of worksheet data, such as a row filter, cannot be compiled. """
+
+  def __init__(self, msg: str):
+    super(InvalidTransformError, self).__init__()
+    self._msg = msg
+
+  def __str__(self):
+    return self._msg
+
+
+class InvalidMergeRangeError(Exception):
+  """ This exception happens when a range cannot be merged without Excel files of serials. """
+
+  def __init__(self, msg: str):
+    super(InvalidMergeRangeError, self).__init__()
+    self._msg = msg
+
+  def __str__(self):
+    return self._msg
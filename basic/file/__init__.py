@@ -1,20 +1,26 @@
 """
  This package has functions and classes for files.
 """
+import os
 import re
+from fnmatch import fnmatch
 from datetime import datetime
 from itertools import product
-from typing import List
+from typing import List, Callable, Iterator, Tuple
 
-import xlwings as xw
 from basic.sheetdata.sheetdata import SheetData
 
 from basic.errors import *
-from basic.file.files import TextFile, ExcelFile, SerialGroup
+from basic.instrument import span
+from basic.file.files import File, TextFile, ExcelFile, SerialGroup, TemplateInfo
 from basic.list2d import Matrix, Table
-from basic.sheetdata.sheetinfo import sheet_infos
+from basic.file.workbook import workbook_writers, header_rows
+from basic.file.xlsx import XlsxBook, read_range, split_range, written_value, continuation_name, MAX_ROWS
+from basic.sheetdata.sheetinfo import sheet_infos, DataTransformInfo
 
-__all__ = ["files", "group_data_files", "text_to_excel", "merge_specified_range", "check_valid_range"]
+__all__ = ["files", "xlsx", "workbook", "watch", "pipeline", "validate_text_files", "scan_text_files",
+           "group_data_files", "make_data_table", "choose_data_files", "text_to_excel", "make_file_name",
+           "text_to_workbook", "merge_specified_range", "merge_data_files", "check_valid_range"]
 
 
 def str_to_matrix(s: str) -> Matrix[str]:
@@ -23,46 +29,153 @@ def str_to_matrix(s: str) -> Matrix[str]:
   :param s: string data
   :return: matrix that contains data
   """
-  result: Matrix[str] = Matrix[str]()
+  with span("parse", bytes=len(s)) as sp:
+    result: Matrix[str] = Matrix[str]()
 
-  row = 0
-  for line in s.split('\n'):
-    col = 0
-    line_exist = False
+    row = 0
+    cells = 0
+    for line in s.split('\n'):
+      col = 0
+      line_exist = False
 
-    for cell in line.split('\t'):
-      result.insert(cell, row, col)
-      line_exist = True
-      col += 1
+      for cell in line.split('\t'):
+        result.insert(cell, row, col)
+        line_exist = True
+        col += 1
 
-    if line_exist:
-      row += 1
+      if line_exist:
+        row += 1
+      cells += col
+    sp["cells"] = cells
 
   return result
 
 
+def str_to_rows(s: str, n_rows: int = None, n_cols: int = None) -> List[List[str]]:
+  """
+  Makes string data to rows like "str_to_matrix", but short rows are not filled with None.
+  :param s: string data
+  :param n_rows: the number of rows to parse from the first. If it is None, all rows are parsed.
+  :param n_cols: the number of columns to parse from the first. If it is None, all columns are parsed.
+  :return: two-dimensional list of the data.
+  """
+  with span("parse", bytes=len(s)) as sp:
+    lines = s.split('\n')
+    if n_rows is not None:
+      del lines[n_rows:]
+    if n_cols is None:
+      rows = [line.split('\t') for line in lines]
+    else:
+      rows = [line.split('\t', n_cols)[:n_cols] for line in lines]
+    sp["cells"] = sum(len(row) for row in rows)
+  return rows
+
+
+def validate_text_files(full_names: List[str], batch_size: int = 256, n_workers: int = 8) \
+    -> Iterator[Tuple[List[TextFile], List[Tuple[str, str]]]]:
+  """
+  Makes text files from file names in batches. Each batch is checked by a pool of threads, so files on
+  a network drive are checked in parallel. Files are not opened.
+  :param full_names: the full names of text files
+  :param batch_size: the number of file names in a batch
+  :param n_workers: the number of threads
+  :return: an iterator of (a list of valid text files, a list of (invalid file name, reason)) for each batch.
+  """
+  from concurrent.futures import ThreadPoolExecutor
+
+  def make_text_file(full_name: str):
+    try:
+      return TextFile(full_name), None
+    except Exception as e:
+      return None, (full_name, str(e))
+
+  with ThreadPoolExecutor(max_workers=n_workers) as executor:
+    for i in range(0, len(full_names), batch_size):
+      text_files, errors = [], []
+      for tf, error in executor.map(make_text_file, full_names[i:i + batch_size]):
+        if tf is not None:
+          text_files.append(tf)
+        else:
+          errors.append(error)
+      yield text_files, errors
+
+
+def scan_text_files(directories: List[str], recursive: bool = False, includes: List[str] = ("*.txt",),
+                    excludes: List[str] = (), serial_pattern: str = None, batch_size: int = 256) \
+    -> Iterator[Tuple[List[TextFile], List[Tuple[str, str]]]]:
+  """
+  Finds text files in directories and makes text files in batches. Files are not opened.
+  :param directories: directories to search
+  :param recursive: whether subdirectories are also searched. A directory reached again through a link is skipped.
+  :param includes: glob patterns of file names to add. A file is added if its name matches any of them.
+  :param excludes: glob patterns of file names and directory names not to add.
+  :param serial_pattern: a regular expression that the serial of a file must match. If it is None,
+                         all serials are added.
+  :param batch_size: the number of files in a batch
+  :return: an iterator of (a list of valid text files, a list of (invalid file name, reason)) for each batch.
+  """
+  serial_re = re.compile(serial_pattern) if serial_pattern is not None else None
+  stack = list(reversed(directories))
+  text_files, errors = [], []
+  visited = set()
+
+  while len(stack) != 0:
+    directory = stack.pop()
+    # links and junctions can make a loop, so each real directory is searched once.
+    real_path = os.path.realpath(directory)
+    if real_path in visited:
+      continue
+    visited.add(real_path)
+    try:
+      entries = sorted(os.scandir(directory), key=lambda e: e.name)
+    except OSError as e:
+      errors.append((directory, str(e)))
+      continue
+
+    sub_directories = []
+    for entry in entries:
+      if any(fnmatch(entry.name, p) for p in excludes):
+        continue
+      try:
+        is_dir, is_file = entry.is_dir(), entry.is_file()
+      except OSError as e:
+        errors.append((entry.path, str(e)))
+        continue
+      if is_dir:
+        if recursive:
+          sub_directories.append(entry.path)
+        continue
+      if not is_file or not any(fnmatch(entry.name, p) for p in includes):
+        continue
+      if serial_re is not None and serial_re.match(entry.name[:File.N_SERIALS]) is None:
+        continue
+
+      try:
+        text_files.append(TextFile(entry.path, check_exists=False))
+      except Exception as e:
+        errors.append((entry.path, str(e)))
+      if len(text_files) + len(errors) >= batch_size:
+        yield text_files, errors
+        text_files, errors = [], []
+    stack.extend(reversed(sub_directories))
+
+  if len(text_files) + len(errors) != 0:
+    yield text_files, errors
+
+
 def group_data_files(data_files: List[TextFile]) -> List[SerialGroup]:
   """
   Groups a list of text files by serials.
   :param data_files: a list of text files
   :return: a list of "SerialGroup"s contains the text files which is a parameter.
   """
-  serial_group_list: List[SerialGroup] = []
+  serial_groups = {}
   for tf in data_files:
-    inserted = False
-    for serial_group in serial_group_list:
-      try:
-        serial_group.append(tf)
-        inserted = True
-        break
-      except SerialNotMatchedError:
-        pass
-
-    if inserted is False:
-      serial_group_list.append(SerialGroup())
-      serial_group_list[len(serial_group_list) - 1].append(tf)
+    if tf.serial not in serial_groups:
+      serial_groups[tf.serial] = SerialGroup()
+    serial_groups[tf.serial].append(tf)
 
-  return serial_group_list
+  return list(serial_groups.values())
 
 
 def make_data_table(serial_groups: List[SerialGroup], sheet_data: List[SheetData], data_sheet_keyword: str = "") \
@@ -96,57 +209,385 @@ def make_data_table(serial_groups: List[SerialGroup], sheet_data: List[SheetData
   return table
 
 
-def text_to_excel(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, save_names: List[str]):
+def choose_data_files(data_table: Table[List[TextFile], str, SheetData]) -> Table[TextFile, str, SheetData]:
+  """
+  Returns a table with the first text file of each cell of a table made by "make_data_table".
+  :param data_table: a table that contains a list of text files in one cell
+  :return: a table that contains a text file in one cell. A cell is None if there is no text file.
+  """
+  table: Table[TextFile, str, SheetData] = Table[TextFile, str, SheetData]()
+  table.append_header_vs(data_table.header_v)
+  table.append_header_hs(data_table.header_h)
+  for r, c in product(range(data_table.n_row), range(data_table.n_col)):
+    files = data_table.get(r, c)
+    table.insert(files[0] if len(files) != 0 else None, r, c)
+  return table
+
+
+def text_to_excel(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, save_names: List[str],
+                  progress: Callable[[str, str], None] = None, is_cancelled: Callable[[], bool] = None,
+                  backend: str = "excel", save_path: str = None, chunk_rows: int = None):
   """
   Load data in text files to an Excel file.
   :param data_table: a table that contains text files, with a vertical header consisting of serials, and with
                       a horizontal header consisting of "SheetData"s
   :param excel_file: Excel file
   :param save_names: a list of file names for new Excel files.
+  :param progress: a function called with a serial and a sheet name after each sheet is loaded, and with
+                   a serial and None after the Excel file of the serial is saved.
+  :param is_cancelled: a function checked before each Excel file is opened. If it returns True, loading stops
+                       and the names of the files saved so far are returned.
+  :param backend: the name of a writer in "workbook_writers". "excel" uses Excel, and "xlsx" does not.
+  :param save_path: a directory where new Excel files are saved. If it is None, they are saved in the directory
+                    of the text files.
+  :param chunk_rows: the number of rows read at a time. If it is given, a text file is read, transformed and
+                     written in chunks, so that memory does not depend on the size of the file.
+  :return: a list of the names of saved Excel files.
   """
-  path = excel_file.path
+  path = excel_file.path if save_path is None else save_path
   final_names = []
+  writer = workbook_writers[backend](excel_file)
 
   for serial, save_name in zip(data_table.header_v, save_names):
-    with excel_file as excel:
-      for sd in data_table.header_h:
-        tf = data_table.get_with_header(serial, sd)
-        sheet = excel.sheets[sd.sheet_name]
-        if tf is not None:
-          sheet.range((1, 1)).value = str_to_matrix(tf.get_data()).contents()
-          sheet.autofit('r')
-          path = tf.path
-        for si in sheet_infos:
-          si.apply_info_to_sheet(sheet, sd[si])
-      file_name = path + "\\" + serial + " " + save_name \
-                  + (" " if len(save_name) != 0 else "") \
-                  + datetime.now().strftime("%y%m%d-%H%M") + ".xlsx"
+    if is_cancelled is not None and is_cancelled():
+      break
+    with span("serial", serial=serial, backend=backend):
+      with span("open"):
+        writer.open()
+      try:
+        for sd in data_table.header_h:
+          with span("sheet", sheet=sd.sheet_name):
+            tf = data_table.get_with_header(serial, sd)
+            rows = None
+            if tf is not None:
+              path = tf.path if save_path is None else save_path
+            if tf is not None and chunk_rows is not None:
+              with span("write", chunk_rows=chunk_rows):
+                writer.write_sheet_chunks(sd, tf.iter_rows(chunk_rows))
+            else:
+              if tf is not None:
+                with span("read") as sp:
+                  text = tf.get_data()
+                  sp["bytes"] = len(text)
+                rows = str_to_matrix(text).contents()
+              with span("write"):
+                writer.write_sheet(sd, rows)
+          if progress is not None:
+            progress(serial, sd.sheet_name)
+        file_name = make_file_name(path, serial, save_name)
+        with span("save"):
+          writer.save(file_name)
+      except BaseException:
+        # the copy of the template is closed, so it does not lock the template for later conversions.
+        writer.discard()
+        raise
       final_names.append(file_name)
-      excel_file.save_file_name = file_name
+    if progress is not None:
+      progress(serial, None)
 
   return final_names
 
 
-def check_valid_range(excel_range: str):
+def make_file_name(path: str, serial: str, save_name: str) -> str:
+  """
+  Returns the full name of a new Excel file of a serial, such as "<path>/<serial> <save_name> <yymmdd-HHMM>.xlsx".
+  :param path: a directory of the file
+  :param serial: a serial
+  :param save_name: a name inserted in the file name. It can be empty.
+  :return: the full name of the file.
+  """
+  return path + os.sep + serial + " " + save_name + (" " if len(save_name) != 0 else "") \
+         + datetime.now().strftime("%y%m%d-%H%M") + ".xlsx"
+
+
+WORKBOOK_LAYOUTS = ("sheets", "stacked")
+SERIAL_HEADER = "Serial"  # the header of the serial column of the "stacked" layout.
+
+
+def text_to_workbook(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, save_name: str,
+                     layout: str = "sheets", progress: Callable[[str, str], None] = None,
+                     is_cancelled: Callable[[], bool] = None, save_path: str = None, chunk_rows: int = 10000) -> str:
+  """
+  Loads data in text files of all serials to one new Excel file without Excel. The template is loaded once and
+  the file is saved once, and text files are read, transformed and written in chunks like "text_to_excel".
+    "sheets":   each data sheet of each serial is a new worksheet such as "Data1 SN0001", after the data sheet
+                of the template. It is a copy of the data sheet if the data sheet has no drawings or comments.
+    "stacked":  each data sheet of the template has the rows of all serials one below another, with the serial in
+                a new first column. The header rows are written once, from the first serial.
+  Worksheets which are full continue in new worksheets like "XlsxBook.write_row_chunks".
+  :param data_table: a table that contains text files, like "text_to_excel"
+  :param excel_file: Excel file for a template
+  :param save_name: a name inserted in the file name. It can be empty.
+  :param layout: one of "WORKBOOK_LAYOUTS"
+  :param progress: a function called with a serial and a sheet name after each sheet of the serial is loaded.
+  :param is_cancelled: a function checked before each serial. If it returns True, serials loaded so far are saved.
+  :param save_path: a directory where the new Excel file is saved. If it is None, it is saved in the directory
+                    of the text files.
+  :param chunk_rows: the number of rows read at a time
+  :return: the full name of the new Excel file.
+  :raise ValueError: if the layout is unknown.
+  """
+  if layout not in WORKBOOK_LAYOUTS:
+    raise ValueError("'" + str(layout) + "' is not one of " + ", ".join(WORKBOOK_LAYOUTS) + ".")
+  path = save_path
+  book = XlsxBook(excel_file.full_name)
+
+  with span("workbook", layout=layout, serials=data_table.n_row):
+    try:
+      if layout == "sheets":
+        last_names = {sd.sheet_name: sd.sheet_name for sd in data_table.header_h}
+        for serial in data_table.header_v:
+          if is_cancelled is not None and is_cancelled():
+            break
+          with span("serial", serial=serial):
+            for sd in data_table.header_h:
+              tf = data_table.get_with_header(serial, sd)
+              if tf is not None:
+                path = tf.path if path is None else path
+                name = _serial_sheet_name(sd.sheet_name, serial, book.sheet_names)
+                book.add_sheet(name, last_names[sd.sheet_name], like=sd.sheet_name)
+                with span("sheet", sheet=name), span("write", chunk_rows=chunk_rows):
+                  names = book.write_row_chunks(name, _transformed_chunks(sd, tf, chunk_rows), header_rows(sd))
+                last_names[sd.sheet_name] = names[-1]
+              if progress is not None:
+                progress(serial, sd.sheet_name)
+      else:
+        for sd in data_table.header_h:
+          files = [(serial, data_table.get_with_header(serial, sd)) for serial in data_table.header_v]
+          files = [(serial, tf) for serial, tf in files if tf is not None]
+          if len(files) != 0:
+            path = files[0][1].path if path is None else path
+            with span("sheet", sheet=sd.sheet_name), span("write", chunk_rows=chunk_rows):
+              book.write_row_chunks(sd.sheet_name, _stacked_chunks(sd, files, chunk_rows, progress, is_cancelled),
+                                    header_rows(sd))
+
+      file_name = _merged_name(path if path is not None else excel_file.path, save_name, "")
+      with span("save"):
+        book.save(file_name)
+    except BaseException:
+      book.discard()
+      raise
+  return file_name
+
+
+def _serial_sheet_name(sheet_name: str, serial: str, sheet_names: List[str]) -> str:
+  """ Returns the name of the worksheet of a serial, such as "Data1 SN0001", at most 31 letters like Excel allows. """
+  serial = re.sub(r'[\[\]:*?/\\]', "_", serial)[:30]
+  name = sheet_name[:30 - len(serial)] + " " + serial
+  return name if name not in sheet_names else continuation_name(name, sheet_names)
+
+
+def _transformed_chunks(sheet_data: SheetData, text_file: TextFile, chunk_rows: int) -> Iterator[List[List]]:
+  chunks = text_file.iter_rows(chunk_rows)
+  for si in sheet_infos:
+    chunks = si.apply_info_to_chunks(chunks, sheet_data[si])
+  return chunks
+
+
+def _stacked_chunks(sheet_data: SheetData, files: List[Tuple[str, TextFile]], chunk_rows: int,
+                    progress: Callable[[str, str], None], is_cancelled: Callable[[], bool]) -> Iterator[List[List]]:
+  """
+  Yields the transformed chunks of text files of serials one after another, with the serial in the first column.
+  The header rows of the first text file have "SERIAL_HEADER" in it instead, and those of other files are skipped.
+  Empty rows are skipped, so that no row has a serial only.
+  """
+  n_header = header_rows(sheet_data)
+  for i, (serial, tf) in enumerate(files):
+    if is_cancelled is not None and is_cancelled():
+      return
+    with span("serial", serial=serial):
+      n_rows = 0
+      for chunk in _transformed_chunks(sheet_data, tf, chunk_rows):
+        first = max(min(n_header - n_rows, len(chunk)), 0)
+        rows = [[SERIAL_HEADER] + row for row in chunk[:first]] if i == 0 else []
+        rows.extend([serial] + row for row in chunk[first:] if not _is_empty_row(row))
+        n_rows += len(chunk)
+        yield rows
+    if progress is not None:
+      progress(serial, sheet_data.sheet_name)
+
+
+def _is_empty_row(row: List) -> bool:
+  return all(cell is None or cell == "" for cell in row)
+
+
+def check_valid_range(excel_range: str, template_info: TemplateInfo = None):
+  """
+  Checks whether a range is a valid Excel range such as "Sheet1!A1:F40".
+  :param excel_range: a range. An empty range is valid.
+  :param template_info: "TemplateInfo" of a template. If it is given, the sheet of the range must be in it.
+  :return: whether the range is valid.
+  """
   if len(excel_range) == 0:
     return True
 
+  if template_info is not None \
+      and excel_range[0:excel_range.find('!')].strip("'") not in template_info.sheet_names:
+    return False
+
   p = re.compile(
     r"([^:\\/?*\[\]]{1,31}\'!|[^:\\/?*\[\]]{1,31}!)(\$?[a-z]{1,3}\$?[0-9]{1,7}(:\$?[a-z]{1,3}\$?[0-9]{1,7})?|\$[a-z]{1,3}:\$[a-z]{1,3}|[a-z]{1,3}:[a-z]{1,3}|\$[0-9]{1,7}:\$[0-9]{1,7}|[0-9]{1,7}:[0-9]{1,7}|[a-z_\\][a-z0-9_.]{0,254})")
   return p.match(excel_range)
 
 
-def merge_specified_range(excel_file_names: List[str], excel_range: str, save_name: str, path=''):
-  merged = xw.Book()
-  sheet_name = excel_range[0:excel_range.find('!')]
+def merge_specified_range(excel_file_names: List[str], excel_range: str, save_name: str, path='',
+                          backend: str = "excel") -> str:
+  """
+  Copies the same range of Excel files, and saves them one below another in a new Excel file.
+  :param excel_file_names: the names of Excel files, relative to "path" or full
+  :param excel_range: a range such as "Sheet1!A1:F40"
+  :param save_name: the name of a new Excel file
+  :param path: a directory of the Excel files and the new Excel file
+  :param backend: "excel" uses Excel, and "xlsx" does not.
+  :return: the full name of the new Excel file.
+  """
+  merged_name = _merged_name(path, save_name)
+
+  with span("merge", files=len(excel_file_names), backend=backend):
+    if backend == "xlsx":
+      merged = _MergedRows()
+      for excel_file_name in excel_file_names:
+        merged.extend(read_range(os.path.join(path, excel_file_name), excel_range))
+      merged.save(merged_name)
+      return merged_name
+
+    app = ExcelFile.app()
+    merged = app.books.add()
+    sheet_name = excel_range[0:excel_range.find('!')]
+
+    current_row = 1
+    merged_sheet = merged.sheets[0]
+    for excel_file_name in excel_file_names:
+      excel_file = app.books.open(os.path.join(path, excel_file_name))
+      copied_range = excel_file.sheets[sheet_name].range(excel_range)
+      if current_row + copied_range.rows.count - 1 > MAX_ROWS:
+        name = continuation_name(merged.sheets[0].name, [sheet.name for sheet in merged.sheets])
+        merged_sheet = merged.sheets.add(name, after=merged_sheet)
+        current_row = 1
+      merged_sheet.range('A' + str(current_row)).value = copied_range.value
+      current_row += copied_range.rows.count
+
+    merged.save(merged_name)
+    return merged_name
+
+
+def merge_data_files(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, excel_range: str,
+                     save_name: str, path: str = '', progress: Callable[[str, str], None] = None,
+                     is_cancelled: Callable[[], bool] = None) -> str:
+  """
+  Merges a range of a data sheet from text files directly, without making an Excel file of each serial.
+  The merged values are the same as "merge_specified_range" with the "xlsx" backend after "text_to_excel".
+  Only the lines and columns of text files inside the range are parsed, unless a "DataTransformInfo" of the sheet
+  moves cells, and cells of the range outside data are read from the template once.
+  :param data_table: a table that contains text files, like "text_to_excel"
+  :param excel_file: Excel file for a template
+  :param excel_range: a range of a data sheet such as "Data1_raw!A1:F40"
+  :param save_name: the name of a new Excel file
+  :param path: a directory of the new Excel file
+  :param progress: a function called with a serial and None after the range of the serial is merged.
+  :param is_cancelled: a function checked before each serial. If it returns True, serials merged so far are saved.
+  :return: the full name of the new Excel file.
+  :raise InvalidMergeRangeError: if the range is not of a worksheet that has text files.
+  """
+  sheet_name, first_row, first_col, last_row, last_col = split_range(excel_range)
+  sheet_data = [sd for sd in data_table.header_h if sd.sheet_name == sheet_name]
+  if len(sheet_data) == 0 \
+      or all(data_table.get_with_header(serial, sheet_data[0]) is None for serial in data_table.header_v):
+    raise InvalidMergeRangeError("'" + sheet_name + "' has no text files. Only a range of a data sheet can be "
+                                 "merged without Excel files of serials, because other sheets need Excel to "
+                                 "calculate formulas.")
+  sd = sheet_data[0]
+  template = read_range(excel_file.full_name, excel_range)
+  # with only transforms that keep cells in place, cells below and right of the range are never needed.
+  pushdown = all(si.keeps_positions for si in sheet_infos
+                 if isinstance(si, DataTransformInfo) and len(str(sd[si] or "").strip()) != 0)
+  n_lines, n_cols = (last_row, last_col) if pushdown else (None, None)
+
+  merged = _MergedRows()
+  with span("merge", files=data_table.n_row, backend="merge_only"):
+    for serial in data_table.header_v:
+      if is_cancelled is not None and is_cancelled():
+        break
+      with span("serial", serial=serial):
+        tf = data_table.get_with_header(serial, sd)
+        if tf is None:
+          merged.extend([list(row) for row in template])
+        else:
+          with span("read") as sp:
+            text = tf.get_data(n_lines)
+            sp["bytes"] = len(text)
+          rows = str_to_rows(text, n_lines, n_cols)
+          for si in sheet_infos:
+            rows = si.apply_info_to_data(rows, sd[si])
+          merged.extend(_overlay_range(rows, template, first_row, first_col, tf if pushdown else None))
+      if progress is not None:
+        progress(serial, None)
+
+    merged_name = _merged_name(path, save_name)
+    merged.save(merged_name)
+  return merged_name
+
+
+def _overlay_range(rows: List[List], template: List[List], first_row: int, first_col: int,
+                   text_file: TextFile = None) -> List[List]:
+  """
+  Returns the values of a range after rows are written from "A1" of a worksheet of a template:
+  cells in the rectangle of the rows have their values, and other cells have the values of the template.
+  :param rows: two-dimensional list of data
+  :param template: the values of the range in the template
+  :param first_row: the first row of the range from 1
+  :param first_col: the first column of the range from 1
+  :param text_file: the text file of the rows if only some of its columns are parsed. The rectangle of the rows
+                    is as wide as its widest line, so it is counted when the template has values that it covers.
+  :return: two-dimensional list of the values of the range.
+  """
+  n_row = len(rows)
+  n_col = max([len(r) for r in rows] + [0])
+  last_col = first_col + len(template[0]) - 1 if len(template) != 0 else first_col
+  covered = template[:max(n_row - first_row + 1, 0)]
+  if text_file is not None and n_col < last_col \
+      and any(v is not None for row in covered for v in row[max(n_col - first_col + 1, 0):]):
+    n_col = max(n_col, text_file.count_columns())
+
+  result = []
+  for r, template_row in enumerate(template, first_row):
+    row = rows[r - 1] if r <= n_row else []
+    result.append([(written_value(row[c - 1]) if c <= len(row) else None) if r <= n_row and c <= n_col else v
+                   for c, v in enumerate(template_row, first_col)])
+  return result
+
+
+class _MergedRows(object):
+  """ This class writes rows one below another to a new Excel file without Excel. When a worksheet is full,
+      rows continue in a new worksheet such as "Sheet1 (2)". A full worksheet is written at once, so its rows
+      are released before the next rows are read.
+
+      Attributes:
+          _book: "XlsxBook" of the new Excel file
+          _sheet_name: the name of the worksheet that rows are added to
+          _rows: rows not written yet
+  """
+
+  def __init__(self):
+    self._book = XlsxBook()
+    self._sheet_name = self._book.sheet_names[0]
+    self._rows = []
+
+  def extend(self, rows: List[List]):
+    self._rows.extend(rows)
+    while len(self._rows) > MAX_ROWS:
+      self._book.write_rows(self._sheet_name, self._rows[:MAX_ROWS])
+      del self._rows[:MAX_ROWS]
+      name = continuation_name(self._book.sheet_names[0], self._book.sheet_names)
+      self._book.add_sheet(name, self._sheet_name)
+      self._sheet_name = name
+
+  def save(self, full_name: str):
+    self._book.write_rows(self._sheet_name, self._rows)
+    self._rows = []
+    self._book.save(full_name)
 
-  current_row = 1
-  for excel_file_name in excel_file_names:
-    excel_file = xw.books.open(path + excel_file_name)
-    copied_range = excel_file.sheets[sheet_name].range(excel_range)
-    merged.sheets[0].range('A' + str(current_row)).value = copied_range.value
-    current_row += copied_range.rows.count
 
-  merged.save(path + ("\\" if len(path) != 0 else "") + save_name
-              + (" " if len(save_name) != 0 else "")
-              + datetime.now().strftime("%y%m%d-%H%M") + " merged.xlsx")
+def _merged_name(path: str, save_name: str, suffix: str = " merged") -> str:
+  return path + (os.sep if len(path) != 0 else "") + save_name + (" " if len(save_name) != 0 else "") \
+         + datetime.now().strftime("%y%m%d-%H%M") + suffix + ".xlsx"
@@ -1,11 +1,11 @@
 """ Classes for files such as normal file, text file, excel file (.xlsx) """
 
-from typing import List
+from typing import List, Tuple, Iterator
 from basic.errors import *
 from shutil import copyfile
 import os
-
-import xlwings as xw
+import threading
+from itertools import islice
 
 
 class File(object):
@@ -24,10 +24,12 @@ class File(object):
   N_SERIALS = 12
 
   # Constructors
-  def __init__(self, full_name: str, using_serial: bool = False):
+  def __init__(self, full_name: str, using_serial: bool = False, check_exists: bool = True):
     """Constructor with full name string.
 
         :param str full_name: the full name of a file.
+        :param check_exists: whether the existence of the file is checked. It can be False if the caller
+                             already knows the file exists.
         :raise FileNotFoundError: if there is no file matching with "full_name".
         :raise InvalidFileNameError: if "full_name" is invalid file name.
         :raise TooShortFileNameError: if the number of letters of file name
@@ -40,17 +42,15 @@ class File(object):
     self._path = ""
     self._full_name = ""
 
-    # check there is a file.
-    try:
-      file = open(full_name)
-    except BaseException:
-      raise FileNotFoundError
+    # check there is a file without opening it.
+    if check_exists and not os.path.isfile(full_name):
+      raise FileNotFoundError("Cannot find the file.")
 
     # find slash(/, \) symbol for name
     slash_idx = full_name.rfind('/')
     if slash_idx == -1: slash_idx = full_name.rfind('\\')
     if slash_idx == -1: raise InvalidFileNameError("Cannot find '/' symbol.")
-    full_name = full_name.replace('/', '\\')
+    full_name = full_name.replace('/', os.sep)
 
     # find dot(.) symbol for format
     dot_idx = full_name.rfind('.')
@@ -104,8 +104,44 @@ class File(object):
       return self.full_name == o.full_name
     return super().__eq__(o)
 
-  def get_data(self) -> str:
-    with open(self._full_name) as f: return f.read()
+  def get_data(self, n_lines: int = None) -> str:
+    """
+    :param n_lines: the number of lines to read from the beginning. If it is None, the whole file is read.
+    :return: the text of the file.
+    """
+    with open(self._full_name) as f:
+      if n_lines is None:
+        return f.read()
+      return "".join(islice(f, n_lines))
+
+  def iter_rows(self, chunk_rows: int) -> Iterator[List[List[str]]]:
+    """
+    Reads the file in chunks of rows, so that the whole file is never in memory. Cells are separated by tabs.
+    The rows are the same as those of "str_to_matrix" of the whole text, except that short rows are not filled:
+    a file which ends with a new line has an empty last row.
+    :param chunk_rows: the number of rows of a chunk
+    :return: an iterator of two-dimensional lists of cells.
+    """
+    with open(self._full_name) as f:
+      chunk = []
+      last_line = "\n"
+      for line in f:
+        last_line = line
+        chunk.append((line[:-1] if line.endswith('\n') else line).split('\t'))
+        if len(chunk) == chunk_rows:
+          yield chunk
+          chunk = []
+      if last_line.endswith('\n'):
+        chunk.append([''])
+      if len(chunk) != 0:
+        yield chunk
+
+  def count_columns(self) -> int:
+    """
+    :return: the largest number of tab-separated cells in a line of the file. Cells are not parsed.
+    """
+    with open(self._full_name) as f:
+      return max((line.count('\t') + 1 for line in f), default=1)
 
 
 class TextFile(File):
@@ -116,13 +152,14 @@ class TextFile(File):
     """
   FORMAT = ".txt"
 
-  def __init__(self, full_name: str, using_serial: bool = True):
+  def __init__(self, full_name: str, using_serial: bool = True, check_exists: bool = True):
     """Constructor with full name string.
 
         :param str full_name: the full name of a file.
+        :param check_exists: whether the existence of the file is checked.
         :raise InvalidFileFormatError: if file format is not ".txt".
         """
-    super(TextFile, self).__init__(full_name, using_serial)
+    super(TextFile, self).__init__(full_name, using_serial, check_exists)
     if self._file_format != TextFile.FORMAT:
       raise InvalidFileFormatError("Format must be '.txt', but value is " + self._file_format)
 
@@ -139,21 +176,67 @@ class ExcelFile(File):
     """
   FORMAT = ".xlsx"
   excel_app = None
+  _excel_pid = None
+  _thread_apps = threading.local()
+  _lock = threading.Lock()
 
   @classmethod
   def open_excel_app(cls):
+    import xlwings as xw
     cls.excel_app = xw.App()
     cls.excel_app.visible = False
     cls.excel_app.display_alerts = False
+    cls._excel_pid = cls.excel_app.pid
     print("Excel " + str(cls.excel_app) + " is opened.")
 
+  @classmethod
+  def attach_excel_app(cls):
+    """Makes the Excel app usable in the current thread. The app is opened if it is not opened yet.
+
+        COM objects cannot be shared between threads, so a thread other than the one that opened the app
+        must call this function before using Excel files, and "detach_excel_app" when it finishes.
+        """
+    import pythoncom
+    import xlwings as xw
+    pythoncom.CoInitialize()
+    with cls._lock:
+      if cls._excel_pid is None:
+        cls.open_excel_app()
+    cls._thread_apps.app = xw.apps[cls._excel_pid]
+
+  @classmethod
+  def detach_excel_app(cls):
+    """Releases the Excel app attached to the current thread by "attach_excel_app"."""
+    import pythoncom
+    cls._thread_apps.app = None
+    pythoncom.CoUninitialize()
+
+  @classmethod
+  def app(cls):
+    """
+        :return: xlwings "App" object usable in the current thread. The app is opened if it is not opened yet.
+        """
+    app = getattr(cls._thread_apps, "app", None)
+    if app is not None:
+      return app
+    with cls._lock:
+      if cls._excel_pid is None:
+        cls.open_excel_app()
+    return cls.excel_app
+
   @classmethod
   def close_excel_app(cls):
-    for book in cls.excel_app.books:
+    """Closes the Excel app if it is opened. It can be called from a thread other than the one that opened it."""
+    import xlwings as xw
+    if cls._excel_pid is None:
+      return
+    app = xw.apps[cls._excel_pid]
+    for book in app.books:
       book.close()
-    cls.excel_app.quit()
-    print("Excel " + str(cls.excel_app) + " is closed.")
+    app.quit()
+    print("Excel " + str(app) + " is closed.")
     cls.excel_app = None
+    cls._excel_pid = None
 
   def __init__(self, full_name: str):
     """Constructor with full name string.
@@ -168,27 +251,36 @@ class ExcelFile(File):
     self._current_book = None
     self._temp_excel = None
 
-  def open(self) -> xw.Book:
+  def open(self):
     """Opens xlwings "Book" object with "_full_name".
         
         :return: opened "Book" object.
         :raise OSError: if another program use the file.
         """
+    import xlwings as xw
     for app in xw.apps:
       for book in app.books:
         if book.fullname.upper() == self._full_name.upper():
           raise OSError("Another program use the file. Please close the program.")
 
-    self._temp_excel = self._path + "\\~$" + self._name + "_~$TEMP~$" + self.FORMAT
+    self._temp_excel = self._path + os.sep + "~$" + self._name + "_~$TEMP~$" + self.FORMAT
     try:
       os.remove(self._temp_excel)
     except BaseException:
       pass
     copyfile(self._full_name, self._temp_excel)
     os.popen('attrib +h ' + self._temp_excel).close()  # hide temp file
-    self._current_book = ExcelFile.excel_app.books.open(self._temp_excel)
+    self._current_book = ExcelFile.app().books.open(self._temp_excel)
     return self._current_book
 
+  def inspect(self) -> "TemplateInfo":
+    """Reads the names, used ranges and sizes of worksheets directly from the file, without Excel.
+
+        :return: "TemplateInfo" object of this file.
+        """
+    from basic.file.xlsx import read_template_info
+    return read_template_info(self._full_name)
+
   def close(self) -> None:
     """ Close xlwings "Book" object. """
     if self._current_book is not None:
@@ -196,7 +288,7 @@ class ExcelFile(File):
         self._current_book.save(self._full_name)
       elif self.save_file_name.find('\\') == -1 \
           and self.save_file_name.find('/') == -1:  # same directory with source file.
-        self._current_book.save(self._path + '\\' + self.save_file_name)
+        self._current_book.save(self._path + os.sep + self.save_file_name)
       else:
         self._current_book.save(self.save_file_name)
       self._current_book.close()
@@ -204,6 +296,15 @@ class ExcelFile(File):
     os.remove(self._temp_excel)
     self._temp_excel = None
 
+  def discard(self) -> None:
+    """ Closes xlwings "Book" object without saving it, and removes the temporary copy. """
+    if self._current_book is not None:
+      self._current_book.close()
+    self._current_book = None
+    if self._temp_excel is not None and os.path.exists(self._temp_excel):
+      os.remove(self._temp_excel)
+    self._temp_excel = None
+
   def __enter__(self):
     """ Returns "open" function's result.
 
@@ -216,6 +317,50 @@ class ExcelFile(File):
     self.close()
 
 
+class TemplateInfo(object):
+  """Class for the information of worksheets in a template Excel file.
+
+    Attributes:
+        _full_name: the full name of an Excel file.
+        _mtime: the modification time of the file when it is read.
+        _sheet_names: a list of worksheet names in order.
+        _used_ranges: a list of used ranges of worksheets such as "A1:F40".
+        _sizes: a list of (the number of rows, the number of columns) of used ranges.
+    """
+
+  def __init__(self, full_name: str, mtime: float, sheet_names: List[str], used_ranges: List[str],
+               sizes: List[Tuple[int, int]]):
+    self._full_name = full_name
+    self._mtime = mtime
+    self._sheet_names = sheet_names
+    self._used_ranges = used_ranges
+    self._sizes = sizes
+
+  # Getters
+  @property
+  def full_name(self) -> str:
+    return self._full_name
+
+  @property
+  def mtime(self) -> float:
+    return self._mtime
+
+  @property
+  def sheet_names(self) -> List[str]:
+    return self._sheet_names
+
+  @property
+  def used_ranges(self) -> List[str]:
+    return self._used_ranges
+
+  @property
+  def sizes(self) -> List[Tuple[int, int]]:
+    return self._sizes
+
+  def __str__(self) -> str:
+    return self._full_name + ' ' + str(self._sheet_names)
+
+
 class SerialGroup(object):
   def __init__(self):
     self._serial = ""
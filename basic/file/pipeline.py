@@ -0,0 +1,190 @@
+"""
+    This module loads data in text files to Excel files with an asyncio pipeline, so that reading files,
+    parsing data and writing workbooks overlap.
+
+    Each sheet passes three stages:
+        read:   a text file is read by a thread pool.
+        parse:  the text is parsed to rows by a process pool.
+        write:  "SheetInfo"s are applied and the rows are written by a dedicated writer thread.
+    Stages are connected by bounded queues, so at most "queue_size" sheets wait between two stages and
+    memory stays bounded however many serials there are. Sheets reach the writer in the order of the data table.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Callable
+
+from basic.file import str_to_matrix, make_file_name
+from basic.file.files import TextFile, ExcelFile
+from basic.file.workbook import workbook_writers
+from basic.instrument import span, context
+from basic.list2d import Table
+from basic.sheetdata.sheetdata import SheetData
+
+
+def parse_text(text: str, serial: str = None, sheet_name: str = None) -> List[List[str]]:
+  """
+  Parses string data to rows. It runs in a process of the parse stage.
+  :param text: string data
+  :param serial: a serial of the data, recorded with the "parse" span
+  :param sheet_name: a worksheet name of the data, recorded with the "parse" span
+  :return: a list of rows.
+  """
+  with context(serial=serial, sheet=sheet_name):
+    return str_to_matrix(text).contents()
+
+
+def read_text(text_file: TextFile, serial: str = None, sheet_name: str = None) -> str:
+  """
+  Reads string data of a text file. It runs in a thread of the read stage.
+  :param text_file: a text file
+  :param serial: a serial of the data, recorded with the "read" span
+  :param sheet_name: a worksheet name of the data, recorded with the "read" span
+  :return: string data.
+  """
+  with span("read", serial=serial, sheet=sheet_name) as sp:
+    text = text_file.get_data()
+    sp["bytes"] = len(text)
+  return text
+
+
+def pipelined_text_to_excel(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile,
+                            save_names: List[str], progress: Callable[[str, str], None] = None,
+                            is_cancelled: Callable[[], bool] = None, backend: str = "excel", save_path: str = None,
+                            queue_size: int = 8, parse_workers: int = 2) -> List[str]:
+  """
+  Loads data in text files to Excel files like "text_to_excel", overlapping reading, parsing and writing.
+  It runs an event loop, so it must not be called from a running event loop; use "text_to_excel_async" there.
+  :param data_table: a table that contains text files, with a vertical header consisting of serials, and with
+                      a horizontal header consisting of "SheetData"s
+  :param excel_file: Excel file
+  :param save_names: a list of file names for new Excel files.
+  :param progress: a function called with a serial and a sheet name after each sheet is written, and with
+                   a serial and None after the Excel file of the serial is saved.
+  :param is_cancelled: a function checked before each Excel file is opened. If it returns True, loading stops
+                       and the names of the files saved so far are returned.
+  :param backend: the name of a writer in "workbook_writers".
+  :param save_path: a directory where new Excel files are saved. If it is None, they are saved in the directory
+                    of the text files.
+  :param queue_size: the maximum number of sheets waiting between two stages
+  :param parse_workers: the number of processes parsing text. If it is 1 or less, text is parsed in threads.
+  :return: a list of the names of saved Excel files.
+  """
+  loop = asyncio.new_event_loop()
+  try:
+    return loop.run_until_complete(text_to_excel_async(data_table, excel_file, save_names, progress, is_cancelled,
+                                                       backend, save_path, queue_size, parse_workers))
+  finally:
+    loop.close()
+
+
+async def text_to_excel_async(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile,
+                              save_names: List[str], progress: Callable[[str, str], None] = None,
+                              is_cancelled: Callable[[], bool] = None, backend: str = "excel", save_path: str = None,
+                              queue_size: int = 8, parse_workers: int = 2) -> List[str]:
+  """
+  A coroutine of "pipelined_text_to_excel". See it for parameters.
+  :return: a list of the names of saved Excel files.
+  """
+  loop = asyncio.get_event_loop()
+  read_queue = asyncio.Queue(maxsize=queue_size)
+  parse_queue = asyncio.Queue(maxsize=queue_size)
+
+  io_pool = ThreadPoolExecutor(max_workers=queue_size, thread_name_prefix="read")
+  cpu_pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 1 else io_pool
+  write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write")
+
+  async def read_stage():
+    for r in range(data_table.n_row):
+      for c in range(data_table.n_col):
+        tf = data_table.get(r, c)
+        text = loop.run_in_executor(io_pool, read_text, tf, data_table.header_v[r],
+                                    data_table.header_h[c].sheet_name) if tf is not None else None
+        await read_queue.put((r, c, tf, text))
+    await read_queue.put(None)
+
+  async def parse_stage():
+    while True:
+      item = await read_queue.get()
+      if item is None:
+        await parse_queue.put(None)
+        return
+      r, c, tf, text = item
+      rows = None
+      if text is not None:
+        try:
+          rows = loop.run_in_executor(cpu_pool, parse_text, await text, data_table.header_v[r],
+                                      data_table.header_h[c].sheet_name)
+        except Exception as e:
+          # the error is raised by the write stage when it reaches the sheet, like "text_to_excel" does.
+          rows = loop.create_future()
+          rows.set_exception(e)
+      await parse_queue.put((r, c, tf, rows))
+
+  async def write_stage() -> List[str]:
+    final_names = []
+    writer = workbook_writers[backend](excel_file)
+    path = excel_file.path if save_path is None else save_path
+    opened = False
+    try:
+      while True:
+        item = await parse_queue.get()
+        if item is None:
+          return final_names
+        r, c, tf, rows = item
+        serial, sd = data_table.header_v[r], data_table.header_h[c]
+        if c == 0:
+          if is_cancelled is not None and is_cancelled():
+            return final_names
+          await loop.run_in_executor(write_pool, _measure, "open", serial, None, writer.open)
+          opened = True
+
+        rows = await rows if rows is not None else None
+        if tf is not None:
+          path = tf.path if save_path is None else save_path
+        await loop.run_in_executor(write_pool, _measure, "write", serial, sd.sheet_name, writer.write_sheet, sd,
+                                   rows)
+        if progress is not None:
+          progress(serial, sd.sheet_name)
+
+        if c == data_table.n_col - 1:
+          file_name = make_file_name(path, serial, save_names[r])
+          await loop.run_in_executor(write_pool, _measure, "save", serial, None, writer.save, file_name)
+          opened = False
+          final_names.append(file_name)
+          if progress is not None:
+            progress(serial, None)
+    except BaseException:
+      # the copy of the template is closed, so it does not lock the template for later conversions.
+      if opened:
+        await loop.run_in_executor(write_pool, writer.discard)
+      raise
+
+  # Excel is used by one thread, so the writer thread attaches to it before writing anything.
+  if backend == "excel":
+    await loop.run_in_executor(write_pool, ExcelFile.attach_excel_app)
+  stages = [asyncio.ensure_future(read_stage()), asyncio.ensure_future(parse_stage())]
+  writing = asyncio.ensure_future(write_stage())
+  try:
+    # a stage which fails would leave the write stage waiting for the queue forever, so its error is raised.
+    pending = set(stages) | {writing}
+    while not writing.done():
+      done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+      for stage in done:
+        if stage is not writing and stage.exception() is not None:
+          raise stage.exception()
+    return writing.result()
+  finally:
+    for stage in stages + [writing]:
+      stage.cancel()
+    await asyncio.gather(*stages, writing, return_exceptions=True)
+    if backend == "excel":
+      await loop.run_in_executor(write_pool, ExcelFile.detach_excel_app)
+    write_pool.shutdown()
+    cpu_pool.shutdown()
+    io_pool.shutdown()
+
+
+def _measure(name: str, serial: str, sheet_name: str, function, *args):
+  with span(name, serial=serial, sheet=sheet_name):
+    return function(*args)
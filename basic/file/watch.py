@@ -0,0 +1,165 @@
+"""
+    This module has a class that watches a folder and converts the data files of each serial
+    as soon as they are complete.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import List, Callable
+
+from basic.file import scan_text_files, group_data_files, make_data_table, choose_data_files, text_to_excel
+from basic.file.files import TextFile, ExcelFile, SerialGroup
+from basic.sheetdata.sheetdata import SheetData
+
+
+class FolderWatcher(object):
+  """ This class watches a folder and converts the data files of each serial to an Excel file.
+
+      The files of a serial are complete when every data sheet of the template has a file and no file has
+      changed for "settle_period" seconds, or when no file has changed for "quiet_period" seconds.
+      Converted serials are saved in a state file, so they are not converted again after restarting.
+      A serial whose conversion fails is not converted again until one of its files changes.
+      Messages are written to the standard error, so the standard output has the summary of the caller only.
+
+      Attributes:
+          _directory: a folder to watch
+          _excel_file: an Excel file for a template
+          _sheet_data: a list of "SheetData"s of the template
+          _keyword: a keyword that only data sheets have
+          _save_name: a name inserted in the names of new Excel files
+          _state_file: a JSON file that has converted serials
+          _quiet_period: seconds without changes after which a serial is complete
+          _settle_period: seconds without changes after which a serial having all data sheets is complete
+          _recursive: whether subfolders are also watched
+          _backend: the name of a writer in "workbook_writers"
+          _save_path: a directory where new Excel files are saved. If it is None, the directory of text files.
+          _includes: glob patterns of file names to watch
+          _excludes: glob patterns of file names and folder names not to watch
+          _serial_pattern: a regular expression that the serial of a file must match, or None
+          _chunk_rows: the number of rows of text files read at a time, or None to read whole files
+          _done: a dictionary whose key is a converted serial and value is the name of its Excel file.
+          _failed: a dictionary whose key is a serial which failed and value is (the time of its newest file,
+                   the error).
+  """
+
+  def __init__(self, directory: str, excel_file: ExcelFile, sheet_data: List[SheetData], keyword: str = "",
+               save_name: str = "", state_file: str = None, quiet_period: float = 300, settle_period: float = 10,
+               recursive: bool = False, backend: str = "excel", save_path: str = None,
+               includes: List[str] = ("*.txt",), excludes: List[str] = (), serial_pattern: str = None,
+               chunk_rows: int = None):
+    self._directory = directory
+    self._excel_file = excel_file
+    self._sheet_data = sheet_data
+    self._keyword = keyword
+    self._save_name = save_name
+    self._state_file = state_file if state_file is not None else os.path.join(directory, ".text_to_excel.json")
+    self._quiet_period = quiet_period
+    self._settle_period = settle_period
+    self._recursive = recursive
+    self._backend = backend
+    self._save_path = save_path
+    self._includes = includes
+    self._excludes = excludes
+    self._serial_pattern = serial_pattern
+    self._chunk_rows = chunk_rows
+    self._done = {}
+    self._failed = {}
+    self.__load_state()
+
+  # Getters
+  @property
+  def done(self):
+    return self._done
+
+  @property
+  def failed(self):
+    """ :return: a dictionary whose key is a serial which failed and value is the error. """
+    return {serial: error for serial, (_, error) in self._failed.items()}
+
+  def complete_groups(self, now: float = None) -> List[SerialGroup]:
+    """
+    Returns the groups of serials whose files are complete and which are not converted yet.
+    :param now: the current time. If it is None, "time.time()" is used.
+    :return: a list of "SerialGroup"s.
+    """
+    now = time.time() if now is None else now
+    text_files: List[TextFile] = []
+    for files, _ in scan_text_files([self._directory], self._recursive, self._includes, self._excludes,
+                                    self._serial_pattern):
+      text_files.extend(tf for tf in files if tf.serial not in self._done)
+
+    result = []
+    data_sheets = [c for c, sd in enumerate(self._sheet_data) if self._keyword in sd.sheet_name]
+    for sg in group_data_files(text_files):
+      newest = self.__newest(sg)
+      if sg.serial in self._failed and self._failed[sg.serial][0] == newest:
+        continue
+      quiet = now - newest
+      row = make_data_table([sg], self._sheet_data, self._keyword).get_row(0)
+      covered = all(len(row[c]) != 0 for c in data_sheets)
+      if quiet >= self._quiet_period or (covered and quiet >= self._settle_period):
+        result.append(sg)
+    return result
+
+  def poll(self, now: float = None) -> List[str]:
+    """
+    Converts complete serials once.
+    :param now: the current time. If it is None, "time.time()" is used.
+    :return: a list of the names of new Excel files.
+    """
+    final_names = []
+    for sg in self.complete_groups(now):
+      data_table = choose_data_files(make_data_table([sg], self._sheet_data, self._keyword))
+      try:
+        file_name = text_to_excel(data_table, self._excel_file, [self._save_name], backend=self._backend,
+                                  save_path=self._save_path, chunk_rows=self._chunk_rows)[0]
+      except Exception as e:
+        self._failed[sg.serial] = (self.__newest(sg), type(e).__name__ + ": " + str(e))
+        print("Serial " + sg.serial + " is not converted: " + self._failed[sg.serial][1], file=sys.stderr)
+        continue
+      self._failed.pop(sg.serial, None)
+      self._done[sg.serial] = file_name
+      self.__save_state()
+      final_names.append(file_name)
+      print("Serial " + sg.serial + " is converted to " + file_name, file=sys.stderr)
+    return final_names
+
+  def run(self, interval: float = 10, is_stopped: Callable[[], bool] = None):
+    """
+    Converts complete serials repeatedly until it is stopped.
+    :param interval: seconds between polls
+    :param is_stopped: a function checked after each poll. If it returns True, watching stops.
+    """
+    while is_stopped is None or not is_stopped():
+      try:
+        self.poll()
+      except Exception as e:
+        print("Error while watching " + self._directory + ": " + str(e), file=sys.stderr)
+      time.sleep(interval)
+
+  @staticmethod
+  def __newest(serial_group: SerialGroup) -> float:
+    """ Returns the modification time of the newest file of a serial. A file which is removed is ignored. """
+    times = []
+    for tf in serial_group:
+      try:
+        times.append(os.stat(tf.full_name).st_mtime)
+      except OSError:
+        pass
+    return max(times + [0])
+
+  def __load_state(self):
+    try:
+      with open(self._state_file) as f:
+        self._done = json.load(f).get("done", {})
+    except FileNotFoundError:
+      self._done = {}
+
+  def __save_state(self):
+    """ Saves the state file atomically, so a crash never leaves a broken state file. """
+    temp_file = self._state_file + ".tmp"
+    with open(temp_file, "w") as f:
+      json.dump({"done": self._done}, f, indent=2)
+    os.replace(temp_file, self._state_file)
@@ -0,0 +1,167 @@
+"""
+    This module has classes that write data to a copy of a template Excel file.
+
+    Data which do not fit in a worksheet continue in new worksheets after it, such as "Sheet (2)", and the header
+    rows are repeated at their top. The number of header rows is "header=" of the row filter of the worksheet,
+    or "HEADER_ROWS".
+"""
+
+import abc
+from typing import List, Iterator
+
+from basic.file.files import ExcelFile
+from basic.file.xlsx import XlsxBook, split_blocks, continuation_name
+from basic.instrument import span
+from basic.sheetdata.sheetdata import SheetData
+from basic.sheetdata.sheetinfo import sheet_infos, DataTransformInfo, RowFilterInfo
+
+HEADER_ROWS = 1  # the number of header rows of a worksheet without "header=" in its row filter
+
+
+def header_rows(sheet_data: SheetData) -> int:
+  """
+  :param sheet_data: "SheetData" of a worksheet
+  :return: the number of rows repeated at the top of worksheets that continue the worksheet.
+  """
+  for si in sheet_infos:
+    if isinstance(si, RowFilterInfo):
+      n_rows = si.header_rows(sheet_data[si])
+      if n_rows is not None:
+        return n_rows
+  return HEADER_ROWS
+
+
+class WorkbookWriter(object):
+  """ This abstract class writes data of worksheets to a copy of a template and saves it.
+
+      Attributes:
+          _excel_file: an Excel file for a template.
+  """
+  __metaclass__ = abc.ABCMeta
+
+  def __init__(self, excel_file: ExcelFile):
+    self._excel_file = excel_file
+
+  @abc.abstractmethod
+  def open(self):
+    """ Opens a copy of the template. """
+    pass
+
+  @abc.abstractmethod
+  def write_sheet(self, sheet_data: SheetData, rows: List[List]):
+    """
+    Writes data to a worksheet from "A1", and manipulates the worksheet with "SheetInfo"s.
+    :param sheet_data: "SheetData" of the worksheet
+    :param rows: two-dimensional list of data. If it is None, only "SheetInfo"s are applied.
+    """
+    pass
+
+  def write_sheet_chunks(self, sheet_data: SheetData, chunks: Iterator[List[List]]):
+    """
+    Writes data in chunks of rows to a worksheet from "A1", like "write_sheet".
+    The chunks are joined and written with "write_sheet" by default.
+    :param sheet_data: "SheetData" of the worksheet
+    :param chunks: an iterator of two-dimensional lists of data in the order of rows
+    """
+    rows = []
+    for chunk in chunks:
+      rows.extend(chunk)
+    self.write_sheet(sheet_data, rows)
+
+  @abc.abstractmethod
+  def save(self, full_name: str):
+    """
+    Saves the copy as a new Excel file and closes it.
+    :param full_name: the full name of a new Excel file.
+    """
+    pass
+
+  @abc.abstractmethod
+  def discard(self):
+    """ Closes the copy without saving it, and removes its temporary files. It is called when writing fails. """
+    pass
+
+
+class ExcelWriter(WorkbookWriter):
+  """ This class writes data with Excel. "ExcelFile.open_excel_app" must be called before.
+
+      Attributes:
+          _book: xlwings "Book" object of the opened copy.
+  """
+
+  def __init__(self, excel_file: ExcelFile):
+    super(ExcelWriter, self).__init__(excel_file)
+    self._book = None
+
+  def open(self):
+    self._book = self._excel_file.open()
+
+  def write_sheet(self, sheet_data: SheetData, rows: List[List]):
+    sheets = [self._book.sheets[sheet_data.sheet_name]]
+    if rows is None:
+      for si in sheet_infos:
+        if not isinstance(si, DataTransformInfo):
+          si.apply_info_to_sheet(sheets[0], sheet_data[si])
+      return
+    # missing values are masked before the transforms like "XlsxWriter", so both backends keep the same rows.
+    for si in sheet_infos:
+      rows = si.apply_info_to_data(rows, sheet_data[si])
+    for i, block in enumerate(split_blocks(rows, header_rows(sheet_data))):
+      if i != 0:
+        name = continuation_name(sheet_data.sheet_name, [sheet.name for sheet in self._book.sheets])
+        sheets.append(self._book.sheets.add(name, after=sheets[-1]))
+      if len(block) != 0:
+        with span("com_write", cells=sum(len(r) for r in block)):
+          sheets[-1].range((1, 1)).value = block
+        with span("autofit"):
+          sheets[-1].autofit('r')
+
+  def save(self, full_name: str):
+    self._excel_file.save_file_name = full_name
+    self._excel_file.close()
+    self._book = None
+
+  def discard(self):
+    self._excel_file.discard()
+    self._book = None
+
+
+class XlsxWriter(WorkbookWriter):
+  """ This class writes data directly into the zip archive of the template, without Excel.
+      Worksheets without data are not changed.
+
+      Attributes:
+          _book: "XlsxBook" object of the copy.
+  """
+
+  def __init__(self, excel_file: ExcelFile):
+    super(XlsxWriter, self).__init__(excel_file)
+    self._book = None
+
+  def open(self):
+    self._book = XlsxBook(self._excel_file.full_name)
+
+  def write_sheet(self, sheet_data: SheetData, rows: List[List]):
+    if rows is None:
+      return
+    for si in sheet_infos:
+      rows = si.apply_info_to_data(rows, sheet_data[si])
+    self._book.write_split_rows(sheet_data.sheet_name, rows, header_rows(sheet_data))
+
+  def write_sheet_chunks(self, sheet_data: SheetData, chunks: Iterator[List[List]]):
+    """ Each chunk is transformed and appended to the XML of the worksheet in a temporary file as it comes. """
+    for si in sheet_infos:
+      chunks = si.apply_info_to_chunks(chunks, sheet_data[si])
+    self._book.write_row_chunks(sheet_data.sheet_name, chunks, header_rows(sheet_data))
+
+  def save(self, full_name: str):
+    self._book.save(full_name)
+    self._book = None
+
+  def discard(self):
+    if self._book is not None:
+      self._book.discard()
+    self._book = None
+
+
+workbook_writers = {"excel": ExcelWriter, "xlsx": XlsxWriter}  # global variable that contains writers by name.
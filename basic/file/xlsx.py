@@ -0,0 +1,780 @@
+"""
+    This module reads and writes Excel files (.xlsx) directly in their zip archives, without Excel.
+"""
+
+import math
+import os
+import re
+import struct
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List, Tuple, Iterator, Dict
+
+from basic.errors import InvalidFileFormatError
+from basic.file.files import TemplateInfo
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORKSHEET_TYPE = NS_REL + "/worksheet"
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+MAX_ROWS = 1048576  # the number of rows of a worksheet
+MAX_COLS = 16384  # the number of columns of a worksheet
+
+_CELL_REFERENCE = re.compile(r"\$?([A-Za-z]{1,3})\$?([0-9]{1,7})$")
+
+
+def column_index(letters: str) -> int:
+  """
+  Returns a column index from column letters. "A" is 1.
+  :param letters: column letters such as "AB"
+  :return: a column index starting from 1.
+  """
+  index = 0
+  for letter in letters.upper():
+    index = index * 26 + ord(letter) - ord('A') + 1
+  return index
+
+
+def column_letters(index: int) -> str:
+  """
+  Returns column letters from a column index. 1 is "A".
+  :param index: a column index starting from 1.
+  :return: column letters such as "AB".
+  """
+  letters = ""
+  while index > 0:
+    index, rest = divmod(index - 1, 26)
+    letters = chr(ord('A') + rest) + letters
+  return letters
+
+
+def split_cell_reference(reference: str) -> Tuple[int, int]:
+  """
+  Returns a row and a column from a cell reference.
+  :param reference: a cell reference such as "B3" or "$B$3".
+  :return: a tuple of a row and a column, both starting from 1.
+  :raise ValueError: if the reference is not a cell reference.
+  """
+  m = _CELL_REFERENCE.match(reference)
+  if m is None:
+    raise ValueError("Invalid cell reference: " + reference)
+  return int(m.group(2)), column_index(m.group(1))
+
+
+def range_size(reference: str) -> Tuple[int, int]:
+  """
+  Returns the number of rows and columns of a range.
+  :param reference: a range reference such as "A1:F40". A single cell such as "A1" is also possible.
+  :return: a tuple of the number of rows and the number of columns.
+  """
+  cells = reference.split(':')
+  first_row, first_col = split_cell_reference(cells[0])
+  last_row, last_col = split_cell_reference(cells[-1])
+  return last_row - first_row + 1, last_col - first_col + 1
+
+
+def worksheet_paths(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+  """
+  Returns the names and the archive paths of worksheets in the order of the workbook.
+  Chart sheets and dialog sheets are not included.
+  :param archive: the zip archive of an Excel file.
+  :return: a list of (worksheet name, path in the archive).
+  """
+  targets = {}
+  rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+  for rel in rels.iter("{%s}Relationship" % NS_PKG_REL):
+    if rel.get("Type") == WORKSHEET_TYPE:
+      target = rel.get("Target")
+      targets[rel.get("Id")] = target[1:] if target.startswith('/') else "xl/" + target
+
+  result = []
+  workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+  for sheet in workbook.iter("{%s}sheet" % NS_MAIN):
+    rel_id = sheet.get("{%s}id" % NS_REL)
+    if rel_id in targets:
+      result.append((sheet.get("name"), targets[rel_id]))
+  return result
+
+
+def read_dimension(archive: zipfile.ZipFile, path: str) -> str:
+  """
+  Returns the used range of a worksheet. The "dimension" tag at the beginning of the worksheet is used.
+  If there is no tag, cells are scanned.
+  :param archive: the zip archive of an Excel file.
+  :param path: the path of a worksheet in the archive.
+  :return: the used range such as "A1:F40".
+  """
+  max_row, max_col = 1, 1
+  with archive.open(path) as f:
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+      if event == "start" and elem.tag == "{%s}dimension" % NS_MAIN:
+        return elem.get("ref").replace('$', '')
+      if event == "end" and elem.tag == "{%s}c" % NS_MAIN:
+        row, col = split_cell_reference(elem.get("r"))
+        max_row, max_col = max(max_row, row), max(max_col, col)
+      if event == "end" and elem.tag == "{%s}row" % NS_MAIN:
+        elem.clear()
+  return "A1" if (max_row, max_col) == (1, 1) else "A1:" + column_letters(max_col) + str(max_row)
+
+
+def read_template_info(full_name: str) -> TemplateInfo:
+  """
+  Reads the names, used ranges and sizes of worksheets of an Excel file without Excel.
+  :param full_name: the full name of an Excel file.
+  :return: "TemplateInfo" of the file.
+  :raise InvalidFileFormatError: if the file is not an Excel 2007 (.xlsx) file.
+  """
+  mtime = os.stat(full_name).st_mtime
+  try:
+    archive = zipfile.ZipFile(full_name)
+  except zipfile.BadZipFile:
+    raise InvalidFileFormatError(full_name + " is not an Excel 2007 (.xlsx) file.")
+
+  with archive:
+    sheet_names, used_ranges, sizes = [], [], []
+    for name, path in worksheet_paths(archive):
+      used_range = read_dimension(archive, path)
+      sheet_names.append(name)
+      used_ranges.append(used_range)
+      sizes.append(range_size(used_range))
+  return TemplateInfo(full_name, mtime, sheet_names, used_ranges, sizes)
+
+
+_NUMBER = re.compile(r"\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$")
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_DATA = re.compile(r"<sheetData\s*/>|<sheetData>(.*?)</sheetData>", re.S)
+_ROW = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL = re.compile(r"<c\b([^>]*?)(?:/>|>.*?</c>)", re.S)
+_ATTR_R = re.compile(r'\br="\$?([A-Za-z]*)\$?([0-9]+)"')
+_DIMENSION = re.compile(r'<dimension ref="[^"]*"\s*/>')
+_AFTER_CALC_PR = re.compile(r"<(oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|webPublishing"
+                            r"|fileRecoveryPr|webPublishObjects|extLst)\b|</workbook>")
+
+BLANK_WORKBOOK = {
+  "[Content_Types].xml":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>',
+  "_rels/.rels":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="' + NS_PKG_REL + '">'
+    '<Relationship Id="rId1" Type="' + NS_REL + '/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>',
+  "xl/workbook.xml":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="' + NS_MAIN + '" xmlns:r="' + NS_REL + '">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>',
+  "xl/_rels/workbook.xml.rels":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="' + NS_PKG_REL + '">'
+    '<Relationship Id="rId1" Type="' + WORKSHEET_TYPE + '" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="' + NS_REL + '/styles" Target="styles.xml"/>'
+    '</Relationships>',
+  "xl/worksheets/sheet1.xml":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="' + NS_MAIN + '" xmlns:r="' + NS_REL + '">'
+    '<dimension ref="A1"/><sheetData/></worksheet>',
+  "xl/styles.xml":
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="' + NS_MAIN + '">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '</styleSheet>',
+}
+
+
+def escape(value: str) -> str:
+  """
+  Escapes "&", "<" and ">" of a string for XML.
+  :param value: a string
+  :return: the escaped string.
+  """
+  return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def cell_xml(row: int, col: int, value) -> str:
+  """
+  Returns the XML of a cell. A string that looks like a number is written as a number, like Excel does.
+  A number which is not finite, such as "1e400", is written as a string, because a worksheet cannot have it.
+  :param row: a row starting from 1
+  :param col: a column starting from 1
+  :param value: a value of the cell. None and an empty string make no cell.
+  :return: the XML of the cell.
+  """
+  if value is None or value == "":
+    return ""
+  reference = column_letters(col) + str(row)
+  if isinstance(value, bool):
+    return '<c r="%s" t="b"><v>%d</v></c>' % (reference, value)
+  if isinstance(value, int) or isinstance(value, float) and math.isfinite(value):
+    return '<c r="%s"><v>%s</v></c>' % (reference, repr(float(value)) if isinstance(value, float) else value)
+  value = str(value)
+  if _NUMBER.match(value) and math.isfinite(float(value)):
+    return '<c r="%s"><v>%s</v></c>' % (reference, repr(float(value)))
+  return '<c r="%s" t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' \
+         % (reference, escape(_ILLEGAL_XML.sub("", value)))
+
+
+def continuation_name(sheet_name: str, sheet_names: List[str]) -> str:
+  """
+  Returns the name of a new worksheet that continues a worksheet, such as "Sheet (2)" and "Sheet (3)".
+  :param sheet_name: the name of the continued worksheet
+  :param sheet_names: the names of existing worksheets, which the new name is not one of
+  :return: the name of the new worksheet, at most 31 letters like Excel allows.
+  """
+  number = 2
+  while True:
+    suffix = " (" + str(number) + ")"
+    name = sheet_name[:31 - len(suffix)] + suffix
+    if name not in sheet_names:
+      return name
+    number += 1
+
+
+def split_blocks(rows: List[List], header_rows: int = 1, max_rows: int = None, max_cols: int = None) \
+    -> Iterator[List[List]]:
+  """
+  Splits rows into blocks which fit in a worksheet. The first block starts with the first row, and each next
+  block starts with the header rows again. A block wider than a worksheet is split again by columns.
+  Rows are removed from "rows" as blocks are made, so rows are released once their block is written.
+  :param rows: two-dimensional list of data
+  :param header_rows: the number of rows repeated at the top of each next block
+  :param max_rows: the number of rows of a block. If it is None, "MAX_ROWS".
+  :param max_cols: the number of columns of a block. If it is None, "MAX_COLS".
+  :return: an iterator of blocks in the order of worksheets. There is at least one block.
+  """
+  max_rows = MAX_ROWS if max_rows is None else max_rows
+  max_cols = MAX_COLS if max_cols is None else max_cols
+  headers = [list(r) for r in rows[:min(header_rows, max_rows - 1)]] if len(rows) > max_rows else []
+
+  first = True
+  while first or len(rows) != 0:
+    n_rows = max_rows if first else max_rows - len(headers)
+    block = rows[:n_rows] if first else headers + rows[:n_rows]
+    del rows[:n_rows]
+    first = False
+    n_cols = max([len(r) for r in block] + [0])
+    if n_cols <= max_cols:
+      yield block
+    else:
+      for c in range(0, n_cols, max_cols):
+        yield [r[c:c + max_cols] for r in block]
+
+
+def written_value(value):
+  """
+  Returns the value which "read_range" reads from a cell written by "cell_xml", without writing it.
+  :param value: a value of a cell
+  :return: float for a number, None for an empty cell, and the value for others.
+  """
+  if value is None or value == "":
+    return None
+  if isinstance(value, bool):
+    return value
+  if isinstance(value, int) or isinstance(value, float) and math.isfinite(value):
+    return float(value)
+  value = str(value)
+  if _NUMBER.match(value) and math.isfinite(float(value)):
+    return float(value)
+  return _ILLEGAL_XML.sub("", value)
+
+
+def patch_sheet_data(xml: str, rows: List[List]) -> str:
+  """
+  Writes rows from "A1" into the XML of a worksheet.
+  Cells in the rectangle of the rows are replaced. Other cells of the worksheet are kept.
+  :param xml: the XML of a worksheet
+  :param rows: two-dimensional list of data
+  :return: the XML of the worksheet with the rows.
+  """
+  n_row = len(rows)
+  n_col = max([len(r) for r in rows] + [0])
+
+  m = _SHEET_DATA.search(xml)
+  old_rows = {}
+  for r, (attrs, cells) in _read_rows(m.group(1) or "").items():
+    old_rows[r] = (attrs, [cell for col, cell in cells if r > n_row or col > n_col])
+
+  parts = ["<sheetData>"]
+  max_row, max_col = max(n_row, 1), max(n_col, 1)
+  for r in range(1, max(n_row, max(old_rows.keys(), default=0)) + 1):
+    attrs, kept = old_rows.get(r, (' r="%d"' % r, []))
+    cells = [cell_xml(r, c + 1, v) for c, v in enumerate(rows[r - 1])] if r <= n_row else []
+    if len(kept) != 0:
+      max_row = max(max_row, r)
+      max_col = max(max_col, column_index(_ATTR_R.search(kept[-1]).group(1)))
+    if r in old_rows or any(cells):
+      parts.append("<row%s>%s%s</row>" % (attrs, "".join(cells), "".join(kept)))
+  parts.append("</sheetData>")
+
+  xml = xml[:m.start()] + "".join(parts) + xml[m.end():]
+  return _DIMENSION.sub('<dimension ref="A1:%s%d"/>' % (column_letters(max_col), max_row), xml, count=1)
+
+
+def _read_rows(sheet_data: str) -> Dict[int, Tuple[str, List[Tuple[int, str]]]]:
+  """
+  :param sheet_data: the XML inside "sheetData" of a worksheet
+  :return: a dictionary whose key is a row from 1 and value is (the attributes of the row without "spans",
+           a list of (column from 1, the XML of a cell)).
+  """
+  rows = {}
+  for row_match in _ROW.finditer(sheet_data):
+    r = int(re.search(r'\br="([0-9]+)"', row_match.group(1)).group(1))
+    attrs = re.sub(r'\s+spans="[^"]*"', "", row_match.group(1))
+    cells = [(column_index(_ATTR_R.search(cell_match.group(1)).group(1)), cell_match.group(0))
+             for cell_match in _CELL.finditer(row_match.group(2) or "")]
+    rows[r] = (attrs, cells)
+  return rows
+
+
+class SheetStream(object):
+  """ This class writes rows of a worksheet to a temporary file as they come, instead of keeping the XML in
+      memory. The worksheet is the same as "patch_sheet_data" with all the rows: cells of the template in the
+      rectangle of the rows are replaced, and other cells are kept. The rectangle is known at the end only,
+      so kept cells are added when the worksheet is written to an archive.
+
+      Attributes:
+          _head: the XML of the worksheet before "sheetData"
+          _tail: the XML of the worksheet after "sheetData"
+          _old_rows: rows of the template from "_read_rows"
+          _file_name: the name of a temporary file which has a line of "<row number>\t<cells>" for each row.
+                      It is open only while rows are appended or written, so a book can have many streams.
+          _n_row: the number of rows
+          _n_col: the number of columns of the widest row
+  """
+
+  def __init__(self, xml: str):
+    """
+    :param xml: the XML of a worksheet of a template
+    """
+    m = _SHEET_DATA.search(xml)
+    self._head = xml[:m.start()]
+    self._tail = xml[m.end():]
+    self._old_rows = _read_rows(m.group(1) or "")
+    fd, self._file_name = tempfile.mkstemp(suffix=".rows")
+    os.close(fd)
+    self._n_row = 0
+    self._n_col = 0
+
+  # Getters
+  @property
+  def n_row(self) -> int:
+    return self._n_row
+
+  def append(self, rows: List[List]):
+    """
+    Writes rows below the rows written before.
+    :param rows: two-dimensional list of data
+    """
+    lines = []
+    for row in rows:
+      self._n_row += 1
+      if len(row) > self._n_col:
+        self._n_col = len(row)
+      cells = "".join([cell_xml(self._n_row, c + 1, v) for c, v in enumerate(row)])
+      if len(cells) != 0 or self._n_row in self._old_rows:
+        lines.append(str(self._n_row) + "\t" + cells.replace("\n", "&#10;") + "\n")
+    with open(self._file_name, "a", encoding="utf-8", newline="\n") as file:
+      file.writelines(lines)
+
+  def write_to(self, f):
+    """
+    Writes the worksheet and closes the temporary file.
+    :param f: a binary file such as an entry of a zip archive
+    """
+    n_row, n_col = self._n_row, self._n_col
+    kept = {r: [cell for col, cell in cells if r > n_row or col > n_col]
+            for r, (attrs, cells) in self._old_rows.items()}
+    max_row, max_col = max(n_row, 1), max(n_col, 1)
+    for r, cells in kept.items():
+      if len(cells) != 0:
+        max_row = max(max_row, r)
+        max_col = max(max_col, column_index(_ATTR_R.search(cells[-1]).group(1)))
+
+    head = _DIMENSION.sub('<dimension ref="A1:%s%d"/>' % (column_letters(max_col), max_row), self._head, count=1)
+    f.write((head + "<sheetData>").encode("utf-8"))
+    with open(self._file_name, encoding="utf-8", newline="\n") as file:
+      for line in file:
+        number, cells = line[:-1].split("\t", 1)
+        r = int(number)
+        attrs = self._old_rows[r][0] if r in self._old_rows else ' r="%d"' % r
+        f.write(("<row%s>%s%s</row>" % (attrs, cells, "".join(kept.get(r, [])))).encode("utf-8"))
+    for r in sorted(r for r in self._old_rows if r > n_row):
+      f.write(("<row%s>%s</row>" % (self._old_rows[r][0], "".join(kept[r]))).encode("utf-8"))
+    f.write(("</sheetData>" + self._tail).encode("utf-8"))
+    self.close()
+
+  def close(self):
+    """ Removes the temporary file. """
+    if self._file_name is not None and os.path.exists(self._file_name):
+      os.remove(self._file_name)
+    self._file_name = None
+
+  def __del__(self):
+    self.close()
+
+
+_CHANGED_ON_SAVE = ("xl/workbook.xml", "[Content_Types].xml", "xl/_rels/workbook.xml.rels")
+_COPY_BLOCK = 1 << 20
+
+
+def _copy_entry(out: zipfile.ZipFile, source: zipfile.ZipFile, info: zipfile.ZipInfo):
+  """
+  Copies an entry of a zip archive to another without decompressing and compressing it again, so the time of
+  copying a template depends on its size only. "zipfile" has no API for it, so the compressed data are written
+  after a local header like "ZipFile.writestr" does.
+  :param out: a zip archive opened for writing
+  :param source: a zip archive opened for reading
+  :param info: "ZipInfo" of the entry in "source"
+  """
+  source.fp.seek(info.header_offset)
+  header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+  source.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+  copied = zipfile.ZipInfo(info.filename, info.date_time)
+  copied.compress_type = info.compress_type
+  copied.CRC = info.CRC
+  copied.compress_size = info.compress_size
+  copied.file_size = info.file_size
+  copied.external_attr = info.external_attr
+  copied.internal_attr = info.internal_attr
+  copied.create_system = info.create_system
+  # sizes and CRC are in the local header, so there is no data descriptor after the data.
+  copied.flag_bits = info.flag_bits & ~0x08
+  copied.header_offset = out.fp.tell()
+  out.fp.write(copied.FileHeader())
+  left = info.compress_size
+  while left > 0:
+    block = source.fp.read(min(left, _COPY_BLOCK))
+    if len(block) == 0:
+      raise zipfile.BadZipFile("Truncated entry " + info.filename)
+    out.fp.write(block)
+    left -= len(block)
+  out.filelist.append(copied)
+  out.NameToInfo[copied.filename] = copied
+  out.start_dir = out.fp.tell()
+  out._didModify = True
+
+
+class XlsxBook(object):
+  """ This class represents an Excel file written directly into its zip archive, without Excel.
+
+      Attributes:
+          _full_name: the full name of a template Excel file. If it is None, the book is a blank workbook.
+          _sheet_paths: a dictionary whose key is a worksheet name and value is its path in the archive.
+          _written: a dictionary whose key is a path in the archive and value is the new XML.
+          _added: paths of worksheets added to the archive
+  """
+
+  def __init__(self, full_name: str = None):
+    """
+    :param full_name: the full name of a template Excel file. If it is None, a blank workbook with "Sheet1".
+    """
+    self._full_name = full_name
+    self._written = {}
+    self._added = []
+    if full_name is None:
+      self._sheet_paths = {"Sheet1": "xl/worksheets/sheet1.xml"}
+    else:
+      with zipfile.ZipFile(full_name) as archive:
+        self._sheet_paths = dict(worksheet_paths(archive))
+
+  # Getters
+  @property
+  def sheet_names(self) -> List[str]:
+    return list(self._sheet_paths.keys())
+
+  def write_rows(self, sheet_name: str, rows: List[List]):
+    """
+    Writes rows from "A1" of a worksheet.
+    :param sheet_name: a worksheet name
+    :param rows: two-dimensional list of data
+    :raise KeyError: if there is no worksheet with the name.
+    """
+    path = self._sheet_paths[sheet_name]
+    self._written[path] = patch_sheet_data(self.__read(path), rows)
+
+  def write_split_rows(self, sheet_name: str, rows: List[List], header_rows: int = 1) -> List[str]:
+    """
+    Writes rows from "A1" of a worksheet. Rows which do not fit in the worksheet are written to new worksheets
+    after it, such as "Sheet (2)", with the header rows at their top. See "split_blocks".
+    :param sheet_name: a worksheet name
+    :param rows: two-dimensional list of data. Rows are removed from it as they are written.
+    :param header_rows: the number of rows repeated at the top of each new worksheet
+    :return: the names of the worksheets which rows are written to.
+    :raise KeyError: if there is no worksheet with the name.
+    """
+    names = []
+    for block in split_blocks(rows, header_rows):
+      if len(names) == 0:
+        name = sheet_name
+      else:
+        name = continuation_name(sheet_name, self.sheet_names)
+        self.add_sheet(name, names[-1])
+      names.append(name)
+      self.write_rows(name, block)
+    return names
+
+  def write_row_chunks(self, sheet_name: str, chunks: Iterator[List[List]], header_rows: int = 1) -> List[str]:
+    """
+    Writes chunks of rows from "A1" of a worksheet like "write_split_rows", but each chunk is written to
+    a temporary file as it comes, so only one chunk is in memory. The worksheet cannot be written again.
+    :param sheet_name: a worksheet name
+    :param chunks: an iterator of two-dimensional lists of data in the order of rows
+    :param header_rows: the number of rows repeated at the top of each new worksheet
+    :return: the names of the worksheets which rows are written to.
+    :raise KeyError: if there is no worksheet with the name.
+    """
+    max_rows, max_cols = MAX_ROWS, MAX_COLS
+    names = [sheet_name]
+    streams = [SheetStream(self.__read(self._sheet_paths[sheet_name]))]
+    self._written[self._sheet_paths[sheet_name]] = streams[0]
+    headers = []
+    n_rows, n_total = 0, 0
+
+    for chunk in chunks:
+      start = 0
+      while start < len(chunk):
+        block = []
+        if n_rows == max_rows:
+          # the worksheets of the block are full, so the next block starts with the header rows.
+          streams = [self.__add_stream(sheet_name, names)]
+          block, n_rows = list(headers), 0
+        rows = chunk[start:start + max_rows - n_rows - len(block)]
+        if n_rows == n_total:
+          headers.extend(list(r) for r in rows[:min(header_rows, max_rows - 1) - len(headers)])
+        n_total += len(rows)
+        block.extend(rows)
+        start += len(rows)
+        n_rows += len(block)
+
+        n_cols = max([len(r) for r in block] + [0])
+        while len(streams) * max_cols < n_cols:
+          streams.append(self.__add_stream(sheet_name, names))
+          streams[-1].append([[]] * streams[0].n_row)
+        if len(streams) == 1:
+          streams[0].append(block)
+        else:
+          for i, stream in enumerate(streams):
+            stream.append([r[i * max_cols:(i + 1) * max_cols] for r in block])
+    return names
+
+  def __add_stream(self, sheet_name: str, names: List[str]) -> SheetStream:
+    """ Adds a worksheet after the last of "names" to continue a worksheet, and returns its stream. """
+    name = continuation_name(sheet_name, self.sheet_names)
+    self.add_sheet(name, names[-1])
+    names.append(name)
+    path = self._sheet_paths[name]
+    self._written[path] = SheetStream(self._written[path])
+    return self._written[path]
+
+  def add_sheet(self, sheet_name: str, after: str = None, like: str = None):
+    """
+    Adds a blank worksheet.
+    :param sheet_name: the name of the new worksheet
+    :param after: the name of a worksheet which the new worksheet is placed after. If it is None, it is last.
+    :param like: the name of a worksheet of the template which the new worksheet is a copy of, with its cells,
+                 column widths and styles. A worksheet with relationships, such as drawings and comments, cannot
+                 be copied, so the new worksheet is blank then.
+    :raise ValueError: if there is already a worksheet with the name, or "like" has been written in chunks.
+    """
+    if sheet_name in self._sheet_paths:
+      raise ValueError("There is already a worksheet '" + sheet_name + "'.")
+    entries = set(self.__entries())
+    sheet_xml = BLANK_WORKBOOK["xl/worksheets/sheet1.xml"]
+    if like is not None:
+      like_path = self._sheet_paths[like]
+      folder, base = like_path.rsplit("/", 1)
+      if folder + "/_rels/" + base + ".rels" not in entries:
+        sheet_xml = self.__read(like_path)
+        if not isinstance(sheet_xml, str):
+          raise ValueError("The worksheet '" + like + "' has been written in chunks.")
+        sheet_xml = re.sub(r'\s+tabSelected="[^"]*"', "", sheet_xml)
+    number = 1
+    while "xl/worksheets/sheet%d.xml" % number in entries:
+      number += 1
+    path = "xl/worksheets/sheet%d.xml" % number
+
+    rels = self.__read("xl/_rels/workbook.xml.rels")
+    ids = set(re.findall(r'\bId="([^"]*)"', rels))
+    rel_number = 1
+    while "rId%d" % rel_number in ids:
+      rel_number += 1
+    rel_id = "rId%d" % rel_number
+    self._written["xl/_rels/workbook.xml.rels"] = rels.replace(
+      "</Relationships>",
+      '<Relationship Id="%s" Type="%s" Target="worksheets/sheet%d.xml"/></Relationships>'
+      % (rel_id, WORKSHEET_TYPE, number))
+
+    content_types = self.__read("[Content_Types].xml")
+    self._written["[Content_Types].xml"] = content_types.replace(
+      "</Types>", '<Override PartName="/%s" ContentType="%s"/></Types>' % (path, WORKSHEET_CONTENT_TYPE))
+
+    # the sheet is inserted after "after", and sheet-local defined names of sheets after it move by one.
+    workbook = self.__read("xl/workbook.xml")
+    sheets = list(re.finditer(r'<sheet\b[^>]*?/>', workbook))
+    names = self.sheet_names
+    position = names.index(after) + 1 if after is not None else len(names)
+    prefix = re.search(r'(\w+):id="', sheets[0].group(0)).group(1) if len(sheets) != 0 else "r"
+    sheet_id = max([int(i) for i in re.findall(r'\bsheetId="(\d+)"', workbook)] + [0]) + 1
+    element = '<sheet name="%s" sheetId="%d" %s:id="%s"/>' \
+              % (escape(sheet_name).replace('"', "&quot;"), sheet_id, prefix, rel_id)
+    index = sheets[position - 1].end() if position != 0 else workbook.index("<sheets>") + len("<sheets>")
+    workbook = workbook[:index] + element + workbook[index:]
+    workbook = re.sub(r'\blocalSheetId="(\d+)"',
+                      lambda m: 'localSheetId="%d"' % (int(m.group(1)) + (int(m.group(1)) >= position)), workbook)
+    self._written["xl/workbook.xml"] = workbook
+
+    self._written[path] = sheet_xml
+    self._added.append(path)
+    items = list(self._sheet_paths.items())
+    items.insert(position, (sheet_name, path))
+    self._sheet_paths = dict(items)
+
+  def save(self, full_name: str):
+    """
+    Saves the book as a new Excel file. The workbook recalculates formulas when Excel opens it.
+    Only written worksheets and the workbook parts which list worksheets are written again. Other entries of
+    the template are copied without being decompressed, so heavy formatting, charts and images cost a copy only.
+    :param full_name: the full name of a new Excel file.
+    """
+    # a temporary file created exclusively next to the new file, so writers never collide even on a shared folder.
+    fd, temp_name = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(full_name) + ".",
+                                      dir=os.path.dirname(os.path.abspath(full_name)))
+    os.close(fd)
+    source = zipfile.ZipFile(self._full_name) if self._full_name is not None else None
+    try:
+      with zipfile.ZipFile(temp_name, "w", zipfile.ZIP_DEFLATED) as out:
+        for name in self.__entries():
+          if name == "xl/calcChain.xml":
+            continue
+          if name not in self._written and name not in _CHANGED_ON_SAVE and source is not None:
+            # entries which are not changed, such as styles, drawings and other sheets, are copied as they are.
+            _copy_entry(out, source, source.getinfo(name))
+            continue
+          data = self._written[name] if name in self._written else self.__read(name)
+          if isinstance(data, SheetStream):
+            with out.open(name, "w", force_zip64=True) as f:
+              data.write_to(f)
+            continue
+          if name == "xl/workbook.xml":
+            data = self.__full_calc_on_load(data)
+          elif name in ("[Content_Types].xml", "xl/_rels/workbook.xml.rels"):
+            data = re.sub(r'<(Override|Relationship)\b[^>]*calcChain[^>]*/>', "", data)
+          out.writestr(name, data)
+    except BaseException:
+      if os.path.exists(temp_name):
+        os.remove(temp_name)
+      raise
+    finally:
+      if source is not None:
+        source.close()
+    os.replace(temp_name, full_name)
+
+  def discard(self):
+    """ Forgets the written worksheets without saving them, and removes the temporary files of their streams.
+        The book cannot be used after it. """
+    for data in self._written.values():
+      if isinstance(data, SheetStream):
+        data.close()
+    self._written = {}
+    self._added = []
+
+  def __entries(self) -> List[str]:
+    if self._full_name is None:
+      return list(BLANK_WORKBOOK.keys()) + self._added
+    with zipfile.ZipFile(self._full_name) as archive:
+      return archive.namelist() + self._added
+
+  def __read(self, name: str):
+    if name in self._written:
+      return self._written[name]
+    if self._full_name is None:
+      return BLANK_WORKBOOK[name]
+    with zipfile.ZipFile(self._full_name) as archive:
+      data = archive.read(name)
+    return data.decode("utf-8") if name.endswith(".xml") or name.endswith(".rels") else data
+
+  @staticmethod
+  def __full_calc_on_load(xml: str) -> str:
+    if "<calcPr" in xml:
+      if "fullCalcOnLoad" in xml:
+        return xml
+      return xml.replace("<calcPr", '<calcPr fullCalcOnLoad="1"', 1)
+    m = _AFTER_CALC_PR.search(xml)
+    return xml[:m.start()] + '<calcPr fullCalcOnLoad="1"/>' + xml[m.start():]
+
+
+def split_range(excel_range: str) -> Tuple[str, int, int, int, int]:
+  """
+  :param excel_range: a range such as "Sheet1!A1:F40" or "'My sheet'!B2".
+  :return: (worksheet name, first row, first column, last row, last column). Rows and columns start from 1.
+  """
+  sheet_name, reference = excel_range.rsplit('!', 1)
+  if len(sheet_name) > 1 and sheet_name[0] == "'" and sheet_name[-1] == "'":
+    sheet_name = sheet_name[1:-1].replace("''", "'")
+  cells = reference.split(':')
+  first_row, first_col = split_cell_reference(cells[0])
+  last_row, last_col = split_cell_reference(cells[-1])
+  return sheet_name, first_row, first_col, last_row, last_col
+
+
+def read_range(full_name: str, excel_range: str) -> List[List]:
+  """
+  Reads the values of a range of an Excel file without Excel.
+  Numbers are read as float, like Excel does. Empty cells are None.
+  :param full_name: the full name of an Excel file.
+  :param excel_range: a range such as "Sheet1!A1:F40" or "'My sheet'!B2".
+  :return: two-dimensional list of the values.
+  :raise KeyError: if there is no worksheet with the name.
+  """
+  sheet_name, first_row, first_col, last_row, last_col = split_range(excel_range)
+  result = [[None] * (last_col - first_col + 1) for _ in range(last_row - first_row + 1)]
+
+  with zipfile.ZipFile(full_name) as archive:
+    path = dict(worksheet_paths(archive))[sheet_name]
+    shared_strings = []
+    if "xl/sharedStrings.xml" in archive.namelist():
+      for si in ET.fromstring(archive.read("xl/sharedStrings.xml")).iter("{%s}si" % NS_MAIN):
+        shared_strings.append("".join(t.text or "" for t in si.iter("{%s}t" % NS_MAIN)))
+
+    with archive.open(path) as f:
+      for event, elem in ET.iterparse(f):
+        if elem.tag == "{%s}row" % NS_MAIN:
+          if int(elem.get("r")) > last_row:
+            break
+          elem.clear()
+        elif elem.tag == "{%s}c" % NS_MAIN:
+          row, col = split_cell_reference(elem.get("r"))
+          if first_row <= row <= last_row and first_col <= col <= last_col:
+            result[row - first_row][col - first_col] = _cell_value(elem, shared_strings)
+  return result
+
+
+def _cell_value(elem, shared_strings: List[str]):
+  cell_type = elem.get("t", "n")
+  if cell_type == "inlineStr":
+    return "".join(t.text or "" for t in elem.iter("{%s}t" % NS_MAIN))
+  v = elem.find("{%s}v" % NS_MAIN)
+  if v is None or v.text is None:
+    return None
+  if cell_type == "s":
+    return shared_strings[int(v.text)]
+  if cell_type == "b":
+    return v.text == "1"
+  if cell_type in ("str", "e"):
+    return v.text
+  return float(v.text)
@@ -0,0 +1,401 @@
+"""
+    This module records how long each stage of a conversion takes, with counts such as cells and bytes,
+    so that a slow batch shows whether reading, parsing, writing, missing values or saving is slow.
+
+    A stage is measured with "span":
+        with span("parse", bytes=len(text)) as sp:
+          ...
+          sp["cells"] = n_cells
+    Each span is written as one JSON line such as
+        {"span": "parse", "serial": "SERIAL000001", "sheet": "Power_raw", "bytes": 5120, "cells": 400,
+         "seconds": 0.0012, "time": 1700000000.0, "pid": 1234}
+    "serial" and "sheet" of an enclosing span or "context" are added to the spans inside it in the same thread.
+
+    Recording is off until "enable" is called or the environment variable "TEXT_TO_EXCEL_TRACE" has a file
+    name. While it is off, a span costs one function call. Processes started by a conversion record to the
+    same file.
+
+    Between "start_memory_profile" and "stop_memory_profile", spans also measure memory with "tracemalloc":
+    "peak_kb" is the highest memory allocated during the span and "retained_kb" is memory still allocated when
+    the span ends, both above the memory when the span starts. The resident set size is sampled in a thread.
+    Memory is profiled in the current process only, and it is exact when a conversion runs in one thread.
+"""
+
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "TEXT_TO_EXCEL_TRACE"
+CONTEXT_KEYS = ("serial", "sheet")
+
+_trace_file = os.environ.get(TRACE_ENV) or None  # the name of a file to which spans are written.
+_lock = threading.Lock()
+_stream = None
+_stream_pid = None
+_local = threading.local()
+_counters = {}
+_memory = None  # a "MemoryProfile" while memory is profiled.
+
+
+class Span(object):
+  """ This class measures a stage. It is used as a context manager, and records itself when it exits.
+
+      Attributes:
+          _name: the name of the stage
+          _fields: a dictionary of values recorded with the span
+          _start: the time when the span starts
+          _outer: the context of the enclosing span
+          memory_start: traced memory when the span starts, or None if memory is not profiled
+          memory_peak: the highest traced memory during the span, if memory is profiled
+  """
+  __slots__ = ("_name", "_fields", "_start", "_outer", "memory_start", "memory_peak")
+
+  def __init__(self, name: str, fields: dict):
+    self._name = name
+    self._fields = fields
+    self._start = None
+    self._outer = None
+    self.memory_start = None
+    self.memory_peak = 0
+
+  def __setitem__(self, key, value):
+    self._fields[key] = value
+
+  def __enter__(self):
+    self._outer = getattr(_local, "context", {})
+    context = dict(self._outer)
+    context.update((key, self._fields[key]) for key in CONTEXT_KEYS if key in self._fields)
+    _local.context = context
+    if _memory is not None:
+      _memory.enter(self, context.get("serial"))
+    self._start = time.perf_counter()
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    seconds = time.perf_counter() - self._start
+    _local.context = self._outer
+    fields = dict(self._outer)
+    fields.update(self._fields)
+    fields["seconds"] = round(seconds, 6)
+    if _memory is not None and self.memory_start is not None:
+      _memory.exit(self, fields)
+    if exc_type is not None:
+      fields["error"] = exc_type.__name__
+    record(self._name, fields)
+    return False
+
+
+class _NullSpan(object):
+  """ This class is returned by "span" while recording is off. It does nothing. """
+  __slots__ = ()
+
+  def __setitem__(self, key, value):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Context(object):
+  """ This class adds "serial" and "sheet" to the spans inside it without recording itself. """
+  __slots__ = ("_fields", "_outer")
+
+  def __init__(self, fields: dict):
+    self._fields = fields
+    self._outer = None
+
+  def __enter__(self):
+    self._outer = getattr(_local, "context", {})
+    context = dict(self._outer)
+    context.update(self._fields)
+    _local.context = context
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    _local.context = self._outer
+    return False
+
+
+def span(name: str, **fields):
+  """
+  Returns a context manager that measures a stage.
+  :param name: the name of the stage, such as "parse" or "save"
+  :param fields: values recorded with the span. "serial" and "sheet" are added to the spans inside it.
+  :return: a "Span", or an object that does nothing if recording is off.
+  """
+  if _trace_file is None and _memory is None:
+    return _NULL_SPAN
+  return Span(name, fields)
+
+
+def context(**fields):
+  """
+  Returns a context manager that adds "serial" and "sheet" to the spans inside it, in the current thread.
+  :param fields: "serial" and "sheet"
+  :return: a context manager, or an object that does nothing if recording is off.
+  """
+  if _trace_file is None and _memory is None:
+    return _NULL_SPAN
+  return _Context({key: value for key, value in fields.items() if key in CONTEXT_KEYS})
+
+
+def record(name: str, fields: dict):
+  """
+  Writes a record as a JSON line and adds it to the counters and the memory profile.
+  It does nothing if recording is off.
+  :param name: the name of a stage
+  :param fields: values of the record
+  """
+  global _stream, _stream_pid
+  if _memory is not None:
+    _memory.add(name, fields)
+  if _trace_file is None:
+    return
+  fields["span"] = name
+  fields["time"] = round(time.time(), 6)
+  fields["pid"] = os.getpid()
+  line = json.dumps(fields, default=str) + "\n"
+
+  with _lock:
+    counter = _counters.setdefault(name, {"count": 0, "seconds": 0.0})
+    counter["count"] += 1
+    counter["seconds"] += fields.get("seconds", 0.0)
+    for key in ("cells", "bytes"):
+      if key in fields:
+        counter[key] = counter.get(key, 0) + fields[key]
+
+    # a forked process opens the file again, so that it does not share a buffer with its parent.
+    if _stream is None or _stream_pid != os.getpid():
+      _stream = open(_trace_file, "a", encoding="utf-8")
+      _stream_pid = os.getpid()
+    _stream.write(line)
+    _stream.flush()
+
+
+def enable(trace_file: str):
+  """
+  Starts recording spans to a file. Records are appended if the file exists.
+  Processes started after this call also record to the file.
+  :param trace_file: the name of a JSON lines file
+  """
+  global _trace_file
+  disable()
+  _trace_file = trace_file
+  os.environ[TRACE_ENV] = trace_file
+
+
+def disable():
+  """ Stops recording spans and closes the file. """
+  global _trace_file, _stream, _stream_pid
+  with _lock:
+    if _stream is not None and _stream_pid == os.getpid():
+      _stream.close()
+    _stream = None
+    _stream_pid = None
+  _trace_file = None
+  os.environ.pop(TRACE_ENV, None)
+
+
+def is_enabled() -> bool:
+  """
+  :return: whether spans are recorded.
+  """
+  return _trace_file is not None
+
+
+def counters() -> dict:
+  """
+  :return: a dictionary whose key is the name of a stage and value is a dictionary of the number of spans,
+           total seconds, and total cells and bytes if they are recorded. Only spans in this process are counted.
+  """
+  with _lock:
+    return {name: dict(counter) for name, counter in _counters.items()}
+
+
+def reset_counters():
+  """ Clears the counters. """
+  with _lock:
+    _counters.clear()
+
+
+class MemoryProfile(object):
+  """ This class collects the memory of spans, per stage and per serial.
+
+      Attributes:
+          _n_sites: the number of allocation sites in a report
+          _interval: seconds between samples of the resident set size
+          _stages: a dictionary whose key is a stage and value is its highest "peak_kb" and "retained_kb"
+          _serials: a dictionary whose key is a serial and value is its highest "peak_kb" and "rss_peak_kb"
+          _containers: the names of stages which have stages inside them, such as "serial"
+          _serial: the serial of the latest span, which the RSS sampler charges
+          _rss_peak: the highest resident set size in bytes, or None if it cannot be read
+          _max_traced: traced memory when the latest snapshot is taken
+          _snapshot: a "tracemalloc" snapshot at the highest traced memory
+          _stopped: an event which stops the RSS sampler
+          _sampler: a thread which samples the resident set size
+  """
+
+  def __init__(self, n_sites: int = 10, interval: float = 0.05):
+    self._n_sites = n_sites
+    self._interval = interval
+    self._stages = {}
+    self._serials = {}
+    self._containers = set()
+    self._serial = None
+    self._rss_peak = None
+    self._max_traced = 0
+    self._snapshot = None
+    self._stopped = threading.Event()
+    self._sampler = None
+
+  def start(self):
+    import tracemalloc
+    tracemalloc.start()
+    self._sampler = threading.Thread(target=self.__sample, name="rss-sampler", daemon=True)
+    self._sampler.start()
+
+  def stop(self) -> dict:
+    """
+    Stops profiling.
+    :return: a report of the profile. See "stop_memory_profile".
+    """
+    import tracemalloc
+    self._stopped.set()
+    self._sampler.join()
+    self.__take_snapshot(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    sites = []
+    if self._snapshot is not None:
+      snapshot = self._snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                               tracemalloc.Filter(False, threading.__file__),
+                                               tracemalloc.Filter(False, __file__)])
+      for stat in snapshot.statistics("lineno")[:self._n_sites]:
+        frame = stat.traceback[0]
+        sites.append({"site": frame.filename + ":" + str(frame.lineno), "size_kb": round(stat.size / 1024, 1),
+                      "count": stat.count})
+    stages = sorted(self._stages.items(), key=lambda item: -item[1]["peak_kb"])
+    leaves = [name for name, _ in stages if name not in self._containers]
+    return {"peak_traced_kb": round(self._max_traced / 1024, 1),
+            "rss_peak_kb": round(self._rss_peak / 1024, 1) if self._rss_peak is not None else None,
+            "biggest_stage": leaves[0] if len(leaves) != 0 else None,
+            "stages": dict(stages), "serials": self._serials, "top_sites": sites}
+
+  def enter(self, span_: Span, serial: str):
+    """ Starts to measure a span. The enclosing span keeps the peak so far, and the peak is reset. """
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    stack = getattr(_local, "spans", None)
+    if stack is None:
+      stack = _local.spans = []
+    if len(stack) != 0:
+      stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+      self._containers.add(stack[-1]._name)
+    stack.append(span_)
+    if hasattr(tracemalloc, "reset_peak"):
+      tracemalloc.reset_peak()
+    span_.memory_start = current
+    span_.memory_peak = current
+    if serial is not None:
+      self._serial = serial
+
+  def exit(self, span_: Span, fields: dict):
+    """ Finishes measuring a span, and adds memory to its fields. """
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    stack = _local.spans
+    stack.pop()
+    span_.memory_peak = max(span_.memory_peak, peak)
+    if len(stack) != 0:
+      stack[-1].memory_peak = max(stack[-1].memory_peak, span_.memory_peak)
+    fields["peak_kb"] = round((span_.memory_peak - span_.memory_start) / 1024, 1)
+    fields["retained_kb"] = round((current - span_.memory_start) / 1024, 1)
+    rss = current_rss()
+    if rss is not None:
+      fields["rss_kb"] = round(rss / 1024, 1)
+    self.__take_snapshot(span_.memory_peak)
+
+  def add(self, name: str, fields: dict):
+    """ Adds the memory of a recorded span to its stage and serial. """
+    if "peak_kb" not in fields:
+      return
+    with _lock:
+      stage = self._stages.setdefault(name, {"count": 0, "peak_kb": 0.0, "retained_kb": 0.0})
+      stage["count"] += 1
+      stage["peak_kb"] = max(stage["peak_kb"], fields["peak_kb"])
+      stage["retained_kb"] = max(stage["retained_kb"], fields["retained_kb"])
+      if fields.get("serial") is not None:
+        serial = self._serials.setdefault(fields["serial"], {"peak_kb": 0.0, "rss_peak_kb": None})
+        serial["peak_kb"] = max(serial["peak_kb"], fields["peak_kb"])
+
+  def __take_snapshot(self, traced: int):
+    """ Takes a snapshot when traced memory grows by 10% over the latest snapshot. """
+    if traced > self._max_traced * 1.1:
+      import tracemalloc
+      self._max_traced = traced
+      self._snapshot = tracemalloc.take_snapshot()
+    self._max_traced = max(self._max_traced, traced)
+
+  def __sample(self):
+    while not self._stopped.wait(self._interval):
+      rss = current_rss()
+      if rss is None:
+        return
+      self._rss_peak = rss if self._rss_peak is None else max(self._rss_peak, rss)
+      serial = self._serial
+      if serial is not None:
+        with _lock:
+          entry = self._serials.setdefault(serial, {"peak_kb": 0.0, "rss_peak_kb": None})
+          entry["rss_peak_kb"] = max(entry["rss_peak_kb"] or 0.0, round(rss / 1024, 1))
+
+
+def current_rss():
+  """
+  :return: the resident set size of this process in bytes, or None if it cannot be read.
+  """
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, AttributeError):
+    pass
+  try:
+    import psutil
+    return psutil.Process().memory_info().rss
+  except ImportError:
+    return None
+
+
+def start_memory_profile(n_sites: int = 10):
+  """
+  Starts to measure memory of spans with "tracemalloc" and to sample the resident set size.
+  Memory profiling makes a conversion a few times slower, so it is for finding a stage that uses much memory.
+  :param n_sites: the number of the biggest allocation sites in the report
+  """
+  global _memory
+  if _memory is not None:
+    stop_memory_profile()
+  _memory = MemoryProfile(n_sites)
+  _memory.start()
+
+
+def stop_memory_profile() -> dict:
+  """
+  Stops measuring memory.
+  :return: a report whose keys are "peak_traced_kb", "rss_peak_kb", "biggest_stage" (the stage using the most
+           memory among stages without stages inside them), "stages" (the highest peak and retained memory of
+           each stage), "serials" (the highest peak memory and RSS of each serial) and "top_sites" (the biggest
+           allocation sites at the highest traced memory).
+           None if memory is not profiled.
+  """
+  global _memory
+  if _memory is None:
+    return None
+  memory, _memory = _memory, None
+  return memory.stop()
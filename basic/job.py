@@ -0,0 +1,363 @@
+"""
+    This module runs a conversion described in a job spec file, without GUI.
+
+    A job spec is a JSON (or TOML) file such as:
+        {
+          "template": "C:/templates/template.xlsx",
+          "data": ["C:/data/lot1"],
+          "recursive": false,
+          "include": ["*.txt"],
+          "exclude": [],
+          "serial_pattern": null,
+          "keyword": "_raw",
+          "missing_values": {"*": "-999", "Power_raw": "-999 >1e30 nan /^-+$/"},
+          "row_filter": {"Power_raw": "header=1 C>0"},
+          "round": {"*": "B:D*0.001~3"},
+          "max_rows": {"*": 10000},
+          "keep_columns": {"Power_raw": "A:L"},
+          "save_name": "lot1",
+          "save_names": {"SERIAL000001": "golden"},
+          "save_path": null,
+          "merge_range": "Summary!B2:F40",
+          "merge_name": "lot1",
+          "merge_only": false,
+          "workbook_layout": null,
+          "workers": 4,
+          "backend": "xlsx",
+          "pipeline": false,
+          "chunk_rows": null,
+          "trace": "C:/data/lot1/trace.jsonl",
+          "memory_profile": false
+        }
+    Only "template" and "data" are required. "*" in "missing_values" applies to all sheets, and the rules of
+    missing values are in "basic.sheetdata.missing". "row_filter", "round", "max_rows" and "keep_columns" work
+    the same way, and their values are in "basic.sheetdata.transform".
+    With "merge_only", only "merge_range" of the text files is parsed and merged, and no Excel file of each serial
+    is made. The range must be of a data sheet then.
+    With "workbook_layout" of "sheets" or "stacked", all serials are loaded to one Excel file named by "save_name"
+    instead of a file of each serial, without Excel (see "basic.file.text_to_workbook"). Nothing is merged then.
+    With "pipeline", reading, parsing and writing overlap in one process, and "workers" processes parse text.
+    With "chunk_rows", each text file is read, transformed and written that many rows at a time with the "xlsx"
+    backend, so files larger than memory can be converted. It is used instead of "pipeline".
+    With "trace", the timing of each stage is appended to the file as JSON lines (see "basic.instrument").
+    With "memory_profile", the memory of each stage and serial is written to "memory-report <time>.json" next to
+    the new Excel files. Serials are converted in this process then, because memory is profiled per process.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import List
+
+from basic import instrument
+from basic.errors import JobSpecError, InvalidMissingValueError, InvalidTransformError
+from basic.file import scan_text_files, group_data_files, make_data_table, choose_data_files, text_to_excel, \
+  text_to_workbook, merge_specified_range, merge_data_files, WORKBOOK_LAYOUTS
+from basic.file.files import TextFile, ExcelFile
+from basic.file.workbook import workbook_writers
+from basic.file.xlsx import read_template_info
+from basic.list2d import Table
+from basic.sheetdata.sheetdata import SheetData
+from basic.sheetdata.sheetinfo import MissingValueInfo, RowFilterInfo, RoundInfo, MaxRowsInfo, KeepColumnsInfo, \
+  sheet_infos
+
+DEFAULTS = {
+  "recursive": False,
+  "include": ["*.txt"],
+  "exclude": [],
+  "serial_pattern": None,
+  "keyword": "",
+  "missing_values": {},
+  "row_filter": {},
+  "round": {},
+  "max_rows": {},
+  "keep_columns": {},
+  "save_name": "",
+  "save_names": {},
+  "save_path": None,
+  "merge_range": "",
+  "merge_name": "",
+  "merge_only": False,
+  "workbook_layout": None,
+  "workers": 1,
+  "backend": "xlsx",
+  "pipeline": False,
+  "chunk_rows": None,
+  "trace": None,
+  "memory_profile": False,
+}
+
+# types of the values of a job spec. A key whose default is None can also be null.
+TYPES = {"template": str, "data": (str, list), "recursive": bool, "include": list, "exclude": list,
+         "serial_pattern": str, "keyword": str, "missing_values": dict, "row_filter": dict, "round": dict,
+         "max_rows": dict, "keep_columns": dict, "save_name": str, "save_names": dict, "save_path": str,
+         "merge_range": str, "merge_name": str, "merge_only": bool, "workbook_layout": str, "workers": int,
+         "backend": str, "pipeline": bool, "chunk_rows": int, "trace": str, "memory_profile": bool}
+_TYPE_NAMES = {str: "a string", list: "a list", dict: "an object", int: "an integer", float: "a number",
+               bool: "true or false"}
+
+WORKBOOK_CHUNK_ROWS = 10000  # rows read at a time with "workbook_layout" when "chunk_rows" is not given.
+
+# keys of a job spec whose values are values of "SheetInfo"s by worksheet name.
+INFO_KEYS = {"missing_values": MissingValueInfo, "row_filter": RowFilterInfo, "round": RoundInfo,
+             "max_rows": MaxRowsInfo, "keep_columns": KeepColumnsInfo}
+
+
+def load_job_spec(file_name: str) -> dict:
+  """
+  Reads a job spec file. A file whose name ends with ".toml" is read as TOML, and others as JSON.
+  :param file_name: the name of a job spec file
+  :return: a dictionary of the job spec with default values.
+  :raise JobSpecError: if the job spec is invalid.
+  """
+  try:
+    if file_name.endswith(".toml"):
+      try:
+        import tomllib
+      except ImportError:
+        import tomli as tomllib
+      with open(file_name, "rb") as f:
+        spec = tomllib.load(f)
+    else:
+      with open(file_name) as f:
+        spec = json.load(f)
+  except ImportError:
+    raise JobSpecError("Reading TOML needs Python 3.11 or the 'tomli' package.")
+  except (OSError, ValueError) as e:
+    raise JobSpecError("Cannot read " + file_name + ": " + str(e))
+
+  return make_job_spec(spec)
+
+
+def make_job_spec(spec: dict) -> dict:
+  """
+  Checks a job spec and fills default values.
+  :param spec: a dictionary of a job spec
+  :return: a dictionary of the job spec with default values.
+  :raise JobSpecError: if the job spec is invalid.
+  """
+  if not isinstance(spec, dict):
+    raise JobSpecError("A job spec must be an object.")
+  for key in ("template", "data"):
+    if key not in spec:
+      raise JobSpecError("'" + key + "' is required in a job spec.")
+  unknown = set(spec.keys()) - set(DEFAULTS.keys()) - {"template", "data"}
+  if len(unknown) != 0:
+    raise JobSpecError("Unknown keys in a job spec: " + ", ".join(sorted(unknown)))
+
+  for key, value in spec.items():
+    if value is None and DEFAULTS.get(key, "") is None:
+      continue
+    _check_type(key, value, TYPES[key])
+    if isinstance(value, list):
+      for item in value:
+        _check_type(key, item, str)
+    elif isinstance(value, dict):
+      for item in value.values():
+        _check_type(key, item, str if key == "save_names" else (str, int, float))
+
+  result = dict(DEFAULTS)
+  result.update(spec)
+  if result["backend"] not in workbook_writers:
+    raise JobSpecError("'backend' must be one of " + ", ".join(workbook_writers.keys()) + ".")
+  if result["workers"] <= 0:
+    raise JobSpecError("'workers' must be a positive integer.")
+  if isinstance(result["data"], str):
+    result["data"] = [result["data"]]
+  if result["merge_only"] and len(result["merge_range"]) == 0:
+    raise JobSpecError("'merge_only' needs 'merge_range'.")
+  if result["chunk_rows"] is not None and result["chunk_rows"] <= 0:
+    raise JobSpecError("'chunk_rows' must be a positive integer.")
+  if result["workbook_layout"] is not None:
+    if result["workbook_layout"] not in WORKBOOK_LAYOUTS:
+      raise JobSpecError("'workbook_layout' must be one of " + ", ".join(WORKBOOK_LAYOUTS) + ".")
+    if result["merge_only"] or len(result["merge_range"]) != 0:
+      raise JobSpecError("'workbook_layout' makes one Excel file, so it cannot be used with 'merge_range'.")
+  for key, info_class in INFO_KEYS.items():
+    info = [si for si in sheet_infos if isinstance(si, info_class)][0]
+    for sheet_name, value in result[key].items():
+      try:
+        info.check_value(str(value))
+      except (InvalidMissingValueError, InvalidTransformError) as e:
+        raise JobSpecError("Invalid '" + key + "' of '" + sheet_name + "': " + str(e))
+  return result
+
+
+def _check_type(key: str, value, types):
+  """ Raises "JobSpecError" if a value of a key, or an item of it, is not of the types. A bool is not an integer. """
+  types = types if isinstance(types, tuple) else (types,)
+  if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+    raise JobSpecError("'" + key + "' must be " + " or ".join(_TYPE_NAMES[t] for t in types) + ", not "
+                       + json.dumps(value, default=str) + ".")
+
+
+def make_sheet_data(sheet_names: List[str], missing_values: dict, transforms: dict = None) -> List[SheetData]:
+  """
+  Returns "SheetData"s with missing values and transforms.
+  :param sheet_names: a list of worksheet names
+  :param missing_values: a dictionary whose key is a worksheet name or "*" and value is missing values.
+  :param transforms: a dictionary whose key is one of "row_filter", "round", "max_rows" and "keep_columns",
+                     and value is a dictionary like "missing_values".
+  :return: a list of "SheetData"s.
+  """
+  values = dict(transforms) if transforms is not None else {}
+  values["missing_values"] = missing_values
+  result = []
+  for sheet_name in sheet_names:
+    sd = SheetData(sheet_name)
+    for key, by_sheet in values.items():
+      info = [si for si in sheet_infos if isinstance(si, INFO_KEYS[key])][0]
+      sd[info] = str(by_sheet.get(sheet_name, by_sheet.get("*", "")))
+    result.append(sd)
+  return result
+
+
+def spec_transforms(spec: dict) -> dict:
+  """
+  :param spec: a job spec
+  :return: a dictionary of transforms in the job spec for "make_sheet_data".
+  """
+  return {key: spec[key] for key in INFO_KEYS if key != "missing_values"}
+
+
+def run_job(spec: dict) -> dict:
+  """
+  Runs a conversion: finds text files, makes a data table, loads data to Excel files and merges them.
+  :param spec: a dictionary of a job spec from "load_job_spec".
+  :return: a dictionary summary of the job.
+  """
+  start = time.monotonic()
+  summary = {"status": "ok", "template": spec["template"], "serials": 0, "files": [], "merged": None,
+             "skipped_files": [], "error": None, "timings": {}}
+  timings = summary["timings"]
+
+  if spec["trace"] is not None:
+    instrument.enable(spec["trace"])
+  if spec["memory_profile"]:
+    instrument.start_memory_profile()
+  excel_opened = False
+  try:
+    if spec["backend"] == "excel":
+      ExcelFile.open_excel_app()
+      excel_opened = True
+    excel_file = ExcelFile(spec["template"])
+    sheet_data = make_sheet_data(read_template_info(excel_file.full_name).sheet_names, spec["missing_values"],
+                                 spec_transforms(spec))
+
+    text_files: List[TextFile] = []
+    stage = time.monotonic()
+    for files, errors in scan_text_files(spec["data"], spec["recursive"], spec["include"], spec["exclude"],
+                                         spec["serial_pattern"]):
+      text_files.extend(files)
+      summary["skipped_files"].extend({"file": e[0], "reason": e[1]} for e in errors)
+
+    timings["scan"], stage = time.monotonic() - stage, time.monotonic()
+
+    data_table = choose_data_files(make_data_table(group_data_files(text_files), sheet_data, spec["keyword"]))
+    save_names = [spec["save_names"].get(serial, spec["save_name"]) for serial in data_table.header_v]
+    summary["serials"] = data_table.n_row
+    timings["table"], stage = time.monotonic() - stage, time.monotonic()
+
+    if spec["merge_only"]:
+      path = spec["save_path"]
+      if path is None:
+        text_files = [tf for row in data_table.contents() for tf in row if tf is not None]
+        path = text_files[0].path if len(text_files) != 0 else os.getcwd()
+      summary["merged"] = merge_data_files(data_table, excel_file, spec["merge_range"], spec["merge_name"], path)
+      timings["merge"] = time.monotonic() - stage
+    elif spec["workbook_layout"] is not None:
+      summary["files"] = [text_to_workbook(data_table, excel_file, spec["save_name"], spec["workbook_layout"],
+                                           save_path=spec["save_path"],
+                                           chunk_rows=spec["chunk_rows"] or WORKBOOK_CHUNK_ROWS)]
+      timings["convert"] = time.monotonic() - stage
+    else:
+      workers = 1 if spec["memory_profile"] else spec["workers"]
+      summary["files"] = convert(data_table, excel_file, save_names, spec["backend"], spec["save_path"], workers,
+                                 spec["pipeline"], spec["chunk_rows"])
+      timings["convert"], stage = time.monotonic() - stage, time.monotonic()
+
+      if len(spec["merge_range"]) != 0 and len(summary["files"]) != 0:
+        path = os.path.dirname(summary["files"][0])
+        summary["merged"] = merge_specified_range(summary["files"], spec["merge_range"], spec["merge_name"], path,
+                                                  backend=spec["backend"])
+        timings["merge"] = time.monotonic() - stage
+  except Exception as e:
+    summary["status"] = "failed"
+    summary["error"] = type(e).__name__ + ": " + str(e)
+  finally:
+    if excel_opened:
+      ExcelFile.close_excel_app()
+    if spec["trace"] is not None:
+      instrument.disable()
+    if spec["memory_profile"]:
+      summary["memory_report"] = write_memory_report(instrument.stop_memory_profile(), summary["files"],
+                                                     spec["save_path"])
+
+  for key in timings:
+    timings[key] = round(timings[key], 3)
+  summary["elapsed"] = round(time.monotonic() - start, 3)
+  return summary
+
+
+def write_memory_report(report: dict, file_names: List[str], save_path: str = None) -> str:
+  """
+  Writes a memory report in the directory of new Excel files.
+  :param report: a report from "instrument.stop_memory_profile"
+  :param file_names: the names of new Excel files
+  :param save_path: a directory where new Excel files are saved, used if there are no Excel files.
+  :return: the full name of the report.
+  """
+  if len(file_names) != 0:
+    path = os.path.dirname(file_names[0])
+  else:
+    path = save_path if save_path is not None else os.getcwd()
+  report_name = os.path.join(path, "memory-report " + datetime.now().strftime("%y%m%d-%H%M%S") + ".json")
+  with open(report_name, "w") as f:
+    json.dump(report, f, indent=2)
+  return report_name
+
+
+def convert(data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, save_names: List[str],
+            backend: str, save_path: str = None, workers: int = 1, pipeline: bool = False,
+            chunk_rows: int = None) -> List[str]:
+  """
+  Runs "text_to_excel", dividing serials among processes. Excel is used in one process only.
+  With "pipeline", runs "pipelined_text_to_excel" instead, and the processes parse text only.
+  With "chunk_rows", "pipeline" is not used, because the pipeline parses whole files.
+  :param data_table: a table that contains a text file in one cell
+  :param excel_file: Excel file for a template
+  :param save_names: a list of file names for new Excel files
+  :param backend: the name of a writer in "workbook_writers"
+  :param save_path: a directory where new Excel files are saved.
+  :param workers: the number of processes
+  :param pipeline: whether reading, parsing and writing overlap
+  :param chunk_rows: the number of rows of text files read at a time, or None to read whole files
+  :return: a list of the names of saved Excel files in the order of serials.
+  """
+  if pipeline and chunk_rows is None:
+    from basic.file.pipeline import pipelined_text_to_excel
+    return pipelined_text_to_excel(data_table, excel_file, save_names, backend=backend, save_path=save_path,
+                                   parse_workers=workers)
+  if backend == "excel" or workers <= 1 or data_table.n_row <= 1:
+    return text_to_excel(data_table, excel_file, save_names, backend=backend, save_path=save_path,
+                         chunk_rows=chunk_rows)
+
+  chunks = []
+  for r in range(data_table.n_row):
+    chunk: Table[TextFile, str, SheetData] = Table[TextFile, str, SheetData]()
+    chunk.append_header_vs([data_table.header_v[r]])
+    chunk.append_header_hs(data_table.header_h)
+    for c in range(data_table.n_col):
+      chunk.insert(data_table.get(r, c), 0, c)
+    chunks.append((chunk, excel_file, [save_names[r]], backend, save_path, chunk_rows))
+
+  from concurrent.futures import ProcessPoolExecutor
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    return [name for names in executor.map(_convert_chunk, chunks) for name in names]
+
+
+def _convert_chunk(args) -> List[str]:
+  data_table, excel_file, save_names, backend, save_path, chunk_rows = args
+  return text_to_excel(data_table, excel_file, save_names, backend=backend, save_path=save_path,
+                       chunk_rows=chunk_rows)
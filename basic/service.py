@@ -0,0 +1,383 @@
+"""
+    This module runs a local job queue service, so that several users or scripts share the conversion
+    capacity of one machine instead of each running its own conversions.
+
+    Usage:
+        python -m basic.service [--port PORT] [--workers N]
+
+    The service listens on localhost only and has these endpoints:
+        POST   /jobs        submits a job spec. "priority" in the body is optional; higher runs first.
+        GET    /jobs        returns the status of all jobs.
+        GET    /jobs/<id>   returns the status of a job with its summary and per-stage timings.
+        DELETE /jobs/<id>   cancels a queued job.
+        GET    /metrics     returns the queue depth, the number of jobs in each state and mean stage timings.
+    Jobs run with the "xlsx" writer, because one Excel application cannot be shared by worker threads.
+    "trace" and "memory_profile" are not accepted, because tracing and memory profiling are of the whole process,
+    so jobs running at the same time would mix their records.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from typing import Callable, List
+
+from basic.errors import JobSpecError
+from basic.job import make_job_spec, run_job
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job(object):
+  """ This class is a job submitted to "JobQueue".
+
+      Attributes:
+          _job_id: an identifier of the job
+          _spec: a job spec with default values
+          _priority: the priority of the job. A job with higher priority runs first.
+          _state: one of "queued", "running", "done", "failed" and "cancelled"
+          _submitted: the time when the job is submitted
+          _started: the time when the job starts, or None
+          _finished: the time when the job finishes, or None
+          _summary: a summary from "run_job", or None
+  """
+
+  def __init__(self, job_id: int, spec: dict, priority: int = 0):
+    self._job_id = job_id
+    self._spec = spec
+    self._priority = priority
+    self._state = QUEUED
+    self._submitted = time.time()
+    self._started = None
+    self._finished = None
+    self._summary = None
+
+  # Getters
+  @property
+  def job_id(self):
+    return self._job_id
+
+  @property
+  def spec(self):
+    return self._spec
+
+  @property
+  def priority(self):
+    return self._priority
+
+  @property
+  def state(self):
+    return self._state
+
+  @property
+  def summary(self):
+    return self._summary
+
+  @property
+  def submitted(self):
+    return self._submitted
+
+  @property
+  def started(self):
+    return self._started
+
+  @property
+  def finished(self):
+    return self._finished
+
+  def start(self):
+    """ Marks the job running. """
+    self._state = RUNNING
+    self._started = time.time()
+
+  def finish(self, summary: dict):
+    """
+    Marks the job done or failed by the status of its summary.
+    :param summary: a summary from "run_job"
+    """
+    self._summary = summary
+    self._state = DONE if summary["status"] == "ok" else FAILED
+    self._finished = time.time()
+
+  def cancel(self):
+    """ Marks the job cancelled. """
+    self._state = CANCELLED
+    self._finished = time.time()
+
+  def to_dict(self) -> dict:
+    """
+    :return: a dictionary of the status of the job, which can be dumped to JSON.
+    """
+    return {"id": self._job_id, "state": self._state, "priority": self._priority,
+            "template": self._spec["template"], "submitted": self._submitted, "started": self._started,
+            "finished": self._finished, "summary": self._summary}
+
+
+class JobQueue(object):
+  """ This class keeps jobs in priority order and runs them on worker threads.
+
+      Attributes:
+          _n_workers: the number of worker threads
+          _runner: a function which runs a job spec and returns a summary
+          _jobs: a dictionary whose key is a job id and value is a job
+          _heap: a heap of (-priority, job id) of queued jobs. Job ids increase, so they keep the order of submission.
+          _counter: a counter for job ids. Jobs with the same priority run in the order of submission.
+          _condition: a condition which guards the attributes above
+          _threads: worker threads
+          _stopped: whether the queue is stopped
+  """
+
+  def __init__(self, n_workers: int = 2, runner: Callable[[dict], dict] = run_job):
+    self._n_workers = n_workers
+    self._runner = runner
+    self._jobs = {}
+    self._heap = []
+    self._counter = itertools.count(1)
+    self._condition = threading.Condition()
+    self._threads: List[threading.Thread] = []
+    self._stopped = False
+
+  def start(self):
+    """ Starts worker threads. """
+    for i in range(self._n_workers):
+      thread = threading.Thread(target=self.__work, name="job-worker-" + str(i + 1), daemon=True)
+      thread.start()
+      self._threads.append(thread)
+
+  def stop(self):
+    """ Stops worker threads after their running jobs. Queued jobs stay queued. """
+    with self._condition:
+      self._stopped = True
+      self._condition.notify_all()
+    for thread in self._threads:
+      thread.join()
+    self._threads = []
+
+  def submit(self, spec: dict, priority: int = 0) -> Job:
+    """
+    Adds a job to the queue.
+    :param spec: a dictionary of a job spec
+    :param priority: the priority of the job. A job with higher priority runs first.
+    :return: the new job.
+    :raise JobSpecError: if the job spec is invalid, uses Excel, or traces or profiles the process.
+    """
+    spec = make_job_spec(spec)
+    if spec["backend"] != "xlsx":
+      raise JobSpecError("The service runs jobs with the 'xlsx' backend only.")
+    if spec["trace"] is not None or spec["memory_profile"]:
+      raise JobSpecError("The service cannot trace or profile a job, because jobs run in one process at the same "
+                         "time. Run the job with 'python -m basic' instead.")
+    with self._condition:
+      job_id = next(self._counter)
+      job = Job(job_id, spec, priority)
+      self._jobs[job_id] = job
+      heapq.heappush(self._heap, (-priority, job_id))
+      self._condition.notify()
+    return job
+
+  def cancel(self, job_id: int) -> bool:
+    """
+    Cancels a queued job. A running job cannot be cancelled.
+    :param job_id: the id of a job
+    :return: True if the job is cancelled.
+    """
+    with self._condition:
+      job = self._jobs.get(job_id)
+      if job is None or job.state != QUEUED:
+        return False
+      job.cancel()
+      return True
+
+  def get(self, job_id: int) -> Job:
+    """
+    :param job_id: the id of a job
+    :return: the job, or None if there is no such job.
+    """
+    with self._condition:
+      return self._jobs.get(job_id)
+
+  def jobs(self) -> List[Job]:
+    """
+    :return: all jobs in the order of submission.
+    """
+    with self._condition:
+      return [self._jobs[job_id] for job_id in sorted(self._jobs.keys())]
+
+  def metrics(self) -> dict:
+    """
+    :return: a dictionary of the queue depth, the number of jobs in each state and mean stage timings
+             of finished jobs.
+    """
+    with self._condition:
+      jobs = list(self._jobs.values())
+    counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+    stage_sums = {}
+    waits = []
+    for job in jobs:
+      counts[job.state] += 1
+      if job.started is not None:
+        waits.append(job.started - job.submitted)
+      if job.summary is not None:
+        for stage, seconds in job.summary["timings"].items():
+          stage_sums.setdefault(stage, []).append(seconds)
+        stage_sums.setdefault("elapsed", []).append(job.summary["elapsed"])
+
+    return {"queue_depth": counts[QUEUED], "workers": self._n_workers, "jobs": counts,
+            "mean_wait": round(sum(waits) / len(waits), 3) if len(waits) != 0 else None,
+            "mean_stage_seconds": {stage: round(sum(values) / len(values), 3)
+                                   for stage, values in stage_sums.items()}}
+
+  def __next_job(self) -> Job:
+    """ Waits for a queued job and marks it running. Returns None when the queue is stopped. """
+    with self._condition:
+      while True:
+        while len(self._heap) != 0:
+          _, job_id = heapq.heappop(self._heap)
+          job = self._jobs[job_id]
+          if job.state == QUEUED:
+            job.start()
+            return job
+        if self._stopped:
+          return None
+        self._condition.wait()
+
+  def __work(self):
+    while True:
+      job = self.__next_job()
+      if job is None:
+        return
+      try:
+        summary = self._runner(job.spec)
+      except Exception as e:
+        summary = {"status": "failed", "error": type(e).__name__ + ": " + str(e), "timings": {}, "elapsed": 0}
+      with self._condition:
+        job.finish(summary)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+  """ This class handles HTTP requests to the job queue service. "server.job_queue" is the queue. """
+
+  def do_GET(self):
+    job_queue: JobQueue = self.server.job_queue
+    if self.path == "/metrics":
+      self.__send(200, job_queue.metrics())
+    elif self.path == "/jobs":
+      self.__send(200, [job.to_dict() for job in job_queue.jobs()])
+    else:
+      job = self.__find_job()
+      if job is not None:
+        self.__send(200, job.to_dict())
+
+  def do_POST(self):
+    if self.path != "/jobs":
+      self.__send(404, {"error": "Not found."})
+      return
+    try:
+      length = int(self.headers.get("Content-Length", 0))
+      body = json.loads(self.rfile.read(length).decode("utf-8"))
+      if not isinstance(body, dict):
+        raise JobSpecError("A job spec must be an object.")
+      priority = int(body.pop("priority", 0))
+      job = self.server.job_queue.submit(body, priority)
+    except (ValueError, JobSpecError) as e:
+      self.__send(400, {"error": str(e)})
+      return
+    except Exception as e:
+      # the client always gets an answer, even for an error that the job spec checks do not expect.
+      self.__send(500, {"error": type(e).__name__ + ": " + str(e)})
+      return
+    self.__send(201, job.to_dict())
+
+  def do_DELETE(self):
+    job = self.__find_job()
+    if job is None:
+      return
+    if self.server.job_queue.cancel(job.job_id):
+      self.__send(200, job.to_dict())
+    else:
+      self.__send(409, {"error": "Only queued jobs can be cancelled.", "state": job.state})
+
+  def log_message(self, format, *args):
+    pass
+
+  def __find_job(self) -> Job:
+    """ Returns the job of "/jobs/<id>". If there is no such job, sends 404 and returns None. """
+    job = None
+    if self.path.startswith("/jobs/") and self.path[len("/jobs/"):].isdigit():
+      job = self.server.job_queue.get(int(self.path[len("/jobs/"):]))
+    if job is None:
+      self.__send(404, {"error": "Not found."})
+    return job
+
+  def __send(self, status: int, body):
+    data = json.dumps(body).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+
+class JobServer(ThreadingMixIn, HTTPServer):
+  """ This class is an HTTP server of a job queue. It accepts connections from localhost only.
+
+      Attributes:
+          job_queue: a queue that runs submitted jobs
+  """
+  daemon_threads = True
+
+  def __init__(self, port: int = 8765, n_workers: int = 2):
+    super(JobServer, self).__init__(("127.0.0.1", port), JobRequestHandler)
+    self.job_queue = JobQueue(n_workers)
+
+  def serve_forever(self, poll_interval=0.5):
+    self.job_queue.start()
+    try:
+      super(JobServer, self).serve_forever(poll_interval)
+    finally:
+      self.job_queue.stop()
+
+
+def submit_job(spec: dict, priority: int = 0, url: str = "http://127.0.0.1:8765") -> dict:
+  """
+  Submits a job spec to a running job queue service.
+  :param spec: a dictionary of a job spec
+  :param priority: the priority of the job. A job with higher priority runs first.
+  :param url: the address of the service
+  :return: a dictionary of the status of the new job.
+  """
+  from urllib.request import Request, urlopen
+  body = dict(spec)
+  body["priority"] = priority
+  request = Request(url + "/jobs", data=json.dumps(body).encode("utf-8"), method="POST",
+                    headers={"Content-Type": "application/json"})
+  with urlopen(request) as response:
+    return json.loads(response.read().decode("utf-8"))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="python -m basic.service", description="Runs a local job queue service.")
+  parser.add_argument("--port", type=int, default=8765, help="a port on localhost")
+  parser.add_argument("--workers", type=int, default=2, help="the number of jobs running at the same time")
+  args = parser.parse_args(argv)
+
+  server = JobServer(args.port, args.workers)
+  print("Listening on http://127.0.0.1:" + str(args.port))
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+if __name__ == "__main__":
+  main()
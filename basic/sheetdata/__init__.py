@@ -1 +1 @@
-__all__ = ["sheetdata", "sheetinfo"]
+__all__ = ["missing", "sheetdata", "sheetinfo", "transform"]
@@ -0,0 +1,206 @@
+"""
+    This module compiles missing-value rules of a worksheet once, so that a block of data is checked in one pass.
+
+    Rules are separated by white spaces. A cell is missing if it matches any rule:
+        -999            a number. A cell is compared as a number if it is a number, so "-999.0" matches.
+        ---             a string which is not a number. A cell matches if it is the same string.
+        nan, inf, -inf  NaN or infinity. "nan" matches any NaN cell.
+        >1e30           a comparison with one of ">", ">=", "<" and "<=".
+        1e30..1e40      a closed range.
+        -999±0.5        a number with a tolerance. "-999+-0.5" is the same.
+        /^-+$/          a regular expression which matches a whole string cell.
+    A comparison, range or tolerance whose parts are not numbers is a string, such as "<NA>".
+"""
+
+import math
+import operator
+import re
+from functools import lru_cache
+from typing import List
+
+from basic.errors import InvalidMissingValueError
+
+RULE_HELP = "Missing values separated by spaces: numbers (-999, nan, inf), strings (---), " \
+            "comparisons (>1e30, <=-1e30), ranges (1e30..1e40), tolerances (-999±0.5) " \
+            "and regular expressions (/^-+$/)."
+
+_COMPARISON = re.compile(r'^(<=|>=|<|>)(.+)$')
+_TOLERANCE = re.compile(r'^(.+?)(?:±|\+/-|\+-)(.+)$')
+_RANGE = re.compile(r'^(.+?)\.\.(.+)$')
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _numbers(match, first: int = 1) -> List[float]:
+  """ Returns the numbers of the groups of a match from "first", or None if a group is not a number. """
+  try:
+    return [float(group) for group in match.groups()[first - 1:]] if match is not None else None
+  except ValueError:
+    return None
+
+
+class MissingValues(object):
+  """ This class has missing-value rules compiled from a string. Exact numbers and strings are sets, so they cost
+      one lookup however many there are, and other numeric rules are functions of a number.
+
+      Attributes:
+          _rules: the rules
+          _numbers: a set of exact numbers
+          _strings: a set of strings which are not numbers
+          _nan: whether NaN is missing
+          _terms: a list of functions which tell whether a number meets a comparison, a range or a tolerance
+          _pattern: a compiled regular expression of all the regular expression rules, or None
+          is_missing_text: a function which tells whether a cell parsed from a text file is missing.
+                           A string cell is compared as a number if it is a number.
+          is_missing_value: a function which tells whether a cell read from a worksheet is missing.
+                            A string cell is not compared as a number, like Excel does, and a cell which is
+                            neither a string nor a number, such as a date, is never missing.
+  """
+
+  def __init__(self, value: str):
+    self._rules = value.split() if value is not None else []
+    self._numbers = set()
+    self._strings = set()
+    self._nan = False
+    self._terms = []
+    patterns = []
+
+    for rule in self._rules:
+      if len(rule) > 2 and rule[0] == '/' and rule[-1] == '/':
+        try:
+          re.compile(rule[1:-1])
+        except re.error as e:
+          raise InvalidMissingValueError("'" + rule + "' is not a valid regular expression: " + str(e))
+        patterns.append("(?:" + rule[1:-1] + ")")
+        continue
+
+      comparison = _COMPARISON.match(rule)
+      bound = _numbers(comparison, 2)
+      tolerance = _numbers(_TOLERANCE.match(rule))
+      closed_range = _numbers(_RANGE.match(rule))
+      if bound is not None:
+        self._terms.append(_compare(_OPERATORS[comparison.group(1)], bound[0]))
+      elif tolerance is not None:
+        center, width = tolerance[0], abs(tolerance[1])
+        self._terms.append(_between(center - width, center + width))
+      elif closed_range is not None:
+        if closed_range[0] > closed_range[1]:
+          raise InvalidMissingValueError("The range '" + rule + "' is empty.")
+        self._terms.append(_between(closed_range[0], closed_range[1]))
+      else:
+        try:
+          number = float(rule)
+        except ValueError:
+          self._strings.add(rule)
+          continue
+        if math.isnan(number):
+          self._nan = True
+        else:
+          self._numbers.add(number)
+
+    self._pattern = re.compile("|".join(patterns)) if len(patterns) != 0 else None
+    self.is_missing_text, self.is_missing_value = self.__compile()
+
+  # Getters
+  @property
+  def rules(self):
+    return self._rules
+
+  @property
+  def numbers(self):
+    return self._numbers
+
+  @property
+  def strings(self):
+    return self._strings
+
+  def __len__(self):
+    return len(self._rules)
+
+  def mask_text(self, rows: List[List]) -> int:
+    """
+    Replaces missing cells of data parsed from text files with None.
+    :param rows: two-dimensional list of data, changed in place
+    :return: the number of replaced cells.
+    """
+    return self.__mask(rows, self.is_missing_text)
+
+  def mask_values(self, rows: List[List]) -> int:
+    """
+    Replaces missing cells of data read from a worksheet with None.
+    :param rows: two-dimensional list of data, changed in place
+    :return: the number of replaced cells.
+    """
+    return self.__mask(rows, self.is_missing_value)
+
+  def __mask(self, rows: List[List], is_missing) -> int:
+    if len(self) == 0:
+      return 0
+    n_masked = 0
+    for r, row in enumerate(rows):
+      masked = [None if cell is not None and is_missing(cell) else cell for cell in row]
+      n_masked += masked.count(None) - row.count(None)
+      rows[r] = masked
+    return n_masked
+
+  def __compile(self):
+    """
+    Makes the two predicates from the rules as closures over the sets, the terms and the regular expression.
+    """
+    numbers, strings, nan, terms, pattern = self._numbers, self._strings, self._nan, self._terms, self._pattern
+    match = pattern.fullmatch if pattern is not None else None
+
+    # most columns have no or one comparison, so those cases do not loop over terms.
+    if len(terms) == 0:
+      def is_missing_number(f: float) -> bool:
+        return f in numbers or (nan and f != f)
+    elif len(terms) == 1:
+      term = terms[0]
+
+      def is_missing_number(f: float) -> bool:
+        return f in numbers or (nan and f != f) or term(f)
+    else:
+      def is_missing_number(f: float) -> bool:
+        return f in numbers or (nan and f != f) or any(term(f) for term in terms)
+
+    def is_missing_string(cell: str) -> bool:
+      return cell in strings or (match is not None and match(cell) is not None)
+
+    def is_missing_text(cell) -> bool:
+      try:
+        f = float(cell)
+      except (TypeError, ValueError):
+        return is_missing_string(cell)
+      if is_missing_number(f):
+        return True
+      # a string cell which is a number is also matched by regular expressions.
+      return match is not None and type(cell) is str and match(cell) is not None
+
+    def is_missing_value(cell) -> bool:
+      if type(cell) is str:
+        return is_missing_string(cell)
+      if type(cell) is bool or not isinstance(cell, (int, float)):
+        return False
+      return is_missing_number(cell)
+
+    return is_missing_text, is_missing_value
+
+
+def _compare(compare, bound: float):
+  """ Returns a function which tells whether a number meets a comparison with a bound, such as ">1e30". """
+  return lambda f: compare(f, bound)
+
+
+def _between(low: float, high: float):
+  """ Returns a function which tells whether a number is in a closed range. """
+  return lambda f: low <= f <= high
+
+
+@lru_cache(maxsize=256)
+def compile_missing_values(value: str) -> MissingValues:
+  """
+  Compiles missing-value rules. The same string returns the same object, so a template compiles each sheet once.
+  :param value: missing-value rules separated by white spaces
+  :return: "MissingValues" of the string.
+  :raise InvalidMissingValueError: if a rule is invalid.
+  """
+  return MissingValues(value)
@@ -26,8 +26,9 @@ class SheetData(object):
     return self._sheet_name
 
   def __getitem__(self, item: SheetInfo):
-    return self._sheet_infos[item]
+    return self._sheet_infos[type(item)]
 
   def __setitem__(self, key: SheetInfo, value):
     if isinstance(type(key.info_type), type(value)): raise TypeError("Sheet info type is not matched with value.")
-    self._sheet_infos[key] = value
+    key.check_value(value)
+    self._sheet_infos[type(key)] = value
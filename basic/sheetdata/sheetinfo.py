@@ -3,8 +3,15 @@
 """
 
 import abc
-from xlwings import Sheet
-from typing import TypeVar, Generic, List
+from typing import TypeVar, Generic, List, Iterator, TYPE_CHECKING
+
+from basic.instrument import span
+from basic.sheetdata.missing import compile_missing_values, RULE_HELP
+from basic.sheetdata.transform import compile_keep_columns, compile_row_filter, compile_round, compile_max_rows, \
+  row_filter_header, compile_row_condition, parse_max_rows
+
+if TYPE_CHECKING:
+  from xlwings import Sheet
 
 S = TypeVar('S')
 
@@ -33,8 +40,23 @@ class SheetInfo(Generic[S]):
         """
     pass
 
+  @property
+  def info_help(self) -> str:
+    """
+        :return: a description of values, shown as a tooltip in GUI.
+        """
+    return ""
+
+  def check_value(self, value: S):
+    """
+        Checks whether a value can be used. It does nothing by default.
+        :param value: a value used when manipulating
+        :raise Exception: if the value is invalid. The message tells why.
+        """
+    pass
+
   @abc.abstractmethod
-  def apply_info_to_sheet(self, sheet: Sheet, value: S):
+  def apply_info_to_sheet(self, sheet: 'Sheet', value: S):
     """
         Manipulates a worksheet with the specified value.
         :param sheet: a worksheet which will be manipulated
@@ -42,37 +64,84 @@ class SheetInfo(Generic[S]):
         """
     pass
 
+  @abc.abstractmethod
+  def apply_info_to_data(self, data: List[List], value: S) -> List[List]:
+    """
+        Manipulates data before they are written to a worksheet, when Excel is not used.
+        :param data: two-dimensional list of data which will be manipulated
+        :param value: a value used when manipulating
+        :return: manipulated data.
+        """
+    pass
+
+  def apply_info_to_chunks(self, chunks: Iterator[List[List]], value: S) -> Iterator[List[List]]:
+    """
+        Manipulates data in chunks of rows, so that a whole file is never in memory.
+        Each chunk is manipulated with "apply_info_to_data" by default.
+        :param chunks: an iterator of two-dimensional lists of data in the order of rows
+        :param value: a value used when manipulating
+        :return: an iterator of manipulated chunks.
+        """
+    for chunk in chunks:
+      yield self.apply_info_to_data(chunk, value)
+
 
 class MissingValueInfo(SheetInfo[str]):
-  """ This class tells how to manipulate a worksheet in terms of missing values. """
+  """ This class tells how to manipulate a worksheet in terms of missing values.
+      Values are missing-value rules in "basic.sheetdata.missing". """
 
   def __init__(self):
     super(MissingValueInfo, self).__init__("Missing Value Info")
 
-  def apply_info_to_sheet(self, sheet: Sheet, value: str):
+  @property
+  def info_help(self) -> str:
+    return RULE_HELP
+
+  def check_value(self, value: str):
+    """
+        Checks whether missing-value rules can be compiled.
+        :param value: missing-value rules
+        :raise InvalidMissingValueError: if a rule is invalid.
+        """
+    compile_missing_values(value)
+
+  def apply_info_to_sheet(self, sheet: 'Sheet', value: str):
     """
         Manipulates a worksheet with the specified value.
         It removes the value in the worksheet.
         :param sheet: a worksheet which will be manipulated
-        :param value: a value used when manipulating. In this case, missing values. If there are more than one
-                    value, it will separate with white spaces.
+        :param value: a value used when manipulating. In this case, missing-value rules separated with
+                    white spaces.
         """
-    missing_values = value.split()
+    missing_values = compile_missing_values(value)
     if len(missing_values) == 0: return
 
-    data = sheet.range('A1').expand().options(ndim=2).value
+    with span("missing_values", backend="excel") as sp:
+      data = sheet.range('A1').expand().options(ndim=2).value
+      n_masked = missing_values.mask_values(data)
+      # writing back through COM is slow, so the sheet is written only if a cell is removed.
+      if n_masked != 0:
+        sheet.range((1, 1)).value = data
+      sp["cells"] = sum(len(r) for r in data)
+      sp["masked"] = n_masked
 
-    for row in range(len(data)):
-      for col in range(len(data[row])):
-        for mv in missing_values:
-          try:
-            if float(mv) == data[row][col]:
-              data[row][col] = None
-          except:
-            if mv == data[row][col]:
-              data[row][col] = None
+  def apply_info_to_data(self, data: List[List], value: str) -> List[List]:
+    """
+        Manipulates data before they are written to a worksheet, when Excel is not used.
+        It removes the value in the data. Cells are compared as numbers if both are numbers, like Excel does.
+        :param data: two-dimensional list of data which will be manipulated
+        :param value: a value used when manipulating. In this case, missing-value rules separated with
+                    white spaces.
+        :return: manipulated data.
+        """
+    missing_values = compile_missing_values(value)
+    if len(missing_values) == 0: return data
 
-    sheet.range((1, 1)).value = data
+    with span("missing_values", backend="xlsx") as sp:
+      sp["masked"] = missing_values.mask_text(data)
+      sp["cells"] = sum(len(r) for r in data)
+
+    return data
 
   @property
   def info_type(self) -> type:
@@ -82,5 +151,152 @@ class MissingValueInfo(SheetInfo[str]):
     return str
 
 
-sheet_infos: List[SheetInfo] = []  # global variable that contains "SheetInfo"s.
+class DataTransformInfo(SheetInfo[str]):
+  """ This abstract class changes the shape or the values of data, such as removing columns or rows.
+      Writers apply it to data before they are written, also when Excel is used, so that data which are not
+      needed are never written. An empty value changes nothing.
+
+      Attribute:
+          _info_help: a description of values
+          _keeps_positions: whether every cell stays at its row and column, or is removed from the end, and
+                            depends only on itself. Then a part of the data can be transformed alone.
+  """
+  __metaclass__ = abc.ABCMeta
+
+  def __init__(self, info_name: str, info_help: str, keeps_positions: bool = False):
+    super(DataTransformInfo, self).__init__(info_name)
+    self._info_help = info_help
+    self._keeps_positions = keeps_positions
+
+  @property
+  def info_help(self) -> str:
+    return self._info_help
+
+  @property
+  def keeps_positions(self) -> bool:
+    return self._keeps_positions
+
+  @property
+  def info_type(self) -> type:
+    return str
+
+  @abc.abstractmethod
+  def compile(self, value: str):
+    """
+        Compiles a value to a transform.
+        :param value: a value which is not empty
+        :return: a function which changes two-dimensional list of data and returns them.
+        :raise InvalidTransformError: if the value is invalid.
+        """
+    pass
+
+  def check_value(self, value: str):
+    if value is not None and len(value.strip()) != 0:
+      self.compile(value)
+
+  def apply_info_to_sheet(self, sheet: 'Sheet', value: str):
+    """
+        Manipulates a worksheet with the specified value. Data of the worksheet are read, changed and written
+        again, so writers apply "apply_info_to_data" before writing instead.
+        :param sheet: a worksheet which will be manipulated
+        :param value: a value used when manipulating
+        """
+    if value is None or len(value.strip()) == 0: return
+    used = sheet.range('A1').expand()
+    data = self.apply_info_to_data(used.options(ndim=2).value, value)
+    used.clear_contents()
+    if len(data) != 0:
+      sheet.range((1, 1)).value = data
+
+  def apply_info_to_data(self, data: List[List], value: str) -> List[List]:
+    if value is None or len(value.strip()) == 0: return data
+    with span("transform", info=self.info_name) as sp:
+      data = self.compile(value)(data)
+      sp["rows"] = len(data)
+    return data
+
+
+class RowFilterInfo(DataTransformInfo):
+  """ This class keeps the rows of a worksheet that meet conditions such as "header=1 C>0 A=PASS". """
+
+  def __init__(self):
+    super(RowFilterInfo, self).__init__(
+      "Row Filter", "Conditions that kept rows meet, such as 'header=1 C>0 B!=-999 A=PASS'. "
+                    "The first 'header' rows are always kept.")
+
+  def compile(self, value: str):
+    return compile_row_filter(value)
+
+  def apply_info_to_chunks(self, chunks: Iterator[List[List]], value: str) -> Iterator[List[List]]:
+    """ The header rows are the first rows of all the chunks, not of each chunk. """
+    if value is None or len(value.strip()) == 0:
+      yield from chunks
+      return
+    header, keep = compile_row_condition(value)
+    n_rows = 0
+    for chunk in chunks:
+      head = chunk[:max(header - n_rows, 0)]
+      n_rows += len(chunk)
+      yield head + [row for row in chunk[len(head):] if keep(row)]
+
+  def header_rows(self, value: str) -> int:
+    """
+    :param value: a value of this information
+    :return: the number of header rows in the value, or None if it is not given.
+    """
+    return row_filter_header(value)
+
+
+class RoundInfo(DataTransformInfo):
+  """ This class scales and rounds numbers of columns, such as "B:D*0.001~3 F/2". """
+
+  def __init__(self):
+    super(RoundInfo, self).__init__(
+      "Round / Scale", "Columns with a factor ('*' or '/') and digits ('~'), such as 'B:D*0.001~3 F/2'.",
+      keeps_positions=True)
+
+  def compile(self, value: str):
+    return compile_round(value)
+
+
+class MaxRowsInfo(DataTransformInfo):
+  """ This class keeps the first rows of a worksheet only. """
+
+  def __init__(self):
+    super(MaxRowsInfo, self).__init__("Max Rows", "The maximum number of rows, including headers.",
+                                      keeps_positions=True)
+
+  def compile(self, value: str):
+    return compile_max_rows(value)
+
+  def apply_info_to_chunks(self, chunks: Iterator[List[List]], value: str) -> Iterator[List[List]]:
+    """ Chunks after the maximum number of rows are not read. """
+    if value is None or len(value.strip()) == 0:
+      yield from chunks
+      return
+    n_left = parse_max_rows(value)
+    for chunk in chunks:
+      if n_left <= 0:
+        return
+      yield chunk[:n_left]
+      n_left -= len(chunk)
+
+
+class KeepColumnsInfo(DataTransformInfo):
+  """ This class keeps listed columns of a worksheet only, such as "A C:F 12". It is applied last,
+      so other "SheetInfo"s refer to the columns of text files. """
+
+  def __init__(self):
+    super(KeepColumnsInfo, self).__init__(
+      "Keep Columns", "Columns to keep in this order, such as 'A C:F 12'. Empty keeps all the columns.")
+
+  def compile(self, value: str):
+    return compile_keep_columns(value)
+
+
+sheet_infos: List[SheetInfo] = []  # global variable that contains "SheetInfo"s, applied in this order.
 sheet_infos.append(MissingValueInfo())
+sheet_infos.append(RowFilterInfo())
+sheet_infos.append(RoundInfo())
+sheet_infos.append(MaxRowsInfo())
+sheet_infos.append(KeepColumnsInfo())
@@ -0,0 +1,260 @@
+"""
+    This module compiles transforms of the data of a worksheet: keeping columns, filtering rows, rounding and
+    scaling columns, and capping rows. A transform is compiled once per value and changes a whole block.
+
+    Columns are Excel letters or numbers from 1, and ranges of them such as "C:F" or "3-6".
+        Keep Columns:   "A C:F 12"        keeps the columns in this order.
+        Row Filter:     "header=1 C>0 B!=-999 A=PASS"
+                        keeps rows that meet all the conditions. The first "header" rows are always kept.
+                        ">", ">=", "<" and "<=" compare numbers, and "=" and "!=" compare numbers or strings.
+                        A cell which is not a number meets "!=" of a number only.
+        Round / Scale:  "B:D*0.001~3 F/2"
+                        multiplies ("*") or divides ("/") numbers of the columns, then rounds them to "~" digits.
+        Max Rows:       "1000"            keeps the first rows only.
+"""
+
+import math
+import operator
+import re
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Callable, Tuple
+
+from basic.errors import InvalidTransformError
+
+Transform = Callable[[List[List]], List[List]]
+
+_COLUMN = re.compile(r'^(?:([A-Za-z]+)|(\d+))$')
+_CONDITION = re.compile(r'^([A-Za-z]+|\d+)(!=|>=|<=|=|>|<)(.+)$')
+_ROUND = re.compile(r'^([A-Za-z0-9:\-]+?)(?:([*/])([^~]+))?(?:~(\d+))?$')
+_OPERATORS = {"=": operator.eq, "!=": operator.ne, ">": operator.gt, ">=": operator.ge, "<": operator.lt,
+              "<=": operator.le}
+
+
+def column_number(text: str) -> int:
+  """
+  :param text: a column such as "C" or "3"
+  :return: the index of the column from 0.
+  :raise InvalidTransformError: if it is not a column.
+  """
+  match = _COLUMN.match(text)
+  if match is None or text == "0":
+    raise InvalidTransformError("'" + text + "' is not a column.")
+  if match.group(2) is not None:
+    return int(match.group(2)) - 1
+  index = 0
+  for letter in match.group(1).upper():
+    index = index * 26 + ord(letter) - ord('A') + 1
+  return index - 1
+
+
+def parse_columns(text: str) -> List[int]:
+  """
+  :param text: columns and ranges of columns such as "A C:F 12 14-16", separated by white spaces
+  :return: a list of the indexes of the columns from 0, in the order of the text without duplicates.
+  :raise InvalidTransformError: if a column or a range is invalid.
+  """
+  result = []
+  for token in text.split():
+    parts = re.split(r'[:\-]', token)
+    if len(parts) > 2:
+      raise InvalidTransformError("'" + token + "' is not a range of columns.")
+    first, last = column_number(parts[0]), column_number(parts[-1])
+    if first > last:
+      raise InvalidTransformError("The range of columns '" + token + "' is empty.")
+    result.extend(c for c in range(first, last + 1) if c not in result)
+  return result
+
+
+def _number(text: str, rule: str) -> float:
+  try:
+    return float(text)
+  except ValueError:
+    raise InvalidTransformError("'" + text + "' in '" + rule + "' is not a number.")
+
+
+@lru_cache(maxsize=256)
+def compile_keep_columns(value: str) -> Transform:
+  """
+  :param value: columns to keep
+  :return: a transform that keeps the columns. Short rows get None for missing columns.
+  :raise InvalidTransformError: if the value is invalid.
+  """
+  columns = parse_columns(value)
+  last = max(columns)
+  pick = itemgetter(*columns)
+  many = len(columns) > 1
+
+  def keep_columns(rows: List[List]) -> List[List]:
+    for r, row in enumerate(rows):
+      if len(row) > last:
+        rows[r] = list(pick(row)) if many else [pick(row)]
+      else:
+        rows[r] = [row[c] if c < len(row) else None for c in columns]
+    return rows
+
+  return keep_columns
+
+
+@lru_cache(maxsize=256)
+def compile_row_filter(value: str) -> Transform:
+  """
+  :param value: conditions of rows to keep
+  :return: a transform that removes the rows which do not meet the conditions.
+  :raise InvalidTransformError: if the value is invalid.
+  """
+  header, keep = compile_row_condition(value)
+
+  def filter_rows(rows: List[List]) -> List[List]:
+    rows[header:] = [row for row in rows[header:] if keep(row)]
+    return rows
+
+  return filter_rows
+
+
+@lru_cache(maxsize=256)
+def compile_row_condition(value: str) -> Tuple[int, Callable[[List], bool]]:
+  """
+  :param value: conditions of rows to keep
+  :return: (the number of header rows, a function which tells whether a row meets the conditions).
+  :raise InvalidTransformError: if the value is invalid.
+  """
+  header = 0
+  conditions = []
+  for rule in value.split():
+    if rule.startswith("header="):
+      header = _parse_header(rule)
+      continue
+    match = _CONDITION.match(rule)
+    if match is None:
+      raise InvalidTransformError("'" + rule + "' is not a condition such as 'C>0'.")
+    column, compare, operand = column_number(match.group(1)), _OPERATORS[match.group(2)], match.group(3)
+    try:
+      conditions.append(_condition(_cell_number, column, compare, float(operand)))
+    except ValueError:
+      if match.group(2) not in ("=", "!="):
+        raise InvalidTransformError("'" + operand + "' in '" + rule + "' must be a number to compare.")
+      conditions.append(_condition(_cell, column, compare, operand))
+
+  if len(conditions) == 0:
+    return header, lambda row: True
+  if len(conditions) == 1:
+    return header, conditions[0]
+  return header, lambda row: all(condition(row) for condition in conditions)
+
+
+def _condition(cell, column: int, compare, operand) -> Callable[[List], bool]:
+  """ Returns a function which tells whether a cell of a row, read by "cell", meets a comparison with an operand. """
+  return lambda row: compare(cell(row, column), operand)
+
+
+def row_filter_header(value: str) -> int:
+  """
+  :param value: conditions of rows to keep
+  :return: the number of header rows of the value, or None if it has no "header=".
+  :raise InvalidTransformError: if the number of header rows is invalid.
+  """
+  for rule in value.split() if value is not None else []:
+    if rule.startswith("header="):
+      return _parse_header(rule)
+  return None
+
+
+def _parse_header(rule: str) -> int:
+  """
+  :param rule: a rule such as "header=1"
+  :return: the number of header rows.
+  :raise InvalidTransformError: if the number is not an integer which is 0 or more.
+  """
+  try:
+    header = int(rule[len("header="):])
+  except ValueError:
+    raise InvalidTransformError("'" + rule + "' must have a whole number of header rows.")
+  if header < 0:
+    raise InvalidTransformError("The number of header rows in '" + rule + "' must not be negative.")
+  return header
+
+
+def _cell(row: List, column: int):
+  return row[column] if column < len(row) else None
+
+
+def _cell_number(row: List, column: int) -> float:
+  """ Returns a cell as a number. A cell which is not a number is NaN, so that it fails every comparison except
+      "!=", which it meets: "B!=-999" keeps a row whose B is text or empty. """
+  try:
+    return float(row[column])
+  except (IndexError, TypeError, ValueError):
+    return float("nan")
+
+
+@lru_cache(maxsize=256)
+def compile_round(value: str) -> Transform:
+  """
+  :param value: columns with a factor and digits
+  :return: a transform that scales and rounds finite numbers of the columns. Other cells are not changed.
+  :raise InvalidTransformError: if the value is invalid.
+  """
+  operations = {}
+  for rule in value.split():
+    match = _ROUND.match(rule)
+    if match is None or (match.group(2) is None and match.group(4) is None):
+      raise InvalidTransformError("'" + rule + "' is not such as 'B:D*0.001~3'.")
+    factor = 1.0
+    if match.group(2) is not None:
+      factor = _number(match.group(3), rule)
+      if match.group(2) == "/":
+        if factor == 0:
+          raise InvalidTransformError("'" + rule + "' divides by zero.")
+        factor = 1 / factor
+    digits = int(match.group(4)) if match.group(4) is not None else None
+    for column in parse_columns(match.group(1)):
+      operations[column] = (factor, digits)
+
+  def round_columns(rows: List[List]) -> List[List]:
+    for column, (factor, digits) in operations.items():
+      for row in rows:
+        if column >= len(row) or row[column] is None:
+          continue
+        try:
+          number = float(row[column]) * factor
+        except (TypeError, ValueError):
+          continue
+        # "nan" and "inf" are not numbers of a worksheet, so such cells are left as they are.
+        if not math.isfinite(number):
+          continue
+        row[column] = round(number, digits) if digits is not None else number
+    return rows
+
+  return round_columns
+
+
+@lru_cache(maxsize=256)
+def compile_max_rows(value: str) -> Transform:
+  """
+  :param value: the maximum number of rows
+  :return: a transform that keeps the first rows only.
+  :raise InvalidTransformError: if the value is not a positive integer.
+  """
+  n_rows = parse_max_rows(value)
+
+  def cap_rows(rows: List[List]) -> List[List]:
+    del rows[n_rows:]
+    return rows
+
+  return cap_rows
+
+
+def parse_max_rows(value: str) -> int:
+  """
+  :param value: the maximum number of rows
+  :return: the number.
+  :raise InvalidTransformError: if the value is not a positive integer.
+  """
+  try:
+    n_rows = int(value)
+  except ValueError:
+    raise InvalidTransformError("'" + value.strip() + "' is not a number of rows.")
+  if n_rows <= 0:
+    raise InvalidTransformError("The number of rows must be positive.")
+  return n_rows
@@ -0,0 +1,84 @@
+"""
+    This module measures how long importing modules of this program takes in a new Python process.
+
+    Usage:
+        python -m benchmark.startup [--repeat N] [--max-ms MS]
+
+    Each module is imported in a new process "repeat" times, and the median time is printed as JSON.
+    It fails if a module imports a heavy library (xlwings, PyQt5, pywin32) that it is not allowed to, or if the
+    median time of a module is longer than "max-ms". The GUI may import PyQt5 only, and it is skipped where
+    PyQt5 is not installed.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules to import, with the heavy modules which each of them is allowed to import.
+MODULES = {"basic.list2d": [], "basic.file": [], "basic.job": [], "basic.service": [], "basic.distribute": [],
+           "gui.mainwindow": ["PyQt5"]}
+HEAVY_MODULES = ["xlwings", "PyQt5", "pythoncom", "win32api"]
+
+SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+try:
+  import %s
+except ImportError as e:
+  if e.name is None or e.name.split(".")[0] not in %r:
+    raise
+  print(json.dumps({"skipped": str(e)}))
+  sys.exit(0)
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+  """
+  Imports a module in new processes and measures the time.
+  :param module: the name of a module
+  :param repeat: the number of processes
+  :return: a dictionary of the median time in milliseconds and heavy modules imported with the module,
+           or of the reason why the module cannot be imported here.
+  """
+  times, heavy = [], []
+  for _ in range(repeat):
+    output = subprocess.check_output([sys.executable, "-c", SCRIPT % (module, MODULES.get(module, []), HEAVY_MODULES)], cwd=ROOT)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    if "skipped" in result:
+      return {"module": module, "skipped": result["skipped"]}
+    times.append(result["ms"])
+    heavy = result["heavy"]
+  return {"module": module, "median_ms": round(statistics.median(times), 2), "heavy_modules": heavy}
+
+
+def main(argv=None) -> int:
+  parser = argparse.ArgumentParser(prog="python -m benchmark.startup")
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--max-ms", type=float, default=None)
+  args = parser.parse_args(argv)
+
+  failed = False
+  results = []
+  for module, allowed in MODULES.items():
+    result = measure(module, args.repeat)
+    results.append(result)
+    if "skipped" in result:
+      continue
+    if any(m not in allowed for m in result["heavy_modules"]):
+      failed = True
+    if args.max_ms is not None and result["median_ms"] > args.max_ms:
+      failed = True
+
+  print(json.dumps({"results": results, "failed": failed}, indent=2))
+  return 1 if failed else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+    This module times the stages of a conversion on synthetic tester data, and compares them with a baseline.
+
+    Usage:
+        python -m benchmark.suite [--serials N] [--rows N] [--cols N] ... [--repeat N]
+                                  [--save-baseline FILE] [--compare FILE [--tolerance RATIO]]
+
+    The median time of each case is printed as JSON. With "--compare", a case is a regression if it is slower
+    than the baseline by more than "tolerance", and the exit status is 1 if there is a regression.
+    The "excel" backend is skipped when Excel cannot be opened, so the suite runs on Linux.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from basic.file import str_to_matrix, scan_text_files, group_data_files, make_data_table, choose_data_files, \
+  text_to_excel, text_to_workbook, merge_specified_range, merge_data_files
+from basic.file.files import ExcelFile
+from basic.file.pipeline import pipelined_text_to_excel
+from basic.job import make_sheet_data
+from basic.list2d import Table
+from benchmark.synthetic import make_lot
+
+
+class Skipped(Exception):
+  """ This exception is raised by a case that cannot run here. """
+  pass
+
+
+class Suite(object):
+  """ This class has the cases of the benchmark. A case is a method whose name starts with "case_".
+
+      Attributes:
+          _lot: a dictionary of synthetic data from "make_lot"
+          _output: a directory where Excel files are saved
+          _text_files: text files of the lot
+          _sheet_data: "SheetData"s of the template
+          _last_files: the names of Excel files saved by the last backend case
+  """
+
+  def __init__(self, lot: dict, output: str):
+    self._lot = lot
+    self._output = output
+    self._text_files = [tf for files, _ in scan_text_files([lot["data"]]) for tf in files]
+    self._sheet_data = make_sheet_data(lot["sheet_names"], {"*": lot["missing_value"]})
+    self._text = self._text_files[0].get_data()
+    self._last_files = []
+
+  def cases(self):
+    return [name[len("case_"):] for name in dir(self) if name.startswith("case_")]
+
+  def run(self, name: str, repeat: int) -> dict:
+    """
+    Runs a case "repeat" times. If a case returns seconds, they are used instead of the time of the whole case.
+    :param name: the name of a case
+    :param repeat: the number of runs
+    :return: a dictionary of the median and minimum seconds, or of the reason why the case is skipped.
+    """
+    times = []
+    try:
+      for _ in range(repeat):
+        shutil.rmtree(self._output, ignore_errors=True)
+        os.makedirs(self._output)
+        start = time.perf_counter()
+        seconds = getattr(self, "case_" + name)()
+        times.append(seconds if seconds is not None else time.perf_counter() - start)
+    except Skipped as e:
+      return {"skipped": str(e)}
+    return {"median": round(statistics.median(times), 6), "min": round(min(times), 6)}
+
+  def case_str_to_matrix(self):
+    str_to_matrix(self._text)
+
+  def case_group_data_files(self):
+    group_data_files(self._text_files)
+
+  def case_make_data_table(self):
+    make_data_table(group_data_files(self._text_files), self._sheet_data, self._lot["keyword"])
+
+  def case_table_headers(self):
+    table: Table[int, str, str] = Table[int, str, str]()
+    table.append_header_hs(["COL" + str(c) for c in range(50)])
+    table.append_header_vs(["SERIAL%06d" % r for r in range(500)])
+    for r in range(0, 500, 7):
+      table.insert_with_header(r, "SERIAL%06d" % r, "COL" + str(r % 50))
+      table.get_row_with_header("SERIAL%06d" % r)
+    for c in range(0, 50, 5):
+      table.get_col_with_header("COL" + str(c))
+    for r in range(0, 500, 10):
+      table.remove_row_with_header("SERIAL%06d" % r)
+
+  def case_backend_xlsx(self):
+    self._last_files = text_to_excel(self.__data_table(), ExcelFile(self._lot["template"]), self.__save_names(),
+                                     backend="xlsx", save_path=self._output)
+
+  def case_backend_xlsx_pipeline(self):
+    pipelined_text_to_excel(self.__data_table(), ExcelFile(self._lot["template"]), self.__save_names(),
+                            backend="xlsx", save_path=self._output)
+
+  def case_backend_excel(self):
+    try:
+      ExcelFile.open_excel_app()
+    except Exception as e:
+      raise Skipped("Excel cannot be opened: " + type(e).__name__)
+    try:
+      text_to_excel(self.__data_table(), ExcelFile(self._lot["template"]), self.__save_names(), backend="excel",
+                    save_path=self._output)
+    finally:
+      ExcelFile.close_excel_app()
+
+  def case_merge_xlsx(self):
+    self.case_backend_xlsx()
+    start = time.perf_counter()
+    merge_specified_range(self._last_files, self._lot["sheet_names"][1] + "!A1:J50",
+                          os.path.join(self._output, "merged"), backend="xlsx")
+    return time.perf_counter() - start
+
+  def case_merge_only(self):
+    merge_data_files(self.__data_table(), ExcelFile(self._lot["template"]), self._lot["sheet_names"][1] + "!A1:J50",
+                     "merged", self._output)
+
+  def case_workbook_sheets(self):
+    text_to_workbook(self.__data_table(), ExcelFile(self._lot["template"]), "lot", "sheets", save_path=self._output)
+
+  def case_workbook_stacked(self):
+    text_to_workbook(self.__data_table(), ExcelFile(self._lot["template"]), "lot", "stacked", save_path=self._output)
+
+  def __data_table(self):
+    return choose_data_files(make_data_table(group_data_files(self._text_files), self._sheet_data,
+                                             self._lot["keyword"]))
+
+  def __save_names(self):
+    return [""] * len(group_data_files(self._text_files))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+  """
+  Compares results with a baseline.
+  :param results: a dictionary whose key is a case and value is a result of "Suite.run"
+  :param baseline: results saved before
+  :param tolerance: the ratio by which a case can be slower than the baseline
+  :return: a dictionary whose key is a case and value is the ratio to the baseline and whether it is a regression.
+  """
+  result = {}
+  for name, value in results.items():
+    old = baseline.get(name, {})
+    if "median" not in value or "median" not in old or old["median"] == 0:
+      continue
+    ratio = value["median"] / old["median"]
+    result[name] = {"ratio": round(ratio, 3), "regression": ratio > 1 + tolerance}
+  return result
+
+
+def main(argv=None) -> int:
+  parser = argparse.ArgumentParser(prog="python -m benchmark.suite")
+  parser.add_argument("--serials", type=int, default=20)
+  parser.add_argument("--files-per-serial", type=int, default=2)
+  parser.add_argument("--rows", type=int, default=500)
+  parser.add_argument("--cols", type=int, default=20)
+  parser.add_argument("--ragged", type=float, default=0.1)
+  parser.add_argument("--missing-density", type=float, default=0.05)
+  parser.add_argument("--sheets", type=int, default=4)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--repeat", type=int, default=3)
+  parser.add_argument("--cases", nargs="*", help="cases to run. All cases run if it is not given.")
+  parser.add_argument("--save-baseline", metavar="FILE")
+  parser.add_argument("--compare", metavar="FILE")
+  parser.add_argument("--tolerance", type=float, default=0.2)
+  args = parser.parse_args(argv)
+
+  config = {key: getattr(args, key) for key in ("serials", "files_per_serial", "rows", "cols", "ragged",
+                                                "missing_density", "sheets", "seed")}
+  directory = tempfile.mkdtemp(prefix="text_to_excel_bench_")
+  try:
+    lot = make_lot(directory, **config)
+    suite = Suite(lot, os.path.join(directory, "out"))
+    names = args.cases if args.cases else suite.cases()
+    results = {name: suite.run(name, args.repeat) for name in names}
+  finally:
+    shutil.rmtree(directory, ignore_errors=True)
+
+  report = {"config": config, "python": sys.version.split()[0], "results": results}
+  failed = False
+  if args.compare is not None:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    if baseline.get("config") != config:
+      print("The baseline was made with another config: " + json.dumps(baseline.get("config")), file=sys.stderr)
+    report["comparison"] = compare(results, baseline["results"], args.tolerance)
+    failed = any(c["regression"] for c in report["comparison"].values())
+  if args.save_baseline is not None:
+    with open(args.save_baseline, "w") as f:
+      json.dump(report, f, indent=2)
+
+  print(json.dumps(report, indent=2))
+  return 1 if failed else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
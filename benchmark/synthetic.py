@@ -0,0 +1,135 @@
+"""
+    This module makes synthetic tester data: text files of serials and a template Excel file.
+
+    Usage:
+        python -m benchmark.synthetic DIRECTORY [--serials N] [--rows N] [--cols N] [--sheets N] ...
+
+    Data files are named "<serial> Data<i>_raw.txt", and the template has a "Summary" sheet followed by
+    the data sheets "Data<i>_raw", so the keyword of data sheets is "_raw".
+"""
+
+import argparse
+import json
+import os
+import random
+import zipfile
+from typing import List
+
+from basic.file.xlsx import BLANK_WORKBOOK, NS_MAIN, NS_REL, NS_PKG_REL, WORKSHEET_TYPE
+
+KEYWORD = "_raw"
+
+
+def make_template(full_name: str, sheet_names: List[str]):
+  """
+  Makes a template Excel file that has empty worksheets.
+  :param full_name: the full name of the template
+  :param sheet_names: the names of the worksheets
+  """
+  entries = dict(BLANK_WORKBOOK)
+  entries["[Content_Types].xml"] = entries["[Content_Types].xml"].replace(
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>',
+    "".join('<Override PartName="/xl/worksheets/sheet' + str(i + 1) + '.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(len(sheet_names))))
+  entries["xl/workbook.xml"] = \
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' \
+    '<workbook xmlns="' + NS_MAIN + '" xmlns:r="' + NS_REL + '"><sheets>' \
+    + "".join('<sheet name="' + name + '" sheetId="' + str(i + 1) + '" r:id="rId' + str(i + 1) + '"/>'
+              for i, name in enumerate(sheet_names)) \
+    + '</sheets></workbook>'
+  entries["xl/_rels/workbook.xml.rels"] = \
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' \
+    '<Relationships xmlns="' + NS_PKG_REL + '">' \
+    + "".join('<Relationship Id="rId' + str(i + 1) + '" Type="' + WORKSHEET_TYPE + '" Target="worksheets/sheet'
+              + str(i + 1) + '.xml"/>' for i in range(len(sheet_names))) \
+    + '<Relationship Id="rId' + str(len(sheet_names) + 1) + '" Type="' + NS_REL + '/styles" Target="styles.xml"/>' \
+    + '</Relationships>'
+  sheet = entries.pop("xl/worksheets/sheet1.xml")
+  for i in range(len(sheet_names)):
+    entries["xl/worksheets/sheet" + str(i + 1) + ".xml"] = sheet
+
+  with zipfile.ZipFile(full_name, "w", zipfile.ZIP_DEFLATED) as archive:
+    for name, data in entries.items():
+      archive.writestr(name, data)
+
+
+def make_text(rng: random.Random, rows: int, cols: int, ragged: float = 0.0, missing_density: float = 0.0,
+              missing_value: str = "-999") -> str:
+  """
+  Makes string data of a data file. Cells are separated by tabs and rows by new lines.
+  :param rng: a random number generator
+  :param rows: the number of rows
+  :param cols: the number of columns
+  :param ragged: the ratio of rows which have fewer columns
+  :param missing_density: the ratio of cells which have the missing value
+  :param missing_value: a missing value
+  :return: string data.
+  """
+  lines = ["\t".join("COL" + str(c + 1) for c in range(cols))]
+  for _ in range(rows - 1):
+    n_cols = rng.randint(1, cols) if rng.random() < ragged else cols
+    lines.append("\t".join(missing_value if rng.random() < missing_density else "%.6g" % rng.gauss(0, 100)
+                           for _ in range(n_cols)))
+  return "\n".join(lines) + "\n"
+
+
+def make_lot(directory: str, serials: int = 20, files_per_serial: int = 2, rows: int = 500, cols: int = 20,
+             ragged: float = 0.0, missing_density: float = 0.05, missing_value: str = "-999", sheets: int = 4,
+             seed: int = 0) -> dict:
+  """
+  Makes a lot of synthetic data files and a template in a directory. The same arguments make the same files.
+  :param directory: a directory of the lot. It is created if it does not exist.
+  :param serials: the number of serials
+  :param files_per_serial: the number of data files of a serial. It is at most the number of data sheets.
+  :param rows: the number of rows of a data file
+  :param cols: the number of columns of a data file
+  :param ragged: the ratio of rows which have fewer columns
+  :param missing_density: the ratio of cells which have the missing value
+  :param missing_value: a missing value
+  :param sheets: the number of worksheets of the template, including a "Summary" sheet
+  :param seed: a seed of random numbers
+  :return: a dictionary of "template", "data" (the directory of data files), "sheet_names", "keyword",
+           "missing_value" and "files" (the full names of data files).
+  """
+  rng = random.Random(seed)
+  data_directory = os.path.join(directory, "data")
+  os.makedirs(data_directory, exist_ok=True)
+  sheet_names = ["Summary"] + ["Data" + str(i + 1) + KEYWORD for i in range(max(sheets - 1, 1))]
+  template = os.path.join(directory, "template.xlsx")
+  make_template(template, sheet_names)
+
+  files = []
+  for s in range(serials):
+    for sheet_name in sheet_names[1: 1 + files_per_serial]:
+      full_name = os.path.join(data_directory, "SERIAL%06d %s.txt" % (s + 1, sheet_name))
+      with open(full_name, "w") as f:
+        f.write(make_text(rng, rows, cols, ragged, missing_density, missing_value))
+      files.append(full_name)
+
+  return {"template": template, "data": data_directory, "sheet_names": sheet_names, "keyword": KEYWORD,
+          "missing_value": missing_value, "files": files}
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="python -m benchmark.synthetic", description="Makes synthetic tester data.")
+  parser.add_argument("directory")
+  parser.add_argument("--serials", type=int, default=20)
+  parser.add_argument("--files-per-serial", type=int, default=2)
+  parser.add_argument("--rows", type=int, default=500)
+  parser.add_argument("--cols", type=int, default=20)
+  parser.add_argument("--ragged", type=float, default=0.0, help="the ratio of rows which have fewer columns")
+  parser.add_argument("--missing-density", type=float, default=0.05)
+  parser.add_argument("--sheets", type=int, default=4, help="the number of worksheets including 'Summary'")
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args(argv)
+
+  lot = make_lot(args.directory, args.serials, args.files_per_serial, args.rows, args.cols, args.ragged,
+                 args.missing_density, sheets=args.sheets, seed=args.seed)
+  lot["files"] = len(lot["files"])
+  print(json.dumps(lot, indent=2))
+
+
+if __name__ == "__main__":
+  main()
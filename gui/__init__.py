@@ -1,5 +1,6 @@
 import os
 
-__all__ = ["datalist", "datatable", "dialogs", "mainwindow", "messages", "sheetinfo", "sheetkeyword", "template"]
+__all__ = ["datalist", "datatable", "dialogs", "mainwindow", "messages", "sheetinfo", "sheetkeyword", "template",
+           "inspection", "worker"]
 
 current_directory = os.getcwd()
@@ -6,15 +6,79 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from basic.file.files import TextFile
 from typing import List
+from collections import OrderedDict
 from gui.messages import ErrorMessage
+from gui.worker import ValidationWorker, ScanWorker
 import gui, sys
 
 
-class DataList(QListWidget):
+class DataListModel(QAbstractListModel):
+  """ This class represents a model that has a list of data.
+
+      Attributes:
+          _data: an ordered dictionary whose key is the full name of a text file and value is the text file.
+          _keys: a list of the keys of "_data" in order. It is rebuilt only when data are removed.
+  """
+
+  def __init__(self):
+    super(DataListModel, self).__init__()
+    self._data: OrderedDict = OrderedDict()
+    self._keys: List[str] = []
+
+  # Getters
+  @property
+  def data_list(self) -> List[TextFile]:
+    return list(self._data.values())
+
+  def add(self, data_list: List[TextFile]):
+    """
+    Adds data files at the end of the list. Files already in the list are ignored.
+    :param data_list: data files.
+    """
+    new_data = OrderedDict()
+    for data in data_list:
+      if data.full_name not in self._data:
+        new_data[data.full_name] = data
+    if len(new_data) == 0: return
+
+    self.beginInsertRows(QModelIndex(), len(self._keys), len(self._keys) + len(new_data) - 1)
+    self._data.update(new_data)
+    self._keys.extend(new_data.keys())
+    self.endInsertRows()
+
+  def remove_rows(self, rows: List[int]):
+    """
+    Removes data files in the rows.
+    :param rows: rows of removed data files.
+    """
+    if len(rows) == 0: return
+
+    self.beginResetModel()
+    for row in rows:
+      del self._data[self._keys[row]]
+    self._keys = list(self._data.keys())
+    self.endResetModel()
+
+  # QAbstractListModel
+  def rowCount(self, parent=QModelIndex()):
+    return 0 if parent.isValid() else len(self._keys)
+
+  def data(self, index, role=Qt.DisplayRole):
+    if not index.isValid():
+      return None
+    if role == Qt.DisplayRole:
+      return str(self._data[self._keys[index.row()]])
+    if role == Qt.ToolTipRole:
+      return self._keys[index.row()]
+    return None
+
+
+class DataList(QListView):
   """ This class shows a list of data.
 
       Attributes:
-          _data_list: a list of text files
+          _model: "DataListModel" object that has a list of text files
+          _validations: a list of ("QThread", "ValidationWorker") checking added files.
 
       Class Attributes:
           list_changed: a signal emitted when the list is changed.
@@ -23,7 +87,10 @@ class DataList(QListWidget):
 
   def __init__(self):
     super(DataList, self).__init__()
-    self._data_list: List[TextFile] = []
+    self._model = DataListModel()
+    self._validations = []
+    self.setModel(self._model)
+    self.setUniformItemSizes(True)
     self.setSelectionMode(QAbstractItemView.ExtendedSelection)
     self.setAcceptDrops(True)
     self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
@@ -34,39 +101,47 @@ class DataList(QListWidget):
   # Getters
   @property
   def data_list(self):
-    return self._data_list
-
-  def __add_data(self, data: TextFile):
-    """
-    Adds a data file in the list.
-    :param data: a data file.
-    """
-    if self._data_list.count(data) > 0: return
-
-    self.insertItem(len(self._data_list) - 1, str(data))
-    self._data_list.append(data)
+    return self._model.data_list
 
   def add_data_list(self, data_list: List[str]):
     """
-    Adds data files in the list.
+    Adds data files in the list. Files are checked in another thread and appear as they are checked.
     :param data_list: data files.
     """
-    error_files = []
+    self.__start_validation(ValidationWorker(data_list))
 
-    for data in data_list:
-      try:
-        self.__add_data(TextFile(data))
-      except Exception as e:
-        error_files.append((data, str(e)))
+  def add_directory(self, directory: str, recursive: bool = False):
+    """
+    Adds text files in a directory. Files are found in another thread and appear as they are found.
+    :param directory: a directory
+    :param recursive: whether text files in subdirectories are also added.
+    """
+    self.__start_validation(ScanWorker([directory], recursive))
+
+  def __start_validation(self, worker: ValidationWorker):
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.batch_validated.connect(self._model.add)
+    worker.done.connect(self.__validation_done)
+    worker.done.connect(thread.quit)
+    thread.finished.connect(lambda: self._validations.remove((thread, worker)))
+    self._validations.append((thread, worker))
+    thread.start()
 
-    # error
+  @pyqtSlot(list)
+  def __validation_done(self, error_files: List[tuple]):
+    """
+    Shows the files which are not added, and emits "list_changed".
+    :param error_files: a list of (file name, reason).
+    """
     if len(error_files) != 0:
       error_msg = "<p><nobr>These files are not added for following reason.</nobr><br><br>"
       for ef in error_files:
         error_msg += "<nobr>" + ef[0] + "</nobr><br><nobr>" + "==> " + ef[1] + "</nobr><br><br>"
       error_msg += "</p>"
       try:
-        error_mb = ErrorMessage("<nobr>Some files are not added.</nobr>")
+        error_mb = ErrorMessage("<nobr>" + str(len(error_files)) + " file(s) are not added.</nobr>")
         error_mb.setTextFormat(Qt.RichText)
         error_mb.setInformativeText(error_msg)
         error_mb.show()
@@ -78,13 +153,7 @@ class DataList(QListWidget):
 
   def remove_selected(self):
     """ Removes selected data files. """
-    for item in self.selectedItems():
-      self.takeItem(self.row(item))
-
-      for i, data in enumerate(self._data_list):
-        if str(data) == item.text():
-          del self._data_list[i]
-          break
+    self._model.remove_rows([index.row() for index in self.selectionModel().selectedRows()])
     self.list_changed.emit(self.data_list)
 
   # drag - drop functions for dragging & dropping files from OS Explorer.
@@ -112,7 +181,7 @@ class DataList(QListWidget):
 
   @pyqtSlot(list)
   def __print_list(self, data_list: List[TextFile]):
-    print("data file: " + str(data_list))
+    print("data file: " + str(len(data_list)) + " file(s)")
 
 
 class WgtDataList(QFrame):
@@ -121,6 +190,7 @@ class WgtDataList(QFrame):
       Attributes:
           _data_list: "DataList" object
           _bt_add: button to add data files
+          _bt_add_folder: button to add text files in a folder
           _bt_remove: button to remove data files
   """
 
@@ -128,10 +198,12 @@ class WgtDataList(QFrame):
     super(WgtDataList, self).__init__()
     self._data_list = DataList()
     self._bt_add = QPushButton('Add Data')
+    self._bt_add_folder = QPushButton('Add Folder')
     self._bt_remove = QPushButton('Remove Data')
 
     button_layout = QHBoxLayout()
     button_layout.addWidget(self._bt_add)
+    button_layout.addWidget(self._bt_add_folder)
     button_layout.addWidget(self._bt_remove)
 
     layout = QVBoxLayout()
@@ -143,6 +215,7 @@ class WgtDataList(QFrame):
     self.setFrameShape(QFrame.StyledPanel)
 
     self._bt_add.clicked.connect(self.__bt_add_clicked)
+    self._bt_add_folder.clicked.connect(self.__bt_add_folder_clicked)
     self._bt_remove.clicked.connect(self.__bt_remove_clicked)
 
   # Getters
@@ -159,6 +232,16 @@ class WgtDataList(QFrame):
 
     self._data_list.add_data_list(fname)
 
+  def __bt_add_folder_clicked(self):
+    directory = QFileDialog.getExistingDirectory(self, 'Open folder', directory=gui.current_directory)
+
+    if len(directory) == 0: return
+    gui.current_directory = directory
+
+    recursive = QMessageBox.question(self, 'Add Folder', 'Add text files in subfolders too?',
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No) == QMessageBox.Yes
+    self._data_list.add_directory(directory, recursive)
+
   def __bt_remove_clicked(self):
     self._data_list.remove_selected()
 
@@ -96,12 +96,9 @@ class DataDecisionTable(QTableWidget):
     self._serial_groups = group_data_files(tfs)
     self.update_table()
 
-  @pyqtSlot(ExcelFile)
-  def set_sheet_list(self, excel_file: ExcelFile):
-    self._sheet_list = []
-    with excel_file as excel:
-      for sheet in excel.sheets:
-        self._sheet_list.append(sheet.name)
+  @pyqtSlot(TemplateInfo)
+  def set_sheet_list(self, info: TemplateInfo):
+    self._sheet_list = list(info.sheet_names)
     self.update_table()
 
   @pyqtSlot(str)
@@ -6,12 +6,13 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from gui.datatable import DataTable
 from gui.messages import ErrorMessage, WaitingMessage, InformMessage
+from gui.worker import ConversionWorker
 from typing import List
-from basic.file import text_to_excel, merge_specified_range
 from basic.file.files import TextFile, ExcelFile
 from basic.sheetdata.sheetdata import SheetData
 from basic.list2d import Table
 from itertools import product
+import time
 
 
 class DlgSaveFileName(QDialog):
@@ -23,6 +24,7 @@ class DlgSaveFileName(QDialog):
           _excel_file: an Excel file.
           _data_table: a table from DataDecisionTable object.
           _sheet_data_list: a list of "SheetData"s
+          _cb_merge_only: a check box to merge the range only, without saving an Excel file of each serial.
           _bt_start_load: a button to start loading
           _bt_cancel: a button to quit the dialog.
   """
@@ -36,6 +38,7 @@ class DlgSaveFileName(QDialog):
     self._data_table = data_table
     self._sheet_data_list = sheet_data_list
     self._excel_range = excel_range
+    self._cb_merge_only = QCheckBox("Merge Only (No Excel File of Each Serial)") if self._edt_excel_range else None
     self._bt_start_load = QPushButton("Start Load")
     self._bt_cancel = QPushButton("Cancel")
 
@@ -49,6 +52,7 @@ class DlgSaveFileName(QDialog):
     if self._edt_excel_range:
       range_layout = QFormLayout()
       range_layout.addRow(QLabel('Name of a File to Merge Data'), self._edt_excel_range)
+      range_layout.addRow(self._cb_merge_only)
 
     button_layout = QHBoxLayout()
     button_layout.addSpacerItem(QSpacerItem(0, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
@@ -105,9 +109,6 @@ class DlgSaveFileName(QDialog):
         error_mb.exec_()
         return
 
-    loading_mb = WaitingMessage("<nobr>Loading data to excel files...</nobr>")
-    loading_mb.show()
-
     table: Table[TextFile, str, SheetData] = Table[TextFile, str, SheetData]()
 
     table.append_header_vs(self._data_table.header_v)
@@ -115,18 +116,39 @@ class DlgSaveFileName(QDialog):
     for r, c in product(range(table.n_row), range(table.n_col)):
       table.insert(self._data_table.get(r, c), r, c)
 
-    try:
-      final_names = text_to_excel(table, self._excel_file, names)
-      if self._edt_excel_range:
-        path = final_names[0][0: final_names[0].rfind('\\') + 1]
-        merge_specified_range(final_names, self._excel_range, path + excel_range_file_name)
-    except Exception as e:
-      error_mb = ErrorMessage("<nobr>Error: " + str(e) + "</nobr>")
-      import traceback
-      traceback.print_exc()
-      error_mb.show()
-      error_mb.exec_()
-    loading_mb.accept()
+    self._worker = ConversionWorker(table, self._excel_file, names,
+                                    self._excel_range if self._edt_excel_range else "",
+                                    excel_range_file_name if self._edt_excel_range else "",
+                                    self._cb_merge_only is not None and self._cb_merge_only.isChecked())
+    self._thread = QThread()
+    self._worker.moveToThread(self._thread)
+    self._thread.started.connect(self._worker.run)
+    self._worker.done.connect(self.__loading_done)
+    self._worker.failed.connect(self.__loading_failed)
+    self._worker.done.connect(self._thread.quit)
+    self._worker.failed.connect(self._thread.quit)
+
+    self._progress_dlg = DlgProgress(self._worker)
+    self.hide()
+    self._progress_dlg.show()
+    self._thread.start()
+
+  @pyqtSlot(list, bool)
+  def __loading_done(self, final_names: List[str], cancelled: bool):
+    self._progress_dlg.finish()
+    if cancelled:
+      inform_mb = InformMessage("<nobr>Loading is cancelled. " + str(len(final_names))
+                                + " Excel file(s) are saved.</nobr>")
+      inform_mb.show()
+      inform_mb.exec_()
+    self.accept()
+
+  @pyqtSlot(str)
+  def __loading_failed(self, msg: str):
+    self._progress_dlg.finish()
+    error_mb = ErrorMessage("<nobr>Error: " + msg + "</nobr>")
+    error_mb.show()
+    error_mb.exec_()
     self.accept()
 
   def __make_connected_edt(self) -> QLineEdit:
@@ -135,6 +157,93 @@ class DlgSaveFileName(QDialog):
     return edt_name
 
 
+class DlgProgress(QDialog):
+  """ This class represents a dialog showing the progress of loading data to Excel files.
+
+      Attributes:
+          _worker: "ConversionWorker" object which loads data.
+          _pb_serial: a progress bar for saved Excel files
+          _pb_sheet: a progress bar for loaded sheets
+          _lbl_serial: a label that shows the serial which is saved last.
+          _lbl_sheet: a label that shows the sheet which is loaded last.
+          _lbl_eta: a label that shows the estimated remaining time.
+          _bt_cancel: a button to stop loading at the next Excel file.
+          _start_time: the time when loading starts.
+          _finished: whether loading finishes.
+  """
+
+  def __init__(self, worker: ConversionWorker):
+    super(DlgProgress, self).__init__()
+    self.setWindowTitle("Loading")
+    self._worker = worker
+    self._pb_serial = QProgressBar()
+    self._pb_sheet = QProgressBar()
+    self._lbl_serial = QLabel("")
+    self._lbl_sheet = QLabel("")
+    self._lbl_eta = QLabel("Remaining time: -")
+    self._bt_cancel = QPushButton("Cancel")
+    self._start_time = time.monotonic()
+    self._finished = False
+
+    self._pb_serial.setRange(0, max(worker.n_serials, 1))
+    self._pb_serial.setValue(0)
+    self._pb_sheet.setRange(0, max(worker.n_sheets, 1))
+    self._pb_sheet.setValue(0)
+
+    layout = QFormLayout()
+    layout.addRow(QLabel("Excel files"), self._pb_serial)
+    layout.addRow(QLabel(""), self._lbl_serial)
+    layout.addRow(QLabel("Sheets"), self._pb_sheet)
+    layout.addRow(QLabel(""), self._lbl_sheet)
+
+    button_layout = QHBoxLayout()
+    button_layout.addWidget(self._lbl_eta)
+    button_layout.addSpacerItem(QSpacerItem(0, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
+    button_layout.addWidget(self._bt_cancel)
+
+    v_layout = QVBoxLayout()
+    v_layout.addLayout(layout)
+    v_layout.addLayout(button_layout)
+    self.setLayout(v_layout)
+
+    self._worker.serial_progress.connect(self.__serial_progress)
+    self._worker.sheet_progress.connect(self.__sheet_progress)
+    self._bt_cancel.clicked.connect(self.__bt_cancel_clicked)
+
+    self.setWindowModality(Qt.ApplicationModal)
+    self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint & ~Qt.WindowCloseButtonHint)
+
+  @pyqtSlot(int, int, str)
+  def __serial_progress(self, n_done: int, n_all: int, serial: str):
+    self._pb_serial.setValue(n_done)
+    self._lbl_serial.setText(serial + " is saved. (" + str(n_done) + " / " + str(n_all) + ")")
+
+  @pyqtSlot(int, int, str)
+  def __sheet_progress(self, n_done: int, n_all: int, sheet_name: str):
+    self._pb_sheet.setValue(n_done)
+    self._lbl_sheet.setText(sheet_name + " is loaded. (" + str(n_done) + " / " + str(n_all) + ")")
+
+    remaining = (time.monotonic() - self._start_time) * (n_all - n_done) / n_done
+    minutes, seconds = divmod(int(remaining), 60)
+    hours, minutes = divmod(minutes, 60)
+    self._lbl_eta.setText("Remaining time: %d:%02d:%02d" % (hours, minutes, seconds))
+
+  def __bt_cancel_clicked(self):
+    self._worker.cancel()
+    self._bt_cancel.setEnabled(False)
+    self._lbl_eta.setText("Cancelling after the current Excel file...")
+
+  def finish(self):
+    """ Closes the dialog when loading finishes. """
+    self._finished = True
+    self.accept()
+
+  def reject(self):
+    """ Ignores closing by the Escape key while loading. Loading is stopped only by the cancel button. """
+    if self._finished:
+      super(DlgProgress, self).reject()
+
+
 class DlgAboutProgram(QDialog):
   """ This class represents a dialog for information about this program. """
 
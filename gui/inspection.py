@@ -0,0 +1,95 @@
+"""
+    This module has classes to read the information of a template out of the GUI thread.
+"""
+
+from PyQt5.QtCore import *
+from basic.file.files import ExcelFile, TemplateInfo
+import os
+
+
+class InspectionWorker(QObject):
+  """ This class reads "TemplateInfo" of an Excel file. It runs in a "QThread".
+
+      Attributes:
+          _excel_file: an Excel file to read.
+
+      Class Attributes:
+          done: a signal emitted with "TemplateInfo" when reading finishes.
+          failed: a signal emitted with an error message when reading fails.
+  """
+  done = pyqtSignal(TemplateInfo)
+  failed = pyqtSignal(str)
+
+  def __init__(self, excel_file: ExcelFile):
+    super(InspectionWorker, self).__init__()
+    self._excel_file = excel_file
+
+  @pyqtSlot()
+  def run(self):
+    try:
+      self.done.emit(self._excel_file.inspect())
+    except Exception as e:
+      self.failed.emit(str(e))
+
+
+class TemplateInspector(QObject):
+  """ This class reads "TemplateInfo" of templates once and publishes it to all connected widgets.
+
+      "TemplateInfo"s are cached with the full name and the modification time of files.
+
+      Attributes:
+          _cache: a dictionary whose key is (full name, modification time) and value is "TemplateInfo".
+          _running: a list of ("QThread", "InspectionWorker") reading templates.
+          _requested: the full name of the template requested last.
+
+      Class Attributes:
+          template_inspected: a signal emitted with "TemplateInfo" of the template requested last.
+          inspection_failed: a signal emitted with an error message when reading fails.
+  """
+  template_inspected = pyqtSignal(TemplateInfo)
+  inspection_failed = pyqtSignal(str)
+
+  def __init__(self):
+    super(TemplateInspector, self).__init__()
+    self._cache = {}
+    self._running = []
+    self._requested = ""
+
+  @pyqtSlot(ExcelFile)
+  def inspect(self, excel_file: ExcelFile):
+    """
+    Reads "TemplateInfo" of an Excel file in another thread, or from the cache if the file is not modified.
+    "template_inspected" or "inspection_failed" is emitted when it finishes.
+    :param excel_file: an Excel file for a template.
+    """
+    self._requested = excel_file.full_name
+    try:
+      key = (excel_file.full_name, os.stat(excel_file.full_name).st_mtime)
+    except OSError as e:
+      self.inspection_failed.emit(str(e))
+      return
+    if key in self._cache:
+      self.template_inspected.emit(self._cache[key])
+      return
+
+    thread = QThread()
+    worker = InspectionWorker(excel_file)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.done.connect(self.__inspected)
+    worker.failed.connect(self.__failed)
+    worker.done.connect(thread.quit)
+    worker.failed.connect(thread.quit)
+    thread.finished.connect(lambda: self._running.remove((thread, worker)))
+    self._running.append((thread, worker))
+    thread.start()
+
+  @pyqtSlot(TemplateInfo)
+  def __inspected(self, info: TemplateInfo):
+    self._cache[(info.full_name, info.mtime)] = info
+    if info.full_name == self._requested:
+      self.template_inspected.emit(info)
+
+  @pyqtSlot(str)
+  def __failed(self, msg: str):
+    self.inspection_failed.emit(msg)
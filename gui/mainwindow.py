@@ -67,8 +67,8 @@ class MainWindow(QMainWindow):
     about_action.triggered.connect(self.about_action_triggered)
 
     # signals - slots
-    self._template.template_changed.connect(self._sheet_info.info_table.set_excel_file)
-    self._template.template_changed.connect(self._data_table.data_table.set_sheet_list)
+    self._template.template_inspected.connect(self._sheet_info.info_table.set_template_info)
+    self._template.template_inspected.connect(self._data_table.data_table.set_sheet_list)
     self._data_list.data_list.list_changed.connect(self._data_table.data_table.set_serial_groups)
     self._data_table.bt_set_save_file_names.clicked.connect(self.__bt_set_save_file_names)
     self._keyword.keyword_changed.connect(self._data_table.data_table.set_keyword)
@@ -81,7 +81,12 @@ class MainWindow(QMainWindow):
     dlg.exec_()
 
   def __bt_set_save_file_names(self):
-    if check_valid_range(self._range.excel_range()):
+    if self._template.template is None or self._template.template_info is None:
+      error_mb = ErrorMessage("Please select a template and wait until it is read.")
+      error_mb.show()
+      error_mb.exec_()
+      return
+    if check_valid_range(self._range.excel_range(), self._template.template_info):
       DlgSaveFileName(self._template.template,
                       self._data_table.data_table.get_table(),
                       self._sheet_info.info_table.get_sheet_data(),
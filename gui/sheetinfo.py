@@ -6,23 +6,112 @@ from basic.sheetdata.sheetdata import *
 from basic.file.files import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
-from itertools import product
+from PyQt5.QtGui import QCursor
+from typing import List
 import sys
 
 
+class SheetSearchIndex(object):
+  """ This class represents an index to search worksheet names.
+
+      A keyword matches a name if the name contains the keyword. In fuzzy mode, it matches if the letters of
+      the keyword appear in the name in order. When a keyword extends the previous keyword, only the names
+      matched by the previous keyword are checked again.
+
+      Attributes:
+          _names: a list of worksheet names
+          _letters: a dictionary whose key is a letter and value is a set of the indexes of names having it.
+          _keyword: the previous keyword
+          _fuzzy: whether the previous search was fuzzy
+          _matched: a set of the indexes of names matched by the previous keyword.
+  """
+
+  def __init__(self, names: List[str] = None):
+    self._names: List[str] = []
+    self._letters = {}
+    self._keyword = ""
+    self._fuzzy = False
+    self._matched = set()
+    self.set_names(names if names is not None else [])
+
+  # Getters
+  @property
+  def matched(self):
+    return self._matched
+
+  def set_names(self, names: List[str]):
+    """
+    Rebuilds the index with new names. All the names are matched after rebuilding.
+    :param names: a list of worksheet names.
+    """
+    self._names = list(names)
+    self._letters = {}
+    for i, name in enumerate(self._names):
+      for letter in set(name):
+        self._letters.setdefault(letter, set()).add(i)
+    self._keyword = ""
+    self._fuzzy = False
+    self._matched = set(range(len(self._names)))
+
+  def search(self, keyword: str, fuzzy: bool = False):
+    """
+    Searches names with a keyword.
+    :param keyword: search key
+    :param fuzzy: whether the letters of the keyword may be apart in a name.
+    :return: a tuple of a set of the indexes of newly matched names and a set of the indexes of names
+             which are not matched anymore.
+    """
+    if fuzzy == self._fuzzy and self.__extends(keyword, fuzzy):
+      candidates = self._matched
+    else:
+      candidates = set(range(len(self._names)))
+    for letter in set(keyword):
+      candidates = candidates & self._letters.get(letter, set())
+      if len(candidates) == 0:
+        break
+
+    if fuzzy:
+      matched = {i for i in candidates if SheetSearchIndex.__is_subsequence(keyword, self._names[i])}
+    else:
+      matched = {i for i in candidates if keyword in self._names[i]}
+
+    shown, hidden = matched - self._matched, self._matched - matched
+    self._keyword, self._fuzzy, self._matched = keyword, fuzzy, matched
+    return shown, hidden
+
+  def __extends(self, keyword: str, fuzzy: bool) -> bool:
+    """
+    :return: whether every name matched by "keyword" is matched by the previous keyword.
+    """
+    if fuzzy:
+      return SheetSearchIndex.__is_subsequence(self._keyword, keyword)
+    return self._keyword in keyword
+
+  @staticmethod
+  def __is_subsequence(keyword: str, name: str) -> bool:
+    letters = iter(name)
+    return all(letter in letters for letter in keyword)
+
+
 class SearchBar(QWidget):
   """ This class represents a search bar to search worksheets.
 
       Attributes:
           _edt_search: QLineEdit object for search key.
+          _chk_fuzzy: QCheckBox object to search letters of the key apart from each other.
   """
 
   def __init__(self):
     super(SearchBar, self).__init__()
     self._edt_search = QLineEdit()
+    self._chk_fuzzy = QCheckBox("Fuzzy")
+
+    search_layout = QHBoxLayout()
+    search_layout.addWidget(self._edt_search)
+    search_layout.addWidget(self._chk_fuzzy)
 
     layout = QFormLayout()
-    layout.addRow(QLabel("Search"), self._edt_search)
+    layout.addRow(QLabel("Search"), search_layout)
 
     self.setLayout(layout)
 
@@ -30,139 +119,258 @@ class SearchBar(QWidget):
   def edt_search(self):
     return self._edt_search
 
+  @property
+  def chk_fuzzy(self):
+    return self._chk_fuzzy
+
   def keyword(self) -> str:
     return self._edt_search.text()
 
+  def fuzzy(self) -> bool:
+    return self._chk_fuzzy.isChecked()
+
   @pyqtSlot(ExcelFile)
   def clear_bar(self):
     self._edt_search.setText("")
 
 
-class SheetInfoTable(QTableWidget):
-  """ This class represents a table to decide how to manipulate worksheets.
+class SheetInfoModel(QAbstractTableModel):
+  """ This class represents a model that has how to manipulate worksheets.
+
+      The first column is "All". Changing a value in "All" changes the values of all the visible sheets at once.
+      Values of sheets are stored sparsely: a sheet has its own value only if it differs from "All".
 
       Attributes:
-          _all_values: a list of widgets to control all the values.
+          _sheet_names: a list of worksheet names
+          _all_values: a list of values in "All", one for each "SheetInfo"
+          _overrides: a dictionary whose key is (info index, sheet index) and value is the value of the sheet.
+          _hidden: a set of the indexes of hidden sheets.
+
+      Class Attributes:
+          value_rejected: a signal emitted with a message when an edited value is invalid.
   """
+  value_rejected = pyqtSignal(str)
 
   @classmethod
-  def __match_info_with_type(self, info: SheetInfo):
+  def __default_value(cls, info: SheetInfo):
     """
-    Returns a proper widget matching with data type.
+    Returns a default value matching with data type.
     :param info: SheetInfo object.
-    :return: a proper widget matching with data type.
-    :raise TypeError: if there is no proper widget.
+    :return: a default value matching with data type.
+    :raise TypeError: if there is no proper value.
     """
     if info.info_type is str:
-      return QLineEdit()
+      return ""
     elif info.info_type is bool:
-      return QCheckBox()
+      return False
     else:
       raise TypeError("There is no matched GUI type for " + str(info.info_type))
 
   def __init__(self):
-    super(SheetInfoTable, self).__init__()
-    self._all_values = []
+    super(SheetInfoModel, self).__init__()
+    self._sheet_names: List[str] = []
+    self._all_values = [SheetInfoModel.__default_value(info) for info in sheet_infos]
+    self._overrides = {}
+    self._hidden = set()
+
+  # Getters
+  @property
+  def sheet_names(self):
+    return self._sheet_names
 
-    self.setRowCount(len(sheet_infos))
-    for i, info in enumerate(sheet_infos):
-      self.setVerticalHeaderItem(i, QTableWidgetItem(info.info_name))
-    self.__init_all()
+  def set_sheet_names(self, sheet_names: List[str]):
+    """
+    Resets the model with new worksheets.
+    :param sheet_names: a list of worksheet names.
+    """
+    self.beginResetModel()
+    self._sheet_names = list(sheet_names)
+    self._all_values = [SheetInfoModel.__default_value(info) for info in sheet_infos]
+    self._overrides = {}
+    self._hidden = set()
+    self.endResetModel()
+
+  def value(self, info_index: int, sheet_index: int):
+    """
+    :param info_index: the index of "SheetInfo"
+    :param sheet_index: the index of a worksheet
+    :return: the value of the worksheet.
+    """
+    return self._overrides.get((info_index, sheet_index), self._all_values[info_index])
+
+  def set_value(self, info_index: int, sheet_index: int, value):
+    """
+    Sets the value of a worksheet.
+    :param info_index: the index of "SheetInfo"
+    :param sheet_index: the index of a worksheet
+    :param value: a new value
+    """
+    if value == self._all_values[info_index]:
+      self._overrides.pop((info_index, sheet_index), None)
+    else:
+      self._overrides[(info_index, sheet_index)] = value
+    index = self.index(info_index, sheet_index + 1)
+    self.dataChanged.emit(index, index)
+
+  def set_all_value(self, info_index: int, value):
+    """
+    Sets the value of "All" and of all the visible worksheets with one update.
+    Hidden worksheets keep their values.
+    :param info_index: the index of "SheetInfo"
+    :param value: a new value
+    """
+    for sheet_index in self._hidden:
+      if (info_index, sheet_index) not in self._overrides:
+        self._overrides[(info_index, sheet_index)] = self._all_values[info_index]
+    for key in [k for k in self._overrides if k[0] == info_index and k[1] not in self._hidden]:
+      del self._overrides[key]
+    for sheet_index in self._hidden:
+      if self._overrides[(info_index, sheet_index)] == value:
+        del self._overrides[(info_index, sheet_index)]
+    self._all_values[info_index] = value
+    self.dataChanged.emit(self.index(info_index, 0), self.index(info_index, len(self._sheet_names)))
+
+  def set_hidden(self, hidden):
+    """
+    Sets worksheets that are not changed by "All".
+    :param hidden: a set of the indexes of hidden worksheets.
+    """
+    self._hidden = set(hidden)
+
+  # QAbstractTableModel
+  def rowCount(self, parent=QModelIndex()):
+    return 0 if parent.isValid() else len(sheet_infos)
+
+  def columnCount(self, parent=QModelIndex()):
+    return 0 if parent.isValid() else len(self._sheet_names) + 1
+
+  def headerData(self, section, orientation, role=Qt.DisplayRole):
+    if role == Qt.ToolTipRole and orientation == Qt.Vertical:
+      return sheet_infos[section].info_help or None
+    if role != Qt.DisplayRole:
+      return None
+    if orientation == Qt.Vertical:
+      return sheet_infos[section].info_name
+    return "All" if section == 0 else self._sheet_names[section - 1]
+
+  def flags(self, index):
+    if sheet_infos[index.row()].info_type is bool:
+      return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+    return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+  def data(self, index, role=Qt.DisplayRole):
+    if not index.isValid():
+      return None
+    row, col = index.row(), index.column()
+    value = self._all_values[row] if col == 0 else self.value(row, col - 1)
+    if sheet_infos[row].info_type is bool:
+      if role == Qt.CheckStateRole:
+        return Qt.Checked if value else Qt.Unchecked
+      return None
+    if role in (Qt.DisplayRole, Qt.EditRole):
+      return value
+    if role == Qt.ToolTipRole:
+      return sheet_infos[row].info_help or None
+    return None
+
+  def setData(self, index, value, role=Qt.EditRole):
+    if not index.isValid():
+      return False
+    row, col = index.row(), index.column()
+    if sheet_infos[row].info_type is bool:
+      if role != Qt.CheckStateRole:
+        return False
+      value = value == Qt.Checked
+    elif role != Qt.EditRole:
+      return False
+    else:
+      try:
+        sheet_infos[row].check_value(value)
+      except Exception as e:
+        self.value_rejected.emit(str(e))
+        return False
+
+    if col == 0:
+      self.set_all_value(row, value)
+    else:
+      self.set_value(row, col - 1, value)
+    return True
+
+
+class SheetInfoTable(QTableView):
+  """ This class represents a table to decide how to manipulate worksheets.
 
+      Attributes:
+          _model: "SheetInfoModel" object that has the values of the table.
+          _search_index: "SheetSearchIndex" object to search worksheets.
+  """
+
+  def __init__(self):
+    super(SheetInfoTable, self).__init__()
+    self._model = SheetInfoModel()
+    self._search_index = SheetSearchIndex()
+    self.setModel(self._model)
+    self._model.value_rejected.connect(self.__value_rejected)
+
+    self.setEditTriggers(QAbstractItemView.AllEditTriggers)
     self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
     self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
 
   # Getters
   @property
-  def info_table(self):
-    return self._info_table
+  def info_model(self):
+    return self._model
 
-  @pyqtSlot(ExcelFile)
-  def set_excel_file(self, excel_file: ExcelFile):
+  @pyqtSlot(TemplateInfo)
+  def set_template_info(self, info: TemplateInfo):
     """
-    Update the table corresponding to an Excel file.
-    :param excel_file: an Excel file.
+    Update the table corresponding to a template.
+    :param info: "TemplateInfo" of a template.
     """
-    self.clearContents()
-
-    # all
-    self.__init_all()
+    self._model.set_sheet_names(info.sheet_names)
+    self._search_index.set_names(info.sheet_names)
+    for c in range(self._model.columnCount()):
+      self.setColumnHidden(c, False)
 
-    # horizontal header
-    with excel_file as excel:
-      sheet_names: List[str] = []
-      for i, sheet in enumerate(excel.sheets):
-        sheet_names.append(sheet.name)
-
-    # cells
-    self.setColumnCount(len(sheet_names) + 1)
-    self.setHorizontalHeaderLabels(['All'] + sheet_names)
-    for r, c in product(range(len(sheet_infos)), range(len(sheet_names))):
-      self.setCellWidget(r, c + 1, self.__make_connected_cell(r, c))
+  @pyqtSlot(str)
+  def __value_rejected(self, msg: str):
+    """ Shows why an edited value is not accepted, under the mouse cursor. """
+    QToolTip.showText(QCursor.pos(), msg, self)
 
   def get_sheet_data(self) -> List[SheetData]:
     """
     Returns data of how to manipulate a worksheet. in the table.
     :return: a list of "SheetData"s
-    :raise TypeError: if there is no data type matching with a widget in a cell.
     """
     result: List[SheetData] = []
 
-    for c in range(self.columnCount() - 1):
-      s = SheetData(self.horizontalHeaderItem(c + 1).text())
+    for c, sheet_name in enumerate(self._model.sheet_names):
+      s = SheetData(sheet_name)
       for r, v in enumerate(sheet_infos):
-        wgt = self.cellWidget(r, c + 1)
-        if type(wgt) is QLineEdit:
-          s[v] = wgt.text()
-        elif type(wgt) is QCheckBox:
-          s[v] = wgt.isChecked()
-        else:
-          raise TypeError("There is no matched data type for " + str(type(wgt)))
+        s[v] = self._model.value(r, c)
       result.append(s)
 
     return result
 
-  def search_sheet(self, keyword: str):
+  def search_sheet(self, keyword: str, fuzzy: bool = False):
     """
-    Searches sheets and show the searched only.
+    Searches sheets and show the searched only. Only columns whose visibility changes are updated.
     :param keyword: search key
+    :param fuzzy: whether the letters of the key may be apart in a sheet name.
     """
-    for i in range(1, len(self.horizontalHeader())):
-      if self.horizontalHeaderItem(i).text().count(keyword) == 0:
-        self.setColumnHidden(i, True)
-      else:
-        self.setColumnHidden(i, False)
-
-  def __init_all(self):
-    """ Initializes _all_values and update the first column of the table. """
-    self._all_values = []
-
-    self.setColumnCount(1)
-    self.setHorizontalHeaderItem(0, QTableWidgetItem("All"))
-    for i, info in enumerate(sheet_infos):
-      self._all_values.append(SheetInfoTable.__match_info_with_type(info))
-      self.setCellWidget(i, 0, self._all_values[i])
-
-  def __make_connected_cell(self, info_index: int, sheet_index: int) -> QWidget:
-    """
-    Returns a connected widget connected with a widget in _all_values.
-    :param info_index: row index of a cell
-    :param sheet_index: column index of a cell
-    :return: a connected widget.
-    """
-    wgt = type(self._all_values[info_index])()
+    shown, hidden = self._search_index.search(keyword, fuzzy)
+    if len(shown) == 0 and len(hidden) == 0:
+      return
 
-    if sheet_infos[info_index].info_type is str:
-      self._all_values[info_index].textChanged.connect(
-        lambda: wgt.setText(self._all_values[info_index].text())
-        if not self.isColumnHidden(sheet_index + 1) else None)
-      return wgt
-    if sheet_infos[info_index].info_type is bool:
-      self._all_values[info_index].stateChanged.connect(
-        lambda: wgt.setChecked(self._all_values[info_index].isChecked())
-        if not self.isColumnHidden(sheet_index + 1) else None)
-      return wgt
-    raise TypeError("There is no matched GUI type for " + str(sheet_infos[info_index].info_type))
+    self.setUpdatesEnabled(False)
+    try:
+      for i in shown:
+        self.setColumnHidden(i + 1, False)
+      for i in hidden:
+        self.setColumnHidden(i + 1, True)
+    finally:
+      self.setUpdatesEnabled(True)
+    self._model.set_hidden(set(range(len(self._model.sheet_names))) - self._search_index.matched)
 
 
 class WgtSheetInfo(QFrame):
@@ -191,7 +399,9 @@ class WgtSheetInfo(QFrame):
     self.setFrameShape(QFrame.StyledPanel)
 
     self._sheet_search.edt_search.textChanged. \
-      connect(lambda: self._info_table.search_sheet(self._sheet_search.keyword()))
+      connect(lambda: self._info_table.search_sheet(self._sheet_search.keyword(), self._sheet_search.fuzzy()))
+    self._sheet_search.chk_fuzzy.stateChanged. \
+      connect(lambda: self._info_table.search_sheet(self._sheet_search.keyword(), self._sheet_search.fuzzy()))
 
   # Getters
   @property
@@ -206,6 +416,6 @@ class WgtSheetInfo(QFrame):
 if __name__ == "__main__":
   app = QApplication(sys.argv)
   window = WgtSheetInfo()
-  window.info_table.set_excel_file(ExcelFile('C:/Users/yhjeo/Others/test.xlsx'))
+  window.info_table.set_template_info(ExcelFile('C:/Users/yhjeo/Others/test.xlsx').inspect())
   window.show()
   app.exec_()
@@ -4,9 +4,9 @@
 
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
-from basic.file.files import ExcelFile
-from gui.messages import WaitingMessage, ErrorMessage
-import xlwings as xw
+from basic.file.files import ExcelFile, TemplateInfo
+from gui.messages import ErrorMessage
+from gui.inspection import TemplateInspector
 import sys, gui
 
 
@@ -17,14 +17,23 @@ class WgtTemplate(QFrame):
           _bt_select: a button to select a template.
           _lbl_template: a label that shows a template name.
           _template: an Excel file for a template.
+          _template_info: "TemplateInfo" of the template.
+          _inspector: "TemplateInspector" object reading the information of a template.
+
+      Class Attributes:
+          template_changed: a signal emitted when a template is selected.
+          template_inspected: a signal emitted when the information of the selected template is read.
   """
   template_changed = pyqtSignal(ExcelFile, name="template_changed")
+  template_inspected = pyqtSignal(TemplateInfo, name="template_inspected")
 
   def __init__(self):
     super(WgtTemplate, self).__init__()
     self._bt_select = QPushButton("Select Template")
     self._lbl_template = QLabel("...")
     self._template: ExcelFile = None
+    self._template_info: TemplateInfo = None
+    self._inspector = TemplateInspector()
 
     h_layout = QHBoxLayout()
     h_layout.addWidget(self._bt_select)
@@ -38,6 +47,9 @@ class WgtTemplate(QFrame):
 
     self._bt_select.clicked.connect(self.__bt_select_clicked)
     self.template_changed.connect(self.__printing_changed)
+    self.template_changed.connect(self._inspector.inspect)
+    self._inspector.template_inspected.connect(self.__template_inspected)
+    self._inspector.inspection_failed.connect(self.__inspection_failed)
 
     self.setAcceptDrops(True)
 
@@ -46,23 +58,36 @@ class WgtTemplate(QFrame):
   def template(self):
     return self._template
 
+  @property
+  def template_info(self):
+    return self._template_info
+
   def __set_template(self, excel_file_name: str):
-    loading_mb = WaitingMessage("Loading Excel file...")
-    loading_mb.show()
+    # whether Excel has the file open is checked by "ExcelFile.open" when it is converted, not on the GUI thread.
     try:
       self._template = ExcelFile(excel_file_name)
-      for app in xw.apps:
-        for book in app.books:
-          if book.fullname.upper() == self._template.full_name.upper():
-            raise OSError("Another program use the file. Please close the program.")
+      self._template_info = None
+      self._lbl_template.setText(self._template.name + self._template.file_format + " (Loading...)")
       self.template_changed.emit(self._template)
-      loading_mb.accept()
-      self._lbl_template.setText(self._template.name + self._template.file_format)
     except Exception as e:
       error_mb = ErrorMessage("<nobr>Error: " + str(e) + "</nobr>")
       error_mb.show()
       error_mb.exec_()
-      loading_mb.reject()
+
+  @pyqtSlot(TemplateInfo)
+  def __template_inspected(self, info: TemplateInfo):
+    self._template_info = info
+    self._lbl_template.setText(self._template.name + self._template.file_format)
+    self.template_inspected.emit(info)
+
+  @pyqtSlot(str)
+  def __inspection_failed(self, msg: str):
+    self._template = None
+    self._template_info = None
+    self._lbl_template.setText("...")
+    error_mb = ErrorMessage("<nobr>Error: " + msg + "</nobr>")
+    error_mb.show()
+    error_mb.exec_()
 
   def __bt_select_clicked(self):
     fname = QFileDialog.getOpenFileName(self, 'Open file', directory=gui.current_directory,
@@ -0,0 +1,158 @@
+"""
+    This module has classes to load data to Excel files and to check data files out of the GUI thread.
+"""
+
+from PyQt5.QtCore import *
+from basic.file import merge_specified_range, merge_data_files, validate_text_files, scan_text_files
+from basic.file.pipeline import pipelined_text_to_excel
+from basic.file.files import TextFile, ExcelFile
+from basic.sheetdata.sheetdata import SheetData
+from basic.list2d import Table
+from typing import List
+
+
+class ConversionWorker(QObject):
+  """ This class loads data in text files to Excel files and merges them. It runs in a "QThread".
+
+      Attributes:
+          _data_table: a table that contains text files
+          _excel_file: an Excel file for a template
+          _save_names: a list of file names for new Excel files
+          _excel_range: a range of data to merge. If it is empty, data are not merged.
+          _merge_name: the name of an Excel file to merge data
+          _merge_only: whether the range is merged from text files, without an Excel file of each serial
+          _cancelled: whether loading is cancelled
+
+      Class Attributes:
+          serial_progress: a signal emitted with the number of saved Excel files, the number of all Excel files
+                           and a serial after each Excel file is saved.
+          sheet_progress: a signal emitted with the number of loaded sheets, the number of all sheets and
+                          a sheet name after each sheet is loaded.
+          done: a signal emitted with the names of saved Excel files and whether loading is cancelled.
+          failed: a signal emitted with an error message when loading fails.
+  """
+  serial_progress = pyqtSignal(int, int, str)
+  sheet_progress = pyqtSignal(int, int, str)
+  done = pyqtSignal(list, bool)
+  failed = pyqtSignal(str)
+
+  def __init__(self, data_table: Table[TextFile, str, SheetData], excel_file: ExcelFile, save_names: List[str],
+               excel_range: str = "", merge_name: str = "", merge_only: bool = False):
+    super(ConversionWorker, self).__init__()
+    self._data_table = data_table
+    self._excel_file = excel_file
+    self._save_names = save_names
+    self._excel_range = excel_range
+    self._merge_name = merge_name
+    self._merge_only = merge_only
+    self._cancelled = False
+    self._n_serials_done = 0
+    self._n_sheets_done = 0
+
+  # Getters
+  @property
+  def n_serials(self) -> int:
+    return self._data_table.n_row
+
+  @property
+  def n_sheets(self) -> int:
+    return self._data_table.n_row * self._data_table.n_col
+
+  def cancel(self):
+    """ Stops loading before the next Excel file is opened. It can be called from any thread. """
+    self._cancelled = True
+
+  @pyqtSlot()
+  def run(self):
+    """ Loads data and merges them. Emits "done" or "failed" at the end. """
+    if self._merge_only:
+      try:
+        path = [tf for row in self._data_table.contents() for tf in row if tf is not None][0].path
+        merged_name = merge_data_files(self._data_table, self._excel_file, self._excel_range, self._merge_name, path,
+                                       progress=self.__progress, is_cancelled=lambda: self._cancelled)
+        self.done.emit([merged_name], self._cancelled)
+      except Exception as e:
+        self.failed.emit(str(e))
+      return
+
+    attached = False
+    try:
+      ExcelFile.attach_excel_app()
+      attached = True
+      # Text is parsed in threads, because processes started from the GUI would run "main.py" again.
+      final_names = pipelined_text_to_excel(self._data_table, self._excel_file, self._save_names,
+                                            progress=self.__progress, is_cancelled=lambda: self._cancelled,
+                                            parse_workers=1)
+      if len(self._excel_range) != 0 and len(final_names) != 0 and not self._cancelled:
+        path = final_names[0][0: final_names[0].rfind('\\') + 1]
+        merge_specified_range(final_names, self._excel_range, path + self._merge_name)
+      self.done.emit(final_names, self._cancelled)
+    except Exception as e:
+      import traceback
+      traceback.print_exc()
+      self.failed.emit(str(e))
+    finally:
+      if attached:
+        ExcelFile.detach_excel_app()
+
+  def __progress(self, serial: str, sheet_name: str):
+    if sheet_name is None:
+      self._n_serials_done += 1
+      self.serial_progress.emit(self._n_serials_done, self.n_serials, serial)
+    else:
+      self._n_sheets_done += 1
+      self.sheet_progress.emit(self._n_sheets_done, self.n_sheets, sheet_name)
+
+
+class ValidationWorker(QObject):
+  """ This class checks data files in batches and makes text files. It runs in a "QThread".
+
+      Attributes:
+          _full_names: the full names of data files.
+
+      Class Attributes:
+          batch_validated: a signal emitted with a list of valid text files after each batch is checked.
+          done: a signal emitted with a list of (invalid file name, reason) after all files are checked.
+  """
+  batch_validated = pyqtSignal(list)
+  done = pyqtSignal(list)
+
+  def __init__(self, full_names: List[str]):
+    super(ValidationWorker, self).__init__()
+    self._full_names = full_names
+
+  @pyqtSlot()
+  def run(self):
+    error_files = []
+    for text_files, errors in validate_text_files(self._full_names):
+      if len(text_files) != 0:
+        self.batch_validated.emit(text_files)
+      error_files.extend(errors)
+    self.done.emit(error_files)
+
+
+class ScanWorker(ValidationWorker):
+  """ This class finds data files in directories and makes text files. It runs in a "QThread".
+
+      Attributes:
+          _directories: directories to search.
+          _recursive: whether subdirectories are also searched.
+  """
+
+  def __init__(self, directories: List[str], recursive: bool = False):
+    super(ScanWorker, self).__init__([])
+    self._directories = directories
+    self._recursive = recursive
+
+  @pyqtSlot()
+  def run(self):
+    error_files = []
+    try:
+      for text_files, errors in scan_text_files(self._directories, self._recursive):
+        if len(text_files) != 0:
+          self.batch_validated.emit(text_files)
+        error_files.extend(errors)
+    except Exception as e:
+      # "done" is always emitted, so the dialog waiting for the scan is closed.
+      error_files.append((", ".join(self._directories), str(e)))
+    self.done.emit(error_files)
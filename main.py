@@ -15,25 +15,26 @@
 
 __version__ = '1.1.0'
 
-from PyQt5.QtWidgets import *
-from gui.messages import ErrorMessage
-from gui.mainwindow import MainWindow
+from PyQt5.QtWidgets import QApplication
 import sys
-from basic.file.files import ExcelFile
-from win32api import GetSystemMetrics
 
 app = QApplication(sys.argv)
 try:
   if int(sys.version[0]) != 3 and float(sys.version[:3]) < 3.6:
     raise Exception
 except:
+  from gui.messages import ErrorMessage
   errorMessage = ErrorMessage()
   errorMessage.setText("<nobr>The version of Python must be 3.6 or higher.</nobr>")
   sys.exit(app.exec_())
 
-ExcelFile.open_excel_app()
+from gui.mainwindow import MainWindow
+from basic.file.files import ExcelFile
+
+# Excel is opened when it is used for the first time, not here.
 win = MainWindow()
-win.resize(GetSystemMetrics(0) * 3 / 4.0, GetSystemMetrics(1) * 3 / 5.0)
+screen = app.primaryScreen().size()
+win.resize(int(screen.width() * 3 / 4.0), int(screen.height() * 3 / 5.0))
 win.show()
 try:
   app.exec_()